@@ -0,0 +1,258 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import pandas as pd
+from sqlalchemy import create_engine
+from config.config import CLEANING_CONFIG, LOAD_METHOD, PROJECT_ROOT
+from benchmarks.synthetic_data import ensure_dataset, GENERATION_ORDER
+from scripts import duckdb_backend, transform
+from scripts.file_source import read_table_file
+from scripts.db_connection import get_engine, dispose_engine
+from scripts.load import create_schema, load_cleaned_data
+from utils.logger import logger
+
+BASELINE_FILE = os.path.join(PROJECT_ROOT, "benchmarks", "baseline.json")
+DEFAULT_ROWS = [100_000, 1_000_000, 10_000_000]
+BENCHMARK_SCHEMA = "benchmark"
+
+# Timings under this many seconds are too noisy to flag as regressions
+MIN_COMPARABLE_SECONDS = 0.05
+
+
+# ---------- MEASUREMENT ----------
+def _current_rss():
+    """Resident set size in bytes from /proc (Linux), else None."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class PeakMemory:
+    """
+    Peak growth of the process RSS while the block runs.
+
+    A background thread samples /proc every few milliseconds, which also
+    sees Arrow and NumPy buffers and costs almost nothing. (tracemalloc would
+    slow string-heavy steps several times over and skew the timings.) Memory
+    the allocator reuses from earlier steps is not counted, so this is a
+    lower bound. `peak_bytes` stays None where /proc is unavailable.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak_bytes = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._peak_rss = max(self._peak_rss, _current_rss())
+
+    def __enter__(self):
+        gc.collect()
+        self._start_rss = _current_rss()
+        if self._start_rss is not None:
+            self._peak_rss = self._start_rss
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak_bytes = max(self._peak_rss, _current_rss()) - self._start_rss
+        return False
+
+
+def measure(results, name, rows, fn, *args, **kwargs):
+    """Run fn, record wall time, CPU time, throughput and peak memory under `name`."""
+    with PeakMemory() as memory:
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        value = fn(*args, **kwargs)
+        seconds = time.perf_counter() - wall_start
+        cpu_seconds = time.process_time() - cpu_start
+
+    entry = results.setdefault(name, {"seconds": 0.0, "cpu_seconds": 0.0, "rows": 0, "peak_mb": None})
+    entry["seconds"] = round(entry["seconds"] + seconds, 4)
+    entry["cpu_seconds"] = round(entry["cpu_seconds"] + cpu_seconds, 4)
+    entry["rows"] += rows
+    if memory.peak_bytes is not None:
+        entry["peak_mb"] = round(max(entry["peak_mb"] or 0.0, memory.peak_bytes / 1024 ** 2), 1)
+    entry["rows_per_sec"] = round(entry["rows"] / entry["seconds"], 1) if entry["seconds"] > 0 else None
+    return value
+
+
+# ---------- BENCHMARKS ----------
+def benchmark_transform_functions(raw_dataframes, config, results):
+    """Time each scripts/transform step, summed over tables, then the cleaning paths and backends."""
+    for table_name, raw in raw_dataframes.items():
+        columns_config = config["tables"][table_name]["columns"]
+        rows = len(raw)
+        df = raw.copy()
+
+        df = measure(results, "transform.enforce_column_naming", rows, transform.enforce_column_naming, df)
+        df = measure(results, "transform.standardize_data_types", rows,
+                     transform.standardize_data_types, df, columns_config)
+        df = measure(results, "transform.drop_null_columns", rows, transform.drop_null_columns,
+                     df, columns_config, config.get("drop_column_threshold", 0.5))
+        df = measure(results, "transform.drop_null_rows", len(df), transform.drop_null_rows,
+                     df, config.get("drop_row_threshold", 0.5), columns_config)
+        df = measure(results, "transform.impute_missing_values", len(df),
+                     transform.impute_missing_values, df, columns_config)
+        df = measure(results, "transform.clean_text_fields", len(df), transform.clean_text_fields,
+                     df, columns_config, config.get("categorical_max_unique", 0))
+        df = measure(results, "transform.remove_duplicates", len(df), transform.remove_duplicates, df)
+        del df
+
+        measure(results, "transform.clean_table_stepwise", rows,
+                transform.clean_table_stepwise, raw.copy(), table_name, config)
+        measure(results, "transform.clean_table", rows, transform.clean_table, raw, table_name, config)
+        if duckdb_backend.duckdb is not None:
+            measure(results, "transform.clean_table_duckdb", rows,
+                    duckdb_backend.duckdb_clean_table, raw, table_name, config)
+
+
+def benchmark_etl_stages(data_dir, config, results, target="sqlite"):
+    """Time the extract, transform and load stages of main.run_etl on a generated dataset."""
+    raw_dataframes = {
+        table: measure(results, "etl.extract", 0, read_table_file, table, data_dir)
+        for table in GENERATION_ORDER
+    }
+    total_rows = sum(len(df) for df in raw_dataframes.values())
+    extract = results["etl.extract"]
+    extract["rows"] = total_rows
+    extract["rows_per_sec"] = round(total_rows / extract["seconds"], 1) if extract["seconds"] > 0 else None
+
+    cleaned = measure(results, "etl.transform", total_rows, transform.transform_data, raw_dataframes, config)
+    cleaned = {f"{table}_cleaned": df for table, df in cleaned.items()}
+
+    if target == "postgres":
+        engine = get_engine()
+        create_schema(engine, BENCHMARK_SCHEMA)
+        schema, method = BENCHMARK_SCHEMA, LOAD_METHOD
+        measure(results, "etl.load", total_rows, load_cleaned_data, cleaned, engine, schema, method=method)
+        dispose_engine()
+    else:
+        # Embedded stand-in: a throwaway SQLite file loaded through pandas
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}")
+            measure(results, "etl.load", total_rows, load_cleaned_data, cleaned, engine, None,
+                    method="to_sql", swap=False)
+            engine.dispose()
+    return raw_dataframes
+
+
+def run_benchmarks(rows, seed=42, target="sqlite", config=CLEANING_CONFIG):
+    """
+    Run every benchmark on the dataset scaled to `rows`.
+
+    Returns:
+        dict: {benchmark_name: {"seconds", "cpu_seconds", "rows", "rows_per_sec", "peak_mb"}}
+    """
+    data_dir = ensure_dataset(rows, seed)
+    results = {}
+    raw_dataframes = benchmark_etl_stages(data_dir, config, results, target)
+    benchmark_transform_functions(raw_dataframes, config, results)
+    return results
+
+
+# ---------- BASELINE ----------
+def load_baseline(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(all_results, path=BASELINE_FILE):
+    """Merge results into the baseline file, keyed by row count."""
+    baseline = load_baseline(path)
+    baseline.setdefault("environment", {}).update(environment())
+    for rows, results in all_results.items():
+        baseline.setdefault("runs", {})[str(rows)] = results
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2)
+    logger.info(f"✅ Saved benchmark baseline to {path}")
+
+
+def compare_with_baseline(rows, results, baseline, tolerance):
+    """
+    Return [(name, baseline_seconds, seconds, ratio)] for benchmarks more
+    than `tolerance` slower than the stored baseline.
+    """
+    regressions = []
+    for name, base in baseline.get("runs", {}).get(str(rows), {}).items():
+        current = results.get(name)
+        if current is None or base["seconds"] < MIN_COMPARABLE_SECONDS:
+            continue
+        ratio = current["seconds"] / base["seconds"]
+        if ratio > 1 + tolerance:
+            regressions.append((name, base["seconds"], current["seconds"], ratio))
+    return regressions
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def format_results(rows, results, baseline):
+    base_runs = baseline.get("runs", {}).get(str(rows), {})
+    lines = [f"{'benchmark':<36}{'seconds':>10}{'rows/sec':>14}{'peak MB':>10}{'vs base':>10}"]
+    for name, entry in results.items():
+        base = base_runs.get(name)
+        change = f"{entry['seconds'] / base['seconds']:.2f}x" if base and base["seconds"] > 0 else "-"
+        rate = f"{entry['rows_per_sec']:,.0f}" if entry.get("rows_per_sec") else "-"
+        peak = f"{entry['peak_mb']:.1f}" if entry["peak_mb"] is not None else "-"
+        lines.append(f"{name:<36}{entry['seconds']:>10.3f}{rate:>14}{peak:>10}{change:>10}")
+    return "\n".join(lines)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL pipeline on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS,
+                        help="Rows in the largest generated table (one run per value)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the generator")
+    parser.add_argument("--target", choices=["sqlite", "postgres"], default="sqlite",
+                        help="Load into an embedded SQLite stand-in or the configured PostgreSQL")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown vs baseline before failing (0.2 = 20%%)")
+    return parser.parse_args()
+
+
+# ---------- MAIN ENTRY ----------
+if __name__ == "__main__":
+    args = parse_args()
+    baseline = load_baseline(args.baseline)
+    all_results = {}
+    failed = False
+
+    for rows in args.rows:
+        logger.info(f"🚀 Benchmarking with {rows} rows...")
+        results = run_benchmarks(rows, args.seed, args.target)
+        all_results[rows] = results
+        print(f"\n=== {rows:,} rows ===")
+        print(format_results(rows, results, baseline))
+
+        for name, base_seconds, seconds, ratio in compare_with_baseline(rows, results, baseline, args.tolerance):
+            failed = True
+            print(f"❌ Regression in {name}: {base_seconds:.3f}s -> {seconds:.3f}s ({ratio:.2f}x)")
+
+    if args.save_baseline:
+        save_baseline(all_results, args.baseline)
+    sys.exit(1 if failed and not args.save_baseline else 0)
@@ -0,0 +1,180 @@
+import os
+import numpy as np
+import pandas as pd
+from config.config import CLEANING_CONFIG, FOREIGN_KEYS, PROJECT_ROOT
+from scripts.cleaning_plan import normalize_column_names
+from utils.logger import logger
+
+SAMPLE_DIR = os.path.join(PROJECT_ROOT, "data")
+BENCHMARK_DATA_DIR = os.path.join(PROJECT_ROOT, "data", "benchmark")
+
+# Parents are generated before their children
+GENERATION_ORDER = [
+    "insurance_customers",
+    "insurance_policies",
+    "insurance_claims",
+    "insurance_payments",
+    "insurance_feedback",
+]
+
+# Columns with more distinct values per row than this grow with the table;
+# the rest keep their sample's value set and frequencies
+HIGH_CARDINALITY_RATIO = 0.5
+
+
+# ---------- PROFILING ----------
+def primary_key(table, config=CLEANING_CONFIG):
+    """First critical column of a table, e.g. claimid."""
+    columns_config = config["tables"][table]["columns"]
+    return next(col for col, conf in columns_config.items() if conf.get("critical", False))
+
+
+def profile_column(series, dtype):
+    """Null rate, distinct ratio and value distribution of one sample column."""
+    values = series.dropna()
+    profile = {
+        "null_rate": float(series.isna().mean()) if len(series) else 0.0,
+        "distinct_ratio": values.nunique() / len(values) if len(values) else 0.0,
+        "dtype": dtype,
+        "numeric": pd.api.types.is_numeric_dtype(values),
+        "integer": pd.api.types.is_integer_dtype(values),
+    }
+    if dtype == "datetime":
+        dates = pd.to_datetime(values, errors="coerce").dropna()
+        profile["min"], profile["max"] = dates.min(), dates.max()
+        profile["format"] = "%Y-%m-%d"
+    elif profile["numeric"] and len(values):
+        profile["min"], profile["max"] = values.min(), values.max()
+    counts = values.value_counts()
+    profile["values"] = counts.index.to_numpy()
+    profile["weights"] = (counts / counts.sum()).to_numpy()
+    return profile
+
+
+# ---------- GENERATION ----------
+def _generate_values(profile, n, rng):
+    if profile["distinct_ratio"] <= HIGH_CARDINALITY_RATIO or not len(profile["values"]):
+        if not len(profile["values"]):
+            return np.full(n, None, dtype=object)
+        return rng.choice(profile["values"], size=n, p=profile["weights"])
+
+    if profile["dtype"] == "datetime":
+        span = max(1, (profile["max"] - profile["min"]).days + 1)
+        days = rng.integers(0, span, size=n)
+        dates = profile["min"] + pd.to_timedelta(days, unit="D")
+        return dates.strftime(profile["format"]).to_numpy(dtype=object)
+
+    if profile["numeric"]:
+        low, high = profile["min"], profile["max"]
+        if profile["integer"]:
+            return rng.integers(low, high + 1, size=n)
+        return np.round(rng.uniform(low, high, size=n), 2)
+
+    # Text that is mostly unique (addresses, phone numbers): build a pool of
+    # distinct values proportional to the row count from the sample's values
+    base = profile["values"]
+    pool_size = max(1, int(round(profile["distinct_ratio"] * n)))
+    pool = np.array(
+        [base[i % len(base)] if i < len(base) else f"{base[i % len(base)]} #{i // len(base)}"
+         for i in range(pool_size)],
+        dtype=object,
+    )
+    return pool[rng.integers(0, pool_size, size=n)]
+
+
+def generate_table(table, sample, n, parent_rows, rng, config=CLEANING_CONFIG):
+    """
+    Generate `n` rows shaped like `sample`.
+
+    The primary key runs 1..n, foreign keys are drawn from the parent's key
+    range, and every other column keeps the sample's null rate and either
+    its value frequencies (low cardinality) or its distinct-values-per-row
+    ratio (high cardinality).
+    """
+    columns_config = config["tables"][table]["columns"]
+    pk = primary_key(table, config)
+    foreign_keys = FOREIGN_KEYS.get(table, {})
+
+    columns = {}
+    for raw_name, name in zip(sample.columns, normalize_column_names(sample.columns)):
+        series = sample[raw_name]
+        if name == pk:
+            columns[raw_name] = np.arange(1, n + 1)
+            continue
+        if name in foreign_keys:
+            columns[raw_name] = rng.integers(1, parent_rows[foreign_keys[name]] + 1, size=n)
+            continue
+
+        profile = profile_column(series, columns_config.get(name, {}).get("dtype"))
+        values = pd.Series(_generate_values(profile, n, rng))
+        if profile["null_rate"]:
+            values = values.mask(rng.random(n) < profile["null_rate"])
+        columns[raw_name] = values
+
+    return pd.DataFrame(columns)
+
+
+def generate_dataset(rows, seed=42, sample_dir=SAMPLE_DIR, config=CLEANING_CONFIG):
+    """
+    Scale the five sample tables so the largest has `rows` rows.
+
+    Every table grows by the same factor, which keeps the sample's
+    parent/child ratios (e.g. payments per policy).
+
+    Returns:
+        dict: {table_name: DataFrame}
+    """
+    rng = np.random.default_rng(seed)
+    samples = {
+        table: pd.read_csv(os.path.join(sample_dir, f"{table}.csv"))
+        for table in GENERATION_ORDER
+    }
+    factor = rows / max(len(df) for df in samples.values())
+
+    dataset = {}
+    parent_rows = {}
+    for table in GENERATION_ORDER:
+        n = max(1, int(round(len(samples[table]) * factor)))
+        dataset[table] = generate_table(table, samples[table], n, parent_rows, rng, config)
+        parent_rows[table] = n
+        logger.info(f"✅ Generated {n} rows for '{table}'")
+    return dataset
+
+
+def write_dataset(dataset, output_dir, file_format="parquet"):
+    """Write generated tables as <table>.parquet or <table>.csv for the file source."""
+    os.makedirs(output_dir, exist_ok=True)
+    for table, df in dataset.items():
+        path = os.path.join(output_dir, f"{table}.{file_format}")
+        if file_format == "parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False)
+    logger.info(f"✅ Wrote {len(dataset)} synthetic tables to {output_dir}")
+
+
+def ensure_dataset(rows, seed=42, file_format="parquet", base_dir=BENCHMARK_DATA_DIR):
+    """Return the directory holding the dataset for `rows`, generating it once."""
+    output_dir = os.path.join(base_dir, f"rows_{rows}_seed_{seed}")
+    expected = [os.path.join(output_dir, f"{table}.{file_format}") for table in GENERATION_ORDER]
+    if not all(os.path.exists(path) for path in expected):
+        write_dataset(generate_dataset(rows, seed), output_dir, file_format)
+    return output_dir
+
+
+# ---------- STANDALONE TEST ----------
+if __name__ == "__main__":
+    dataset = generate_dataset(20000)
+    keys = {table: set(df.iloc[:, 0]) for table, df in dataset.items()}
+    for table, df in dataset.items():
+        sample = pd.read_csv(os.path.join(SAMPLE_DIR, f"{table}.csv"))
+        names = dict(zip(normalize_column_names(df.columns), df.columns))
+        for child_col, parent in FOREIGN_KEYS.get(table, {}).items():
+            assert set(df[names[child_col]]) <= keys[parent], f"{table}.{child_col} has orphans"
+        print(f"{table}: {len(df)} rows")
+        print(pd.DataFrame({
+            "sample_distinct": sample.nunique(),
+            "generated_distinct": df.nunique(),
+            "sample_nulls": sample.isna().mean(),
+            "generated_nulls": df.isna().mean(),
+        }).round(3).to_string())
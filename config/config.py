@@ -11,11 +11,144 @@ DB_CONFIG = {
     "password": os.getenv("DB_PASSWORD", "your_password"),
 }
 
+# Shared connection pool used by every stage (scripts/db_connection.py)
+DB_POOL_CONFIG = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    # Connections opened in parallel when the engine is first created
+    "warm_connections": int(os.getenv("DB_WARM_CONNECTIONS", "0")),
+    # A pooled connection is pinged on checkout at most once per this many seconds
+    "health_check_ttl": float(os.getenv("DB_HEALTH_CHECK_TTL", "30")),
+}
+
 SCHEMA_NAME = os.getenv("DB_SCHEMA", "public")
+# Schema holding the raw tables (read directly by the SQL pushdown backend)
+SOURCE_SCHEMA_NAME = os.getenv("DB_SOURCE_SCHEMA", "public")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Local state (watermarks etc.) kept between runs
+STATE_DIR = os.getenv("ETL_STATE_DIR", os.path.join(PROJECT_ROOT, "state"))
+
+# Where extract_data reads the raw tables: "postgres" or "files" (CSV/Parquet drops)
+EXTRACT_SOURCE = os.getenv("ETL_SOURCE", "postgres")
+# Directory holding <table>.parquet or <table>.csv for the file source
+FILE_SOURCE_DIR = os.getenv("ETL_FILE_SOURCE_DIR", os.path.join(PROJECT_ROOT, "data"))
+
+# Local Arrow snapshots of extracted tables, reused while the source fingerprint is unchanged
+STAGING_CACHE_ENABLED = os.getenv("ETL_STAGING_CACHE", "0") == "1"
+STAGING_CACHE_DIR = os.getenv("ETL_STAGING_CACHE_DIR", os.path.join(PROJECT_ROOT, "data", "staging"))
+# Least recently used snapshots are evicted once the directory grows past this size
+STAGING_CACHE_MAX_BYTES = int(os.getenv("ETL_STAGING_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Per-stage instrumentation: JSON run reports and a Prometheus textfile (off by default)
+METRICS_ENABLED = os.getenv("ETL_METRICS", "0") == "1"
+METRICS_DIR = os.getenv("ETL_METRICS_DIR", os.path.join(STATE_DIR, "metrics"))
+METRICS_TEXTFILE = os.getenv("ETL_METRICS_TEXTFILE", os.path.join(METRICS_DIR, "etl_pipeline.prom"))
+
+# Imputation statistics (scripts/column_stats.py), saved per table between runs
+STATS_DIR = os.getenv("ETL_STATS_DIR", os.path.join(STATE_DIR, "stats"))
+# t-digest size for approximate medians (higher = more accurate, more centroids)
+QUANTILE_COMPRESSION = int(os.getenv("ETL_QUANTILE_COMPRESSION", "200"))
+# Counters kept by the heavy-hitter summary for approximate modes
+HEAVY_HITTER_CAPACITY = int(os.getenv("ETL_HEAVY_HITTER_CAPACITY", "1000"))
+# Distinct values an exact running statistic may count before it falls back to the
+# approximate sketch, so streamed and incremental statistics stay bounded
+EXACT_STATS_MAX_VALUES = int(os.getenv("ETL_EXACT_STATS_MAX_VALUES", "100000"))
+
+# On-disk row fingerprint index used to drop rows already loaded (scripts/dedupe_index.py)
+DEDUPE_INDEX_DIR = os.getenv("ETL_DEDUPE_INDEX_DIR", os.path.join(STATE_DIR, "dedupe"))
+# Committed segments per table before they are merged into one
+DEDUPE_MAX_SEGMENTS = int(os.getenv("ETL_DEDUPE_MAX_SEGMENTS", "8"))
+# Fingerprints held in memory per step while merging segments
+DEDUPE_MERGE_BLOCK = int(os.getenv("ETL_DEDUPE_MERGE_BLOCK", "1000000"))
+
+# Referential integrity: child table -> {foreign key column: parent table}. The parent
+# key has the same column name. Orphan rows go to <table>_quarantine instead of the target
+FOREIGN_KEYS = {
+    "insurance_policies": {"customerid": "insurance_customers"},
+    "insurance_claims": {"policyid": "insurance_policies"},
+    "insurance_payments": {"policyid": "insurance_policies"},
+    "insurance_feedback": {"customerid": "insurance_customers"},
+}
+INTEGRITY_ENABLED = os.getenv("ETL_INTEGRITY", "1") == "1"
+QUARANTINE_SUFFIX = "_quarantine"
+# Parent key index parts kept before they are merged (streamed parents add one per chunk)
+INTEGRITY_MAX_INDEX_PARTS = int(os.getenv("ETL_INTEGRITY_MAX_INDEX_PARTS", "16"))
+
+# Batch runs checkpoint each table after every stage so `main.py --resume` can restart a
+# failed run from where it stopped; the oldest failed runs past CHECKPOINT_MAX_RUNS are pruned
+CHECKPOINTS_ENABLED = os.getenv("ETL_CHECKPOINTS", "1") == "1"
+CHECKPOINT_DIR = os.getenv("ETL_CHECKPOINT_DIR", os.path.join(STATE_DIR, "checkpoints"))
+CHECKPOINT_MAX_RUNS = int(os.getenv("ETL_CHECKPOINT_MAX_RUNS", "3"))
+
+# Rows fetched per server-side cursor batch when running in streaming mode
+ETL_CHUNK_SIZE = int(os.getenv("ETL_CHUNK_SIZE", "50000"))
+
+# Tables fetched concurrently by extract_data (1 = sequential)
+EXTRACT_MAX_WORKERS = int(os.getenv("ETL_EXTRACT_WORKERS", "1"))
+
+# Pipelined scheduler: worker threads per stage and max frames waiting between stages
+PIPELINE_WORKERS = {
+    "extract": int(os.getenv("ETL_PIPELINE_EXTRACT_WORKERS", "2")),
+    "transform": int(os.getenv("ETL_PIPELINE_TRANSFORM_WORKERS", "2")),
+    "load": int(os.getenv("ETL_PIPELINE_LOAD_WORKERS", "2")),
+}
+PIPELINE_QUEUE_SIZE = int(os.getenv("ETL_PIPELINE_QUEUE_SIZE", "2"))
+
+# Parallel transform: worker processes (1 = in-process) and row partition size for tall tables
+TRANSFORM_MAX_WORKERS = int(os.getenv("ETL_TRANSFORM_WORKERS", "1"))
+TRANSFORM_PARTITION_ROWS = int(os.getenv("ETL_TRANSFORM_PARTITION_ROWS", "250000"))
+
+# DuckDB transform backend ("backend": "duckdb" in CLEANING_CONFIG or --backend duckdb):
+# worker threads (0 = one per core), memory cap before spilling (e.g. "4GB", "" = DuckDB's
+# default of 80% of RAM) and the directory it spills to
+DUCKDB_THREADS = int(os.getenv("ETL_DUCKDB_THREADS", "0"))
+DUCKDB_MEMORY_LIMIT = os.getenv("ETL_DUCKDB_MEMORY_LIMIT", "")
+DUCKDB_TEMP_DIR = os.getenv("ETL_DUCKDB_TEMP_DIR", os.path.join(STATE_DIR, "duckdb_tmp"))
+
+# Distinct strings memoized by the text cleaning cache
+TEXT_CACHE_SIZE = int(os.getenv("ETL_TEXT_CACHE_SIZE", "100000"))
+
+# Load engine: "copy" streams rows with COPY FROM STDIN, "to_sql" uses pandas INSERTs
+LOAD_METHOD = os.getenv("ETL_LOAD_METHOD", "copy")
+# Rows serialized into each in-memory COPY buffer
+COPY_BATCH_ROWS = int(os.getenv("ETL_COPY_BATCH_ROWS", "100000"))
+# Full reloads write every table into a staging table in parallel, index and ANALYZE it,
+# then swap all staging tables into place in one transaction (0 = replace tables in place)
+LOAD_SWAP = os.getenv("ETL_LOAD_SWAP", "1") == "1"
+# Tables loaded concurrently into staging, each over its own pooled connection
+LOAD_MAX_WORKERS = int(os.getenv("ETL_LOAD_WORKERS", "4"))
+# How long the swap waits for readers' locks before retrying, and how often it tries
+LOAD_SWAP_LOCK_TIMEOUT = os.getenv("ETL_LOAD_SWAP_LOCK_TIMEOUT", "5s")
+LOAD_SWAP_RETRIES = int(os.getenv("ETL_LOAD_SWAP_RETRIES", "3"))
 
 CLEANING_CONFIG = {
     "drop_column_threshold": 0.5,
     "drop_row_threshold": 0.5,
+    # Clean with the compiled single-pass plan (scripts/cleaning_plan.py)
+    "use_fused_plan": True,
+    # Text columns with at most this many distinct values (and distinct/rows ratio)
+    # are kept as pandas category through transform and load (0 = off)
+    "categorical_max_unique": 1000,
+    "categorical_max_ratio": 0.5,
+    # Median/mode imputation statistics: "exact" (counts every distinct value) or
+    # "approx" (t-digest / heavy hitters, bounded memory); override per column with "stats"
+    "impute_stats": "exact",
+    # Default for statistics accumulated across chunks and runs (streaming, incremental), which
+    # are kept in memory and saved under state/stats: bounded sketches unless overridden per column
+    "stream_impute_stats": "approx",
+    # Final dtypes: smallest lossless numeric dtypes, and "pyarrow" (Arrow-backed) or
+    # "python" (object) storage for text columns that are not categories
+    "downcast_numeric": True,
+    "string_storage": "pyarrow",
+    # Engine that runs the cleaning rules: "pandas" or "duckdb" (multi-threaded, spills to
+    # DUCKDB_TEMP_DIR; same output, see scripts/duckdb_backend.py)
+    "backend": os.getenv("ETL_TRANSFORM_BACKEND", "pandas"),
+    # Optional per table: "dedupe_key": [columns] makes streaming runs drop rows whose key
+    # was already loaded, instead of only exact repeats of whole rows
 
     "tables": {
         "insurance_customers": {
@@ -1,52 +1,508 @@
+import argparse
+import copy
 import time
+from concurrent.futures import ThreadPoolExecutor
 from utils.logger import logger
-from scripts.extract import extract_data
-from scripts.transform import transform_data
+from utils import metrics
+from scripts.db_connection import get_engine, dispose_engine, warm_pool, connection_stage, connection_wait_stats
+from scripts.extract import extract_data, extract_table, iter_table_chunks, TABLES_TO_EXTRACT
+from scripts.file_source import iter_file_chunks, read_table_file
+from scripts.transform import transform_data, clean_table, clean_table_chunk
+from scripts.cleaning_plan import compile_cleaning_plan, observe_statistics
+from scripts.column_stats import TableStats, load_table_stats, save_table_stats
+from scripts.dedupe_index import FingerprintIndex, reset_fingerprint_index
+from scripts.checkpoints import CheckpointStore, NULL_STORE, config_hash
+from scripts.integrity import (
+    IntegrityValidator, integrity_order, quarantine_table_name,
+    reset_quarantine, load_quarantine
+)
+from scripts.parallel_transform import transform_data_parallel
+from scripts.scheduler import run_pipeline
+from scripts.incremental import extract_increment, load_watermarks, save_watermark
+from scripts.pushdown import pushdown_clean_table
 from scripts.load import main as load_cleaned_main
-from config.config import CLEANING_CONFIG  # <-- updated import
+from scripts.load import create_schema, load_cleaned_data, upsert_cleaned_data
+from config.config import (  # <-- updated import
+    CLEANING_CONFIG, ETL_CHUNK_SIZE, SCHEMA_NAME, SOURCE_SCHEMA_NAME,
+    EXTRACT_MAX_WORKERS, TRANSFORM_MAX_WORKERS, STAGING_CACHE_ENABLED, EXTRACT_SOURCE,
+    METRICS_ENABLED, PIPELINE_WORKERS, INTEGRITY_ENABLED, FOREIGN_KEYS, CHECKPOINTS_ENABLED
+)
 
 # ---------- RUN ETL PIPELINE ----------
-def run_etl():
+def run_config_hash(source=EXTRACT_SOURCE, integrity=INTEGRITY_ENABLED):
+    """Digest of the settings that shape a batch run's checkpoints."""
+    return config_hash(CLEANING_CONFIG, FOREIGN_KEYS, TABLES_TO_EXTRACT, source, integrity)
+
+
+def run_etl(extract_workers=EXTRACT_MAX_WORKERS, transform_workers=TRANSFORM_MAX_WORKERS,
+            use_cache=STAGING_CACHE_ENABLED, source=EXTRACT_SOURCE, integrity=INTEGRITY_ENABLED,
+            checkpoints=CHECKPOINTS_ENABLED, resume=None):
+    """
+    Extract, transform and load every table in batch.
+
+    With `checkpoints`, each table's output is saved after every stage.
+    `resume` (a run id, or "latest") picks a failed run back up: tables
+    already loaded are skipped, and the others restart from their last
+    finished stage.
+    """
     start_time = time.time()
     logger.info("🚀 Starting ETL pipeline...")
+    store = NULL_STORE
 
     try:
-        # Step 1: Extract raw data
+        digest = run_config_hash(source, integrity)
+        if resume is not None:
+            store = CheckpointStore.open(resume, digest)
+            logger.info(f"🔁 Resuming run {store.run_id}")
+        elif checkpoints:
+            store = CheckpointStore.create(digest)
+        pending = [table for table in TABLES_TO_EXTRACT if not store.done(table)]
+
+        # Step 1: Extract raw data (tables with no extract or transform checkpoint)
         logger.info("📥 Extracting data...")
-        raw_dataframes = extract_data()
+        to_extract = [t for t in pending if not store.has(t, "extract") and not store.has(t, "transform")]
+        extracted = {}
+        if to_extract:
+            if source == "postgres" and extract_workers > 1:
+                warm_pool(extract_workers)
+            extracted = extract_data(max_workers=extract_workers, use_cache=use_cache, source=source,
+                                     tables=to_extract) or {}
+            for table_name, df in extracted.items():
+                store.save(table_name, "extract", df)
+
+        raw_dataframes = {}
+        for table_name in pending:
+            if table_name in extracted:
+                raw_dataframes[table_name] = extracted[table_name]
+            elif store.has(table_name, "extract") and not store.has(table_name, "transform"):
+                raw_dataframes[table_name] = store.load(table_name, "extract")
+        resumed_transforms = [table_name for table_name in pending if store.has(table_name, "transform")]
 
-        if not raw_dataframes or not isinstance(raw_dataframes, dict):
+        if not raw_dataframes and not resumed_transforms:
             logger.error("❌ Data extraction failed or returned empty/invalid data.")
+            store.fail("extraction returned no data")
             return
 
         logger.info(f"✅ Extracted {len(raw_dataframes)} datasets. Proceeding to transformation.")
 
         # Step 2: Transform and clean data
         logger.info("🧹 Transforming data...")
-        cleaned_dataframes = transform_data(raw_dataframes, CLEANING_CONFIG)
+        cleaned_dataframes = {table_name: store.load(table_name, "transform") for table_name in resumed_transforms}
+        if raw_dataframes and transform_workers > 1:
+            transformed = transform_data_parallel(raw_dataframes, CLEANING_CONFIG, max_workers=transform_workers)
+            for table_name, df in transformed.items():
+                store.save(table_name, "transform", df)
+            cleaned_dataframes.update(transformed)
+        else:
+            # One table at a time, so a failure keeps the tables cleaned before it
+            for table_name, df in raw_dataframes.items():
+                cleaned_dataframes.update(transform_data({table_name: df}, CLEANING_CONFIG))
+                store.save(table_name, "transform", cleaned_dataframes[table_name])
+        cleaned_dataframes = {t: cleaned_dataframes[t] for t in pending if t in cleaned_dataframes}
 
         if not cleaned_dataframes or not isinstance(cleaned_dataframes, dict):
             logger.error("❌ Transformation failed or returned empty/invalid data.")
+            store.fail("transformation returned no data")
             return
 
+        # Step 2b: Move rows with dangling foreign keys to quarantine tables
+        orphans = {}
+        if integrity:
+            logger.info("🔗 Validating foreign keys...")
+            validator = IntegrityValidator(engine=get_engine(), schema=SCHEMA_NAME)
+            cleaned_dataframes, orphans = validator.validate_all(cleaned_dataframes)
+
         # Rename tables to *_cleaned to avoid FK conflicts on load
+        tables_to_load = list(cleaned_dataframes)
         cleaned_dataframes = {
             f"{table_name}_cleaned": df
             for table_name, df in cleaned_dataframes.items()
         }
+        cleaned_dataframes.update({quarantine_table_name(table): df for table, df in orphans.items()})
+        # Last run's quarantine tables go in the same swap, so a failed load keeps them
+        stale_quarantine = [
+            quarantine_table_name(table) for table in tables_to_load if integrity and table not in orphans
+        ]
 
         logger.info(f"✅ Transformed {len(cleaned_dataframes)} datasets. Proceeding to loading.")
 
         # Step 3: Load cleaned data into PostgreSQL
         logger.info("📤 Loading cleaned data into PostgreSQL...")
-        load_cleaned_main(cleaned_dataframes)  # <-- Direct call; no return value check
+        # Target tables are replaced, so rows fingerprinted by earlier runs no longer apply
+        for table_name in tables_to_load:
+            reset_fingerprint_index(table_name)
+        if not load_cleaned_main(cleaned_dataframes, drop_tables=stale_quarantine):
+            logger.error("❌ Loading cleaned data failed.")
+            store.fail("load failed")
+            return
+        for table_name in tables_to_load:
+            store.save(table_name, "load")
 
+        unfinished = [table_name for table_name in pending if table_name not in tables_to_load]
         elapsed = round(time.time() - start_time, 2)
-        logger.info(f"✅ ETL pipeline completed successfully in {elapsed} seconds.")
+        if unfinished:
+            store.fail(f"tables not loaded: {unfinished}")
+            logger.warning(f"⚠️ ETL pipeline finished in {elapsed} seconds without tables: {unfinished}")
+        else:
+            store.complete()
+            logger.info(f"✅ ETL pipeline completed successfully in {elapsed} seconds.")
 
     except Exception as e:
         logger.exception(f"❌ ETL pipeline failed due to an unexpected error: {e}")
+        store.fail(e)
+
+# ---------- RUN STREAMING ETL PIPELINE ----------
+def stream_table(table_name, source_engine, target_engine, chunk_size, source=EXTRACT_SOURCE,
+                 validator=None):
+    """
+    Extract, clean and append one table chunk by chunk.
+
+    Only one chunk is resident at a time, so peak memory depends on
+    `chunk_size` rather than on table size. With `source="files"`, chunks
+    are read from the table's CSV/Parquet file instead of PostgreSQL.
+    Medians and modes are accumulated across chunks in one pass and saved
+    for later runs. Rows repeated across chunks are dropped through the
+    on-disk fingerprint index, which is rebuilt along with the target table.
+    With a `validator`, chunks with dangling foreign keys go to the
+    table's quarantine table; parents must be streamed before children.
+    """
+    target_table = f"{table_name}_cleaned"
+    plan = compile_cleaning_plan(table_name, CLEANING_CONFIG)
+    stats = TableStats(table_name, plan["stream_impute_stats"])
+    index = FingerprintIndex(table_name, key_columns=CLEANING_CONFIG["tables"][table_name].get("dedupe_key"))
+    index.reset()
+    columns = None
+    rows_in = rows_out = quarantined = 0
+    if validator is not None:
+        reset_quarantine(target_engine, SCHEMA_NAME, [table_name])
+
+    if source == "files":
+        chunks = iter_file_chunks(table_name, chunk_size)
+    else:
+        chunks = iter_table_chunks(table_name, source_engine, chunk_size)
+
+    while True:
+        with metrics.track(table_name, "extract", "stream") as tracker:
+            chunk = next(chunks, None)
+            tracker.output(chunk)
+        if chunk is None:
+            break
+
+        rows_in += len(chunk)
+        cleaned = clean_table_chunk(chunk, table_name, CLEANING_CONFIG, columns, plan, stats)
+        del chunk
+
+        if validator is not None:
+            cleaned, orphans = validator.validate(table_name, cleaned)
+            if not orphans.empty:
+                load_quarantine({table_name: orphans}, target_engine, SCHEMA_NAME)
+                quarantined += len(orphans)
+
+        cleaned = index.filter_new(cleaned)
+        if cleaned.empty:
+            continue
+
+        # First non-empty chunk replaces the target; the rest append to it (no staging swap,
+        # since readers see the table grow chunk by chunk anyway)
+        if_exists = "replace" if columns is None else "append"
+        try:
+            load_cleaned_data({target_table: cleaned}, target_engine, SCHEMA_NAME, if_exists=if_exists, swap=False)
+        except Exception:
+            index.discard()
+            raise
+        index.commit()
+        columns = list(cleaned.columns)
+        rows_out += len(cleaned)
+
+    save_table_stats(stats)
+    logger.info(
+        f"✅ Streamed {table_name}: {rows_in} rows in, {rows_out} rows loaded into {target_table}"
+        + (f", {quarantined} quarantined" if quarantined else "")
+    )
+
+
+def run_streaming_etl(chunk_size=ETL_CHUNK_SIZE, source=EXTRACT_SOURCE, integrity=INTEGRITY_ENABLED):
+    start_time = time.time()
+    logger.info(f"🚀 Starting streaming ETL pipeline (chunk size {chunk_size})...")
+
+    source_engine = None
+    target_engine = None
+    failed_tables = []
+
+    try:
+        if source != "files":
+            source_engine = get_engine()
+        target_engine = get_engine()
+        create_schema(target_engine, SCHEMA_NAME)
+
+        tables, validator = TABLES_TO_EXTRACT, None
+        if integrity:
+            # Parents first, so their keys are indexed before children stream
+            tables = integrity_order(TABLES_TO_EXTRACT)
+            validator = IntegrityValidator(engine=target_engine, schema=SCHEMA_NAME)
+
+        for table_name in tables:
+            try:
+                stream_table(table_name, source_engine, target_engine, chunk_size, source, validator)
+            except Exception as e:
+                logger.error(f"❌ Streaming failed for table '{table_name}': {e}", exc_info=True)
+                failed_tables.append(table_name)
+
+        elapsed = round(time.time() - start_time, 2)
+        if failed_tables:
+            logger.warning(f"⚠️ Streaming ETL finished in {elapsed} seconds with failed tables: {failed_tables}")
+        else:
+            logger.info(f"✅ Streaming ETL pipeline completed successfully in {elapsed} seconds.")
+
+    except Exception as e:
+        logger.exception(f"❌ Streaming ETL pipeline failed due to an unexpected error: {e}")
+
+    finally:
+        # Source and target share the process-wide engine
+        dispose_engine()
+
+
+# ---------- RUN PIPELINED ETL ----------
+def run_pipelined_etl(use_cache=STAGING_CACHE_ENABLED, source=EXTRACT_SOURCE, integrity=INTEGRITY_ENABLED):
+    start_time = time.time()
+    logger.info("🚀 Starting pipelined ETL pipeline...")
+
+    source_engine = None
+    target_engine = None
+
+    try:
+        if source != "files":
+            source_engine = get_engine()
+        target_engine = get_engine()
+        create_schema(target_engine, SCHEMA_NAME)
+        warm_pool(PIPELINE_WORKERS["extract"] + PIPELINE_WORKERS["load"])
+        for table_name in TABLES_TO_EXTRACT:
+            reset_fingerprint_index(table_name)
+
+        validator, tables = None, TABLES_TO_EXTRACT
+        if integrity:
+            # Children validate against the keys of parents cleaned in this run
+            tables = integrity_order(TABLES_TO_EXTRACT)
+            validator = IntegrityValidator(engine=target_engine, schema=SCHEMA_NAME)
+            validator.expect(tables)
+
+        def extract(table_name, _):
+            try:
+                if source == "files":
+                    return read_table_file(table_name)
+                return extract_table(table_name, source_engine, use_cache)
+            except Exception:
+                if validator is not None:
+                    validator.settle(table_name)
+                raise
+
+        def transform(table_name, df):
+            try:
+                cleaned = clean_table(df, table_name, CLEANING_CONFIG)
+            except Exception:
+                if validator is not None:
+                    validator.settle(table_name)
+                raise
+            if validator is None:
+                return cleaned, None
+            # Only validation waits for the parents; it runs off the transform workers,
+            # so the other tables keep extracting, cleaning and loading meanwhile
+            return validations.submit(validator.validate, table_name, cleaned)
+
+        def load(table_name, frames):
+            cleaned, orphans = frames
+            tables, stale = {f"{table_name}_cleaned": cleaned}, []
+            if orphans is not None:
+                # The quarantine table is replaced (or dropped) in the same swap as the target
+                if orphans.empty:
+                    stale.append(quarantine_table_name(table_name))
+                else:
+                    tables[quarantine_table_name(table_name)] = orphans
+            return load_cleaned_data(tables, target_engine, SCHEMA_NAME, drop_tables=stale)
+
+        with ThreadPoolExecutor(max_workers=max(1, len(tables)), thread_name_prefix="validate") as validations:
+            report = run_pipeline(tables, extract, transform, load)
+
+        elapsed = round(time.time() - start_time, 2)
+        if report["failed_tables"]:
+            logger.warning(f"⚠️ Pipelined ETL finished in {elapsed} seconds with failures.")
+        else:
+            logger.info(f"✅ Pipelined ETL pipeline completed successfully in {elapsed} seconds.")
+        return report
+
+    except Exception as e:
+        logger.exception(f"❌ Pipelined ETL pipeline failed due to an unexpected error: {e}")
+
+    finally:
+        # Source and target share the process-wide engine
+        dispose_engine()
+
+
+# ---------- RUN INCREMENTAL ETL ----------
+def run_incremental_etl(integrity=INTEGRITY_ENABLED):
+    start_time = time.time()
+    logger.info("🚀 Starting incremental ETL pipeline...")
+
+    source_engine = None
+    target_engine = None
+    failed_tables = []
+
+    try:
+        source_engine = get_engine()
+        target_engine = get_engine()
+        create_schema(target_engine, SCHEMA_NAME)
+        watermarks = load_watermarks()
+
+        tables, validator = TABLES_TO_EXTRACT, None
+        if integrity:
+            # New child rows may reference parents loaded by earlier runs
+            tables = integrity_order(TABLES_TO_EXTRACT)
+            validator = IntegrityValidator(engine=target_engine, schema=SCHEMA_NAME)
+            for parent in sorted({parent for fks in FOREIGN_KEYS.values() for parent in fks.values()}):
+                if parent in tables:
+                    validator.load_target_keys(parent)
+
+        for table_name in tables:
+            try:
+                table_config = CLEANING_CONFIG["tables"][table_name]
+                with metrics.track(table_name, "extract", "increment") as tracker, connection_stage("extract"):
+                    df, column, new_mark = extract_increment(table_name, source_engine, table_config, watermarks)
+                    tracker.output(df)
+                if df.empty:
+                    continue
+
+                # New rows are imputed from the statistics of every row loaded so far;
+                # a full extract (no watermark yet) starts them afresh
+                impute_stats = CLEANING_CONFIG.get("stream_impute_stats", "approx")
+                if table_name in watermarks:
+                    stats = load_table_stats(table_name, impute_stats)
+                else:
+                    stats = TableStats(table_name, impute_stats)
+
+                # Impute from a working copy: the saved statistics must only learn the rows
+                # actually merged, not the boundary rows every run re-reads
+                cleaned = clean_table(df, table_name, CLEANING_CONFIG, stats=copy.deepcopy(stats))
+                orphans = None
+                if validator is not None:
+                    cleaned, orphans = validator.validate(table_name, cleaned)
+                # Duplicates are only dropped within this batch (clean_table): a key changing
+                # A -> B -> A must still be merged, and the upsert skips rows that change nothing
+                if not cleaned.empty:
+                    # A key repeated in the batch keeps its version with the latest watermark
+                    upsert_cleaned_data({f"{table_name}_cleaned": cleaned}, target_engine, SCHEMA_NAME,
+                                        order_columns={f"{table_name}_cleaned": column})
+
+                # Only advance the mark (and statistics) once the rows are safely merged
+                save_watermark(table_name, column, new_mark)
+                if not cleaned.empty:
+                    plan = compile_cleaning_plan(table_name, CLEANING_CONFIG)
+                    observe_statistics(df.loc[cleaned.index], plan, stats, cleaned.columns)
+                save_table_stats(stats)
+                if orphans is not None and not orphans.empty:
+                    load_quarantine({table_name: orphans}, target_engine, SCHEMA_NAME)
+            except Exception as e:
+                logger.error(f"❌ Incremental run failed for table '{table_name}': {e}", exc_info=True)
+                failed_tables.append(table_name)
+
+        elapsed = round(time.time() - start_time, 2)
+        if failed_tables:
+            logger.warning(f"⚠️ Incremental ETL finished in {elapsed} seconds with failed tables: {failed_tables}")
+        else:
+            logger.info(f"✅ Incremental ETL pipeline completed successfully in {elapsed} seconds.")
+
+    except Exception as e:
+        logger.exception(f"❌ Incremental ETL pipeline failed due to an unexpected error: {e}")
+
+    finally:
+        # Source and target share the process-wide engine
+        dispose_engine()
+
+
+# ---------- RUN PUSHDOWN (ELT) PIPELINE ----------
+def run_pushdown_etl():
+    start_time = time.time()
+    logger.info("🚀 Starting pushdown ETL pipeline (cleaning runs inside PostgreSQL)...")
+
+    engine = None
+    failed_tables = []
+
+    try:
+        engine = get_engine()
+        create_schema(engine, SCHEMA_NAME)
+
+        for table_name in TABLES_TO_EXTRACT:
+            try:
+                reset_fingerprint_index(table_name)
+                with metrics.track(table_name, "pushdown"), connection_stage("pushdown"):
+                    pushdown_clean_table(engine, table_name, CLEANING_CONFIG, SCHEMA_NAME, SOURCE_SCHEMA_NAME)
+            except Exception as e:
+                logger.error(f"❌ Pushdown failed for table '{table_name}': {e}", exc_info=True)
+                failed_tables.append(table_name)
+
+        elapsed = round(time.time() - start_time, 2)
+        if failed_tables:
+            logger.warning(f"⚠️ Pushdown ETL finished in {elapsed} seconds with failed tables: {failed_tables}")
+        else:
+            logger.info(f"✅ Pushdown ETL pipeline completed successfully in {elapsed} seconds.")
+
+    except Exception as e:
+        logger.exception(f"❌ Pushdown ETL pipeline failed due to an unexpected error: {e}")
+
+    finally:
+        dispose_engine()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Insurance data ETL pipeline")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--stream", action="store_true",
+                      help="Stream tables chunk by chunk with bounded memory")
+    mode.add_argument("--pipelined", action="store_true",
+                      help="Overlap extract, transform and load across tables")
+    mode.add_argument("--incremental", action="store_true",
+                      help="Extract rows past each table's watermark and upsert them")
+    mode.add_argument("--pushdown", action="store_true",
+                      help="Run the cleaning plan as SQL inside PostgreSQL (ELT)")
+    mode.add_argument("--resume", nargs="?", const="latest", metavar="RUN_ID",
+                      help="Finish a failed batch run from its checkpoints (default: the latest one)")
+    parser.add_argument("--source", choices=["postgres", "files"], default=EXTRACT_SOURCE,
+                        help="Read raw tables from PostgreSQL or from CSV/Parquet files in data/")
+    parser.add_argument("--chunk-size", type=int, default=ETL_CHUNK_SIZE,
+                        help="Rows per chunk in streaming mode")
+    parser.add_argument("--extract-workers", type=int, default=EXTRACT_MAX_WORKERS,
+                        help="Tables extracted concurrently (1 = sequential)")
+    parser.add_argument("--transform-workers", type=int, default=TRANSFORM_MAX_WORKERS,
+                        help="Processes used to clean tables (1 = in-process)")
+    parser.add_argument("--metrics", action=argparse.BooleanOptionalAction, default=METRICS_ENABLED,
+                        help="Record per-stage metrics and write a JSON report and Prometheus textfile")
+    parser.add_argument("--integrity", action=argparse.BooleanOptionalAction, default=INTEGRITY_ENABLED,
+                        help="Quarantine rows whose foreign keys match no parent row (not in --pushdown)")
+    parser.add_argument("--checkpoints", action=argparse.BooleanOptionalAction, default=CHECKPOINTS_ENABLED,
+                        help="Save each table after every stage of a batch run so it can be resumed")
+    parser.add_argument("--staging-cache", action=argparse.BooleanOptionalAction, default=STAGING_CACHE_ENABLED,
+                        help="Reuse local snapshots of tables whose source is unchanged")
+    parser.add_argument("--backend", choices=["pandas", "duckdb"], default=CLEANING_CONFIG.get("backend", "pandas"),
+                        help="Engine that cleans each table (streamed chunks always use pandas)")
+    return parser.parse_args()
+
 
 # ---------- MAIN ENTRY ----------
 if __name__ == "__main__":
-    run_etl()
+    args = parse_args()
+    metrics.enable(args.metrics)
+    CLEANING_CONFIG["backend"] = args.backend
+
+    if args.stream:
+        run_streaming_etl(args.chunk_size, source=args.source, integrity=args.integrity)
+    elif args.pipelined:
+        run_pipelined_etl(use_cache=args.staging_cache, source=args.source, integrity=args.integrity)
+    elif args.incremental:
+        run_incremental_etl(integrity=args.integrity)
+    elif args.pushdown:
+        run_pushdown_etl()
+    else:
+        run_etl(extract_workers=args.extract_workers, transform_workers=args.transform_workers,
+                use_cache=args.staging_cache, source=args.source, integrity=args.integrity,
+                checkpoints=args.checkpoints, resume=args.resume)
+
+    metrics.export_metrics(extra={"connection_wait": connection_wait_stats()})
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from config.config import CHECKPOINT_DIR, CHECKPOINT_MAX_RUNS
+from utils.arrow_frames import pa, to_arrow_exact, from_arrow_exact
+from utils.logger import logger
+
+MANIFEST_NAME = "manifest.json"
+STAGES = ("extract", "transform", "load")
+
+
+# ---------- RUN IDENTITY ----------
+def config_hash(*parts):
+    """Short digest of everything that shapes a run's outputs (cleaning config, source, ...)."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def new_run_id():
+    """Sortable run id: start time plus a random suffix."""
+    return f"{datetime.now().strftime('%Y%m%dT%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+# ---------- CHECKPOINT STORE ----------
+class CheckpointStore:
+    """
+    Per-run store of each table's output after each stage.
+
+    Frames are written as uncompressed Arrow IPC files (pickled if Arrow
+    cannot round-trip them exactly) under `<checkpoint_dir>/<run_id>/`,
+    next to a manifest recording the run's config hash, its status and
+    which table x stage checkpoints exist. The load stage stores no frame,
+    only the fact that the table was loaded. A completed run's directory is
+    removed; failed runs are kept for `--resume`.
+
+        store = CheckpointStore.create(config_hash(CLEANING_CONFIG))
+        store.save("insurance_claims", "extract", raw)
+        ...
+        store = CheckpointStore.open("latest", config_hash(CLEANING_CONFIG))
+        if store.has("insurance_claims", "transform"):
+            cleaned = store.load("insurance_claims", "transform")
+    """
+
+    def __init__(self, run_id, manifest, checkpoint_dir=CHECKPOINT_DIR):
+        self.run_id = run_id
+        self.manifest = manifest
+        self.path = os.path.join(checkpoint_dir, run_id)
+        self._lock = threading.Lock()
+
+    # --- runs ---
+    @classmethod
+    def create(cls, digest, checkpoint_dir=CHECKPOINT_DIR):
+        """Start a new run's store (pruning the oldest kept runs past CHECKPOINT_MAX_RUNS)."""
+        prune_runs(checkpoint_dir, CHECKPOINT_MAX_RUNS - 1)
+        run_id = new_run_id()
+        manifest = {
+            "run_id": run_id,
+            "config_hash": digest,
+            "created": time.time(),
+            "status": "running",
+            "error": None,
+            "tables": {},
+        }
+        store = cls(run_id, manifest, checkpoint_dir)
+        os.makedirs(store.path, exist_ok=True)
+        store._save_manifest()
+        return store
+
+    @classmethod
+    def open(cls, run_id, digest, checkpoint_dir=CHECKPOINT_DIR):
+        """
+        Reopen a failed run to resume it; `run_id="latest"` picks the most
+        recent one. Raises ValueError if there is no such run or it was made
+        with a different config hash (its checkpoints would not match).
+        """
+        if run_id == "latest":
+            runs = list_runs(checkpoint_dir)
+            if not runs:
+                logger.error(f"❌ No failed runs to resume in {checkpoint_dir}")
+                raise ValueError(f"No failed runs to resume in {checkpoint_dir}")
+            run_id = runs[-1]["run_id"]
+
+        manifest_path = os.path.join(checkpoint_dir, run_id, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            logger.error(f"❌ No checkpoints found for run '{run_id}'")
+            raise ValueError(f"No checkpoints found for run '{run_id}'")
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if manifest["config_hash"] != digest:
+            logger.error(f"❌ Run '{run_id}' was made with a different configuration; it cannot be resumed")
+            raise ValueError(f"Run '{run_id}' was made with a different configuration")
+
+        manifest["status"] = "running"
+        store = cls(run_id, manifest, checkpoint_dir)
+        store._save_manifest()
+        return store
+
+    def _save_manifest(self):
+        path = os.path.join(self.path, MANIFEST_NAME)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+    # --- checkpoints ---
+    def has(self, table, stage):
+        return stage in self.manifest["tables"].get(table, {})
+
+    def done(self, table):
+        """True once `table` has been loaded in this run."""
+        return self.has(table, "load")
+
+    def save(self, table, stage, df=None):
+        """Record that `table` finished `stage`, persisting its output frame if given."""
+        entry = {"saved": time.time()}
+        if df is not None:
+            entry.update(self._write_frame(table, stage, df))
+        with self._lock:
+            self.manifest["tables"].setdefault(table, {})[stage] = entry
+            self._save_manifest()
+
+    def load(self, table, stage):
+        """The frame `table` produced in `stage`."""
+        entry = self.manifest["tables"][table][stage]
+        path = os.path.join(self.path, entry["file"])
+        if entry["format"] == "arrow":
+            with pa.memory_map(path, "r") as source:
+                df = from_arrow_exact(pa.ipc.open_file(source).read_all(), entry["nan_columns"])
+        else:
+            with open(path, "rb") as f:
+                df = pickle.load(f)
+        logger.info(f"✅ Restored {len(df)} rows of '{table}' from the {stage} checkpoint of run {self.run_id}")
+        return df
+
+    def _write_frame(self, table, stage, df):
+        table_data, nan_columns = to_arrow_exact(df)
+        if table_data is not None:
+            name = f"{table}.{stage}.arrow"
+            tmp_path = os.path.join(self.path, f"{name}.tmp")
+            with pa.OSFile(tmp_path, "wb") as sink:
+                with pa.ipc.new_file(sink, table_data.schema) as writer:
+                    writer.write_table(table_data)
+            entry = {"file": name, "format": "arrow", "nan_columns": nan_columns, "rows": len(df)}
+        else:
+            name = f"{table}.{stage}.pkl"
+            tmp_path = os.path.join(self.path, f"{name}.tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+            entry = {"file": name, "format": "pickle", "nan_columns": [], "rows": len(df)}
+        os.replace(tmp_path, os.path.join(self.path, name))
+        return entry
+
+    # --- outcome ---
+    def complete(self):
+        """Every table is loaded: the checkpoints are no longer needed."""
+        shutil.rmtree(self.path, ignore_errors=True)
+        logger.info(f"✅ Run {self.run_id} complete; removed its checkpoints")
+
+    def fail(self, error):
+        """Keep the checkpoints so `python main.py --resume` can pick the run up."""
+        with self._lock:
+            self.manifest["status"] = "failed"
+            self.manifest["error"] = str(error)
+            self._save_manifest()
+        logger.warning(f"⚠️ Run {self.run_id} did not finish; resume it with: python main.py --resume {self.run_id}")
+
+
+class _NullCheckpointStore:
+    """Stand-in when checkpointing is off: nothing is ever saved or found."""
+
+    run_id = None
+
+    def has(self, table, stage):
+        return False
+
+    def done(self, table):
+        return False
+
+    def save(self, table, stage, df=None):
+        pass
+
+    def complete(self):
+        pass
+
+    def fail(self, error):
+        pass
+
+
+NULL_STORE = _NullCheckpointStore()
+
+
+# ---------- RUN HOUSEKEEPING ----------
+def list_runs(checkpoint_dir=CHECKPOINT_DIR):
+    """Manifests of the kept (failed or interrupted) runs, oldest first."""
+    if not os.path.isdir(checkpoint_dir):
+        return []
+    runs = []
+    for run_id in os.listdir(checkpoint_dir):
+        path = os.path.join(checkpoint_dir, run_id, MANIFEST_NAME)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                runs.append(json.load(f))
+    return sorted(runs, key=lambda manifest: manifest["created"])
+
+
+def prune_runs(checkpoint_dir=CHECKPOINT_DIR, keep=CHECKPOINT_MAX_RUNS):
+    """Delete the oldest kept runs so at most `keep` remain."""
+    runs = list_runs(checkpoint_dir)
+    for manifest in runs[:max(0, len(runs) - keep)]:
+        shutil.rmtree(os.path.join(checkpoint_dir, manifest["run_id"]), ignore_errors=True)
+        logger.info(f"Pruned checkpoints of run {manifest['run_id']}")
+
+
+# ---------- STANDALONE TEST ----------
+if __name__ == "__main__":
+    for manifest in list_runs():
+        stages = {
+            table: sorted(entries, key=STAGES.index)
+            for table, entries in manifest["tables"].items()
+        }
+        print(f"{manifest['run_id']} [{manifest['status']}] config {manifest['config_hash']}: {stages}")
+        if manifest["error"]:
+            print(f"    error: {manifest['error']}")
@@ -0,0 +1,390 @@
+import re
+import time
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from config.config import TEXT_CACHE_SIZE
+from scripts.column_stats import imputation_statistic, compute_fill_value
+from scripts.type_conversion import parse_datetime, datetime_format_for, optimize_dtypes
+from utils.logger import logger
+from utils.metrics import instrument
+
+# Characters kept by text cleaning (after lowercasing)
+TEXT_CLEAN_PATTERN = r"[^a-z0-9\s\.,'-]"
+_TEXT_CLEAN_RE = re.compile(TEXT_CLEAN_PATTERN)
+
+
+# --- Plan Compilation ---
+
+def normalize_column_names(columns):
+    """Same normalization as transform.enforce_column_naming, as a plain Index."""
+    return (
+        pd.Index(columns)
+        .str.strip()
+        .str.lower()
+        .str.replace(r'[^\w\s]', '', regex=True)
+        .str.replace(r'\s+', '_', regex=True)
+    )
+
+
+def compile_cleaning_plan(table_name, config):
+    """
+    Resolve CLEANING_CONFIG for one table into a reusable cleaning plan.
+
+    The plan is built once per table and can be applied to any number of
+    frames or chunks of that table with `apply_cleaning_plan`.
+    """
+    tables_config = config.get('tables', {})
+    if table_name not in tables_config:
+        logger.error(f"❌ No config found for table: {table_name}")
+        raise ValueError(f"No config found for table: {table_name}")
+
+    columns_config = tables_config[table_name].get('columns', {})
+    return {
+        "table": table_name,
+        "columns": columns_config,
+        "critical": [col for col, conf in columns_config.items() if conf.get('critical', False)],
+        "string_columns": {col for col, conf in columns_config.items() if conf.get('dtype') == 'string'},
+        "drop_column_threshold": config.get('drop_column_threshold', 0.5),
+        "drop_row_threshold": config.get('drop_row_threshold', 0.5),
+        "categorical_max_unique": config.get('categorical_max_unique', 0),
+        "categorical_max_ratio": config.get('categorical_max_ratio', 1.0),
+        "impute_stats": config.get('impute_stats', 'exact'),
+        "stream_impute_stats": config.get('stream_impute_stats', 'approx'),
+        "downcast_numeric": config.get('downcast_numeric', False),
+        "string_storage": config.get('string_storage', 'python'),
+        # Date format per datetime column, detected on the first frame cleaned with this plan
+        "datetime_formats": {},
+    }
+
+
+def detect_datetime_formats(df, plan):
+    """Detect the date formats of a whole raw frame up front (before it is split into partitions)."""
+    columns_config = plan["columns"]
+    for name, col in zip(normalize_column_names(df.columns), df.columns):
+        if columns_config.get(name, {}).get('dtype') == 'datetime':
+            datetime_format_for(name, df[col], plan["datetime_formats"])
+    return plan
+
+
+# --- Column Operations ---
+
+def cast_column(series, dtype, date_format=None):
+    """Cast one column like transform.standardize_data_types (string handled in clean_text)."""
+    if dtype == 'datetime':
+        return parse_datetime(series, date_format)
+    if dtype == 'int':
+        return pd.to_numeric(series, errors='coerce').astype('Int64')
+    if dtype == 'float':
+        return pd.to_numeric(series, errors='coerce')
+    return series
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def strip_text_value(value):
+    return value.strip()
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def clean_text_value(value):
+    """Trim, lowercase and character-filter one string (memoized across columns and chunks)."""
+    return _TEXT_CLEAN_RE.sub('', value.strip().lower())
+
+
+def map_unique_text(series, func, max_categories=0):
+    """
+    Apply a str -> str function to a column's distinct values only.
+
+    Equivalent to `func` over `series.astype(str)` row by row, but the work
+    is proportional to the column's cardinality: values are factorized, each
+    distinct value is mapped once, and results are scattered back through
+    the codes. Nulls become 'nan'/'None' text exactly as astype(str) does.
+
+    If the mapped column has at most `max_categories` distinct values it is
+    returned as a `category` with sorted categories, else as object.
+    """
+    if not (series.dtype == object or isinstance(series.dtype, (pd.CategoricalDtype, pd.StringDtype))):
+        series = series.astype(str)
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    labels = [func(str(value)) for value in uniques]
+
+    na_positions = np.flatnonzero(codes == -1)
+    if len(na_positions):
+        na_text = np.array([str(value) for value in series.iloc[na_positions]], dtype=object)
+        na_codes, na_uniques = pd.factorize(na_text)
+        codes[na_positions] = len(labels) + na_codes
+        labels.extend(func(value) for value in na_uniques)
+
+    # Distinct raw values can map to the same text ('A ' and 'a'); collapse them
+    label_codes, categories = pd.factorize(np.array(labels, dtype=object))
+    codes = label_codes[codes] if len(codes) else codes
+
+    if 0 < len(categories) <= max_categories:
+        order = np.argsort(categories)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        values = pd.Categorical.from_codes(rank[codes], categories[order])
+    else:
+        values = categories.take(codes) if len(codes) else np.array([], dtype=object)
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def clean_text(series, max_categories=0):
+    """Single pass of str cast, trim, lowercase and character filtering over distinct values."""
+    return map_unique_text(series, clean_text_value, max_categories)
+
+
+@instrument("transform")
+def categorize_low_cardinality(df, columns_config, max_unique, max_ratio=1.0):
+    """
+    Store text columns with few distinct values as `category`.
+
+    A column qualifies with at most `max_unique` distinct values and at most
+    `max_ratio` distinct values per row. Runs last in every cleaning path,
+    so the final dtypes never depend on how a table was chunked, partitioned
+    or filtered. Columns can opt out with "categorical": False in
+    CLEANING_CONFIG.
+    """
+    if not max_unique:
+        return df
+
+    limit = min(max_unique, max_ratio * len(df))
+    for col in df.columns:
+        series = df[col]
+        is_category = isinstance(series.dtype, pd.CategoricalDtype)
+        if not is_category and series.dtype != object:
+            continue
+
+        opted_out = columns_config.get(col, {}).get('categorical', True) is False
+        if is_category:
+            series = series.cat.remove_unused_categories()
+            unique_count = len(series.cat.categories)
+        else:
+            unique_count = series.nunique(dropna=False)
+
+        if opted_out or unique_count > limit:
+            if is_category:
+                df[col] = series.astype(object)
+        elif is_category:
+            if not series.cat.categories.is_monotonic_increasing:
+                series = series.cat.reorder_categories(sorted(series.cat.categories))
+            df[col] = series
+        elif pd.api.types.infer_dtype(series, skipna=False) == "string":
+            df[col] = series.astype(pd.CategoricalDtype(sorted(series.unique())))
+    return df
+
+
+def impute_value(series, strategy, col_conf, name, stats=None, default_stats="exact"):
+    """
+    Fill value for a column, matching transform.impute_missing_values.
+
+    Medians and modes come from `stats` (a column_stats.TableStats that has
+    already observed this column) when given, else from `series` itself.
+    """
+    if strategy not in ('median', 'mode', 'constant', 'default'):
+        logger.error(f"❌ Unknown imputation strategy '{strategy}' for column '{name}'")
+        raise ValueError(f"Unknown imputation strategy '{strategy}' for column '{name}'")
+    if strategy == 'constant':
+        return col_conf.get('value', 'Unknown')
+
+    statistic = imputation_statistic(series, strategy)
+    if statistic is None:
+        return 'Unknown'
+    if stats is not None:
+        value = stats.fill_value(name)
+    else:
+        value = compute_fill_value(series, statistic, col_conf, default_stats)
+    if value is None:
+        return 0 if statistic == 'median' else 'Unknown'
+    if statistic == 'median' and pd.api.types.is_integer_dtype(series) and value != int(value):
+        # A median between two integers (e.g. 48.5) cannot fill an Int64 column;
+        # round half away from zero like the pushdown backend's CAST to bigint
+        value = float(np.sign(value) * np.floor(abs(value) + 0.5))
+    return value
+
+
+# --- Plan Execution ---
+
+@instrument("transform")
+def prepare_columns(df, plan):
+    """
+    Row-local half of the plan: normalize names, cast typed columns and
+    clean config string columns.
+
+    Every output row depends only on its input row, so this phase can run
+    on row partitions independently (see scripts/parallel_transform.py).
+    """
+    columns_config = plan["columns"]
+    names = normalize_column_names(df.columns)
+
+    columns = {}
+    for name, col in zip(names, df.columns):
+        series = df[col]
+        dtype = columns_config.get(name, {}).get('dtype')
+        try:
+            if dtype == 'string':
+                # Cast to str, trim, lowercase and filter in one pass; never null afterwards
+                categorical = columns_config[name].get('categorical', True) is not False
+                series = clean_text(series, plan["categorical_max_unique"] if categorical else 0)
+            elif dtype == 'datetime':
+                series = cast_column(series, dtype, datetime_format_for(name, series, plan["datetime_formats"]))
+            elif dtype is not None:
+                series = cast_column(series, dtype)
+        except Exception as e:
+            logger.error(f"❌ Error converting '{name}' to {dtype}: {e}", exc_info=True)
+        columns[name] = series
+
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+@instrument("transform")
+def finalize_columns(prepared, plan, stats=None):
+    """
+    Whole-table half of the plan: column drops, row drops, imputation,
+    text cleaning of the remaining object columns and deduplication.
+
+    Null masks are computed once and shared by every decision. With
+    `stats` (a column_stats.TableStats), every kept row is observed first
+    and medians/modes come from all rows observed so far, e.g. earlier
+    chunks of a streamed table.
+    """
+    columns_config = plan["columns"]
+    string_columns = plan["string_columns"]
+    names = list(prepared.columns)
+
+    # 1. Null masks, computed once
+    nulls = np.zeros((len(prepared), len(names)), dtype=bool)
+    for j, name in enumerate(names):
+        if name not in string_columns:
+            nulls[:, j] = prepared[name].isna().to_numpy()
+
+    # 2. Column drops
+    critical = plan["critical"]
+    drop_threshold = plan["drop_column_threshold"]
+    col_ratios = nulls.mean(axis=0) if len(prepared) else np.full(len(names), np.nan)
+    keep = [j for j, name in enumerate(names) if not (col_ratios[j] > drop_threshold) or name in critical]
+    dropped = [names[j] for j in range(len(names)) if j not in set(keep)]
+    names = [names[j] for j in keep]
+    nulls = nulls[:, keep]
+
+    # 3. Row drops
+    missing_critical = [col for col in critical if col not in names]
+    if missing_critical:
+        logger.error(f"❌ Critical columns missing from DataFrame: {missing_critical}")
+        raise ValueError(f"Critical columns missing from DataFrame: {missing_critical}")
+
+    critical_idx = [names.index(col) for col in critical]
+    row_mask = ~nulls[:, critical_idx].any(axis=1)
+    if names:
+        row_mask &= nulls.mean(axis=1) <= plan["drop_row_threshold"]
+    rows = np.flatnonzero(row_mask)
+    nulls = nulls[rows]
+
+    # 4. Per column: row filter, impute, text clean
+    cleaned = {}
+    for j, name in enumerate(names):
+        series = prepared[name].take(rows)
+        col_conf = columns_config.get(name, {})
+
+        strategy = col_conf.get('impute', 'default')
+        if stats is not None and strategy != 'skip':
+            stats.observe(name, series, strategy, col_conf)
+        if nulls[:, j].any() and strategy != 'skip':
+            value = impute_value(series, strategy, col_conf, name, stats, plan["impute_stats"])
+            series = series.fillna(value)
+
+        # Config string columns were already cleaned in prepare_columns
+        if name not in string_columns and series.dtype == object and col_conf.get('dtype') != 'datetime':
+            try:
+                series = clean_text(series)
+            except Exception as e:
+                logger.error(f"❌ Error cleaning text in column '{name}': {e}", exc_info=True)
+
+        cleaned[name] = series
+
+    result = pd.DataFrame(cleaned, index=prepared.index[rows], copy=False)
+
+    # 5. Duplicates
+    before = len(result)
+    result = result.drop_duplicates()
+    result = categorize_low_cardinality(
+        result, columns_config, plan["categorical_max_unique"], plan["categorical_max_ratio"]
+    )
+    result = optimize_dtypes(result, plan["downcast_numeric"], plan["string_storage"], plan["table"])
+    logger.info(
+        "✅ Applied cleaning plan to '%s': dropped columns %s, %d null rows and %d duplicates",
+        plan['table'], dropped, len(prepared) - before, before - len(result)
+    )
+    return result
+
+
+def apply_cleaning_plan(df, plan, stats=None):
+    """
+    Clean a DataFrame with a compiled plan.
+
+    Produces the same result as the step-by-step `clean_table` pipeline,
+    but each column is cast or text-cleaned once, null masks are computed
+    once, and no intermediate copies of the whole frame are made. The input
+    frame is not modified.
+    """
+    return finalize_columns(prepare_columns(df, plan), plan, stats)
+
+
+def observe_statistics(df, plan, stats, columns=None):
+    """
+    Feed the typed, not yet imputed values of a raw frame into `stats`.
+
+    Used to record only the rows that were actually loaded (e.g. after rows
+    merged by earlier runs were filtered out), limited to `columns` (the
+    cleaned frame's columns) when given.
+    """
+    prepared = prepare_columns(df, plan)
+    for name in prepared.columns:
+        if columns is not None and name not in columns:
+            continue
+        col_conf = plan["columns"].get(name, {})
+        strategy = col_conf.get('impute', 'default')
+        if strategy != 'skip':
+            stats.observe(name, prepared[name], strategy, col_conf)
+    return stats
+
+
+# --- Parity and speedup check ---
+
+def compare_with_stepwise(df, table_name, config):
+    """
+    Run the fused plan and the step-by-step pipeline on copies of `df`,
+    assert identical output and return the measured speedup.
+    """
+    from scripts.transform import clean_table_stepwise
+
+    start = time.perf_counter()
+    expected = clean_table_stepwise(df.copy(), table_name, config)
+    stepwise_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plan = compile_cleaning_plan(table_name, config)
+    actual = apply_cleaning_plan(df, plan)
+    fused_seconds = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(actual, expected)
+    speedup = stepwise_seconds / fused_seconds if fused_seconds > 0 else float("inf")
+    logger.info(
+        f"✅ Cleaning plan parity for '{table_name}': stepwise {stepwise_seconds:.3f}s, "
+        f"fused {fused_seconds:.3f}s ({speedup:.1f}x)"
+    )
+    return speedup
+
+
+# ---------- STANDALONE TEST ----------
+if __name__ == "__main__":
+    import glob
+    import os
+    from config.config import CLEANING_CONFIG
+
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+    for path in sorted(glob.glob(os.path.join(data_dir, "insurance_*.csv"))):
+        table = os.path.splitext(os.path.basename(path))[0]
+        speedup = compare_with_stepwise(pd.read_csv(path), table, CLEANING_CONFIG)
+        print(f"{table}: identical output, {speedup:.1f}x faster")
@@ -0,0 +1,451 @@
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
+from config.config import STATS_DIR, QUANTILE_COMPRESSION, HEAVY_HITTER_CAPACITY, EXACT_STATS_MAX_VALUES
+from utils.logger import logger
+
+
+# ---------- QUANTILE SKETCH ----------
+class QuantileSketch:
+    """
+    Mergeable t-digest for approximate quantiles of a numeric column.
+
+    Values are kept as weighted centroids, small near the tails and larger
+    in the middle (k1 scale function), so memory stays around
+    `compression / 2` centroids however many values are added. Adding a
+    chunk and merging two sketches are the same operation: the centroid
+    lists are combined, sorted and re-clustered in one vectorized pass.
+    """
+
+    def __init__(self, compression=QUANTILE_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self._absorb(values, np.ones(len(values)), values.min(), values.max())
+
+    def merge(self, other):
+        if len(other.means):
+            self._absorb(other.means, other.weights, other.min, other.max)
+
+    def _absorb(self, means, weights, low, high):
+        means = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind="mergesort")
+        means, weights = means[order], weights[order]
+        self.min, self.max = min(self.min, low), max(self.max, high)
+
+        # Cluster by the integer part of k(q) at each centroid's midpoint
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * math.pi) * np.arcsin(2 * q - 1)
+        clusters = np.floor(k - k[0]).astype(np.int64)
+        _, clusters = np.unique(clusters, return_inverse=True)
+
+        merged_weights = np.bincount(clusters, weights=weights)
+        self.means = np.bincount(clusters, weights=means * weights) / merged_weights
+        self.weights = merged_weights
+
+    def quantile(self, q):
+        """Interpolated q-quantile, or None if no values were added."""
+        if not len(self.means):
+            return None
+        if len(self.means) == 1:
+            return float(self.means[0])
+
+        positions = np.cumsum(self.weights) - self.weights / 2
+        target = q * self.weights.sum()
+        xs = np.concatenate([[0.0], positions, [self.weights.sum()]])
+        ys = np.concatenate([[self.min], self.means, [self.max]])
+        return float(np.interp(target, xs, ys))
+
+    def to_dict(self):
+        return {
+            "compression": self.compression,
+            "means": self.means.tolist(),
+            "weights": self.weights.tolist(),
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["compression"])
+        sketch.means = np.asarray(data["means"], dtype=float)
+        sketch.weights = np.asarray(data["weights"], dtype=float)
+        if data["min"] is not None:
+            sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
+
+
+# ---------- FREQUENCY SKETCH ----------
+class FrequencySketch:
+    """
+    Value counts of a column, exact or bounded.
+
+    With `capacity=None` every distinct value is counted, which gives the
+    exact mode and (for numeric columns) the exact median. With a capacity
+    it is a Misra-Gries heavy-hitter summary: after each merge only the
+    `capacity` largest counters are kept, each lowered by the first
+    dropped count, so any value occurring more than total / capacity times
+    is guaranteed to survive.
+    """
+
+    def __init__(self, capacity=None, kind=None):
+        self.capacity = capacity
+        self.kind = kind
+        self.counts = pd.Series(dtype="int64")
+        self.total = 0
+
+    @staticmethod
+    def kind_of(series):
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return "datetime"
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            return "numeric"
+        return "text"
+
+    def update(self, series):
+        if self.kind is None:
+            self.kind = self.kind_of(series)
+        counts = series.value_counts(dropna=True, sort=False)
+        if isinstance(counts.index, pd.CategoricalIndex):
+            counts.index = counts.index.astype(object)
+        self._absorb(counts[counts > 0], int(counts.sum()))
+
+    def merge(self, other):
+        if self.kind is None:
+            self.kind = other.kind
+        self._absorb(other.counts, other.total)
+
+    def _absorb(self, counts, total):
+        self.total += total
+        if self.counts.empty:
+            merged = counts.astype("int64")
+        else:
+            merged = self.counts.add(counts, fill_value=0).astype("int64")
+
+        if self.capacity is not None and len(merged) > self.capacity:
+            ranked = merged.sort_values(ascending=False, kind="mergesort")
+            floor = ranked.iloc[self.capacity]
+            merged = ranked.iloc[:self.capacity] - floor
+            merged = merged[merged > 0]
+        self.counts = merged
+
+    def mode(self):
+        """Most frequent value; ties go to the smallest value, as in Series.mode()."""
+        if self.counts.empty:
+            return None
+        candidates = self.counts.index[self.counts == self.counts.max()]
+        try:
+            return candidates.sort_values()[0]
+        except TypeError:
+            return candidates[0]
+
+    def median(self):
+        """Exact median of the counted values (numeric columns, exact mode only)."""
+        if self.counts.empty:
+            return None
+        counts = self.counts.sort_index()
+        cumulative = counts.to_numpy().cumsum()
+        values = counts.index.to_numpy(dtype=float)
+        n = cumulative[-1]
+        upper = values[np.searchsorted(cumulative, n // 2, side="right")]
+        if n % 2:
+            return float(upper)
+        lower = values[np.searchsorted(cumulative, n // 2 - 1, side="right")]
+        return float((lower + upper) / 2)
+
+    def to_dict(self):
+        if self.kind == "datetime":
+            values = [value.isoformat() for value in self.counts.index]
+        elif self.kind == "numeric":
+            values = [value.item() if hasattr(value, "item") else value for value in self.counts.index]
+        else:
+            values = [str(value) for value in self.counts.index]
+        return {
+            "capacity": self.capacity,
+            "kind": self.kind,
+            "total": self.total,
+            "values": values,
+            "counts": self.counts.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["capacity"], data["kind"])
+        values = data["values"]
+        if data["kind"] == "datetime":
+            values = pd.to_datetime(values)
+        sketch.counts = pd.Series(data["counts"], index=values, dtype="int64")
+        sketch.total = data["total"]
+        return sketch
+
+
+# ---------- COLUMN / TABLE STATISTICS ----------
+def imputation_statistic(series, strategy):
+    """'median' or 'mode' if the strategy fills from the data, else None."""
+    if strategy == 'median':
+        return 'median'
+    if strategy == 'mode':
+        return 'mode'
+    if strategy == 'default' and pd.api.types.is_numeric_dtype(series):
+        return 'median'
+    return None
+
+
+def uses_exact_stats(col_conf, default="exact"):
+    """Per-column switch: "stats": "exact" | "approx" in CLEANING_CONFIG (else the table default)."""
+    mode = col_conf.get('stats', default)
+    if mode not in ("exact", "approx"):
+        logger.error(f"❌ Unknown stats mode '{mode}' (expected 'exact' or 'approx')")
+        raise ValueError(f"Unknown stats mode '{mode}' (expected 'exact' or 'approx')")
+    return mode == "exact"
+
+
+class ColumnStats:
+    """
+    Running median or mode of one column.
+
+    Exact columns count every distinct value; approximate columns keep a
+    t-digest (median) or a heavy-hitter summary (mode) of bounded size.
+    Both can be updated chunk by chunk, merged across partitions and saved.
+    An exact column that counts more than `max_values` distinct values
+    (e.g. amounts, nearly one value per row) falls back to the approximate
+    sketch, so memory and saved state stay bounded.
+    """
+
+    def __init__(self, statistic, exact=True, max_values=EXACT_STATS_MAX_VALUES):
+        self.statistic = statistic
+        self.exact = exact
+        self.max_values = max_values
+        # True once an exact column has fallen back to the approximate sketch
+        self.capped = False
+        if exact:
+            self.sketch = FrequencySketch()
+        elif statistic == 'median':
+            self.sketch = QuantileSketch()
+        else:
+            self.sketch = FrequencySketch(HEAVY_HITTER_CAPACITY)
+
+    def update(self, series):
+        if isinstance(self.sketch, QuantileSketch):
+            self.sketch.update(pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan))
+        else:
+            self.sketch.update(series)
+        self._enforce_cap()
+
+    def merge(self, other):
+        if self.exact and not other.exact:
+            self._fall_back()
+            self.capped = True
+        if other.exact and not self.exact:
+            other = ColumnStats.from_dict(other.to_dict())
+            other._fall_back()
+        self.sketch.merge(other.sketch)
+        self._enforce_cap()
+
+    def _enforce_cap(self):
+        if self.exact and self.max_values and len(self.sketch.counts) > self.max_values:
+            logger.warning(
+                f"⚠️ {self.statistic.capitalize()} counts exceeded {self.max_values} distinct values; "
+                "switching to the approximate sketch"
+            )
+            self._fall_back()
+            self.capped = True
+
+    def _fall_back(self):
+        """Replace the exact value counts by the equivalent approximate sketch."""
+        counts = self.sketch.counts
+        if self.statistic == 'median':
+            sketch = QuantileSketch()
+            if not counts.empty:
+                values = counts.index.to_numpy(dtype=float)
+                sketch._absorb(values, counts.to_numpy(dtype=float), values.min(), values.max())
+        else:
+            sketch = FrequencySketch(HEAVY_HITTER_CAPACITY, self.sketch.kind)
+            sketch._absorb(counts, self.sketch.total)
+        self.sketch = sketch
+        self.exact = False
+
+    def value(self):
+        """Current fill value, or None if no values have been seen."""
+        if self.statistic == 'mode':
+            return self.sketch.mode()
+        if self.exact:
+            return self.sketch.median()
+        return self.sketch.quantile(0.5)
+
+    def to_dict(self):
+        return {
+            "statistic": self.statistic,
+            "exact": self.exact,
+            "capped": self.capped,
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        column = cls(data["statistic"], data["exact"])
+        column.capped = data.get("capped", False)
+        sketch_class = FrequencySketch if "counts" in data["sketch"] else QuantileSketch
+        column.sketch = sketch_class.from_dict(data["sketch"])
+        return column
+
+
+class TableStats:
+    """
+    Imputation statistics of one table, accumulated across chunks, row
+    partitions or runs.
+
+    `observe` feeds a column's non-null values (called for every chunk,
+    whether or not it has nulls); `fill_value` returns the median or mode
+    of everything observed so far. Streaming runs therefore impute in one
+    pass with the statistics of all rows seen up to the current chunk.
+    """
+
+    def __init__(self, table, default="exact"):
+        self.table = table
+        self.default = default
+        self.columns = {}
+
+    def observe(self, name, series, strategy, col_conf):
+        # Config string columns are cleaned to text and never null, so never imputed
+        statistic = imputation_statistic(series, strategy)
+        if statistic is None or col_conf.get('dtype') == 'string':
+            return
+        exact = uses_exact_stats(col_conf, self.default)
+        column = self.columns.get(name)
+        # A column capped to the approximate sketch keeps it rather than restarting exact counts
+        changed = column is not None and column.exact != exact and not (column.capped and exact)
+        if column is None or column.statistic != statistic or changed:
+            column = self.columns[name] = ColumnStats(statistic, exact)
+        column.update(series)
+
+    def fill_value(self, name):
+        column = self.columns.get(name)
+        return column.value() if column is not None else None
+
+    def merge(self, other):
+        for name, column in other.columns.items():
+            mine = self.columns.get(name)
+            if mine is None:
+                self.columns[name] = column
+            elif mine.statistic == column.statistic and (
+                    mine.exact == column.exact or mine.capped or column.capped):
+                mine.merge(column)
+            else:
+                logger.warning(f"⚠️ Statistics for '{self.table}.{name}' changed kind; keeping the newer ones")
+                self.columns[name] = column
+        return self
+
+    def to_dict(self):
+        return {
+            "table": self.table,
+            "default": self.default,
+            "columns": {name: column.to_dict() for name, column in self.columns.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data["table"], data["default"])
+        stats.columns = {name: ColumnStats.from_dict(column) for name, column in data["columns"].items()}
+        return stats
+
+
+def compute_fill_value(series, statistic, col_conf, default="exact"):
+    """
+    Median or mode of one in-memory column. Exact columns use pandas
+    directly (one pass, unbounded: the column is in memory anyway);
+    approximate ones go through a throwaway sketch so a column gets the
+    same kind of value in batch and streaming runs.
+    """
+    if uses_exact_stats(col_conf, default):
+        if not series.notna().any():
+            return None
+        if statistic == 'median':
+            return series.median()
+        return series.mode().iloc[0]
+
+    column = ColumnStats(statistic, exact=False)
+    column.update(series)
+    return column.value()
+
+
+# ---------- PERSISTENCE ----------
+def _stats_path(table, stats_dir):
+    return os.path.join(stats_dir, f"{table}.json")
+
+
+def load_table_stats(table, default="exact", stats_dir=STATS_DIR):
+    """Statistics saved by an earlier run, or an empty TableStats."""
+    path = _stats_path(table, stats_dir)
+    if not os.path.exists(path):
+        return TableStats(table, default)
+    try:
+        with open(path, encoding="utf-8") as f:
+            stats = TableStats.from_dict(json.load(f))
+        stats.default = default
+        return stats
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read saved statistics for '{table}', starting fresh: {e}")
+        return TableStats(table, default)
+
+
+def save_table_stats(stats, stats_dir=STATS_DIR):
+    """Persist a table's statistics, replacing the state file atomically."""
+    os.makedirs(stats_dir, exist_ok=True)
+    path = _stats_path(stats.table, stats_dir)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stats.to_dict(), f)
+    os.replace(tmp_path, path)
+    logger.info(f"✅ Saved imputation statistics for '{stats.table}' ({len(stats.columns)} columns)")
+
+
+# ---------- STANDALONE TEST ----------
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    values = pd.Series(rng.lognormal(10, 1, 1_000_000))
+    chunks = [values.iloc[i:i + 50_000] for i in range(0, len(values), 50_000)]
+
+    # Sketches built per chunk and merged equal one sketch over everything
+    digest = QuantileSketch()
+    for chunk in chunks:
+        partial = QuantileSketch()
+        partial.update(chunk.to_numpy())
+        digest.merge(partial)
+    exact = values.median()
+    print(f"median exact {exact:.2f}, t-digest {digest.quantile(0.5):.2f} "
+          f"({abs(digest.quantile(0.5) - exact) / exact:.3%} off, {len(digest.means)} centroids)")
+
+    counts = FrequencySketch()
+    hitters = FrequencySketch(capacity=100)
+    categories = pd.Series(rng.zipf(1.5, 1_000_000) % 5000)
+    for chunk in (categories.iloc[i:i + 50_000] for i in range(0, len(categories), 50_000)):
+        counts.update(chunk)
+        hitters.update(chunk)
+    print(f"mode exact {categories.mode().iloc[0]}, counted {counts.mode()}, heavy hitters {hitters.mode()}")
+    print(f"median of counts {counts.median()} vs pandas {categories.median()}")
+
+    # An exact running median over a continuous column falls back instead of growing per row
+    capped = ColumnStats("median", exact=True, max_values=10_000)
+    for chunk in chunks:
+        capped.update(chunk)
+    assert capped.capped and not capped.exact and len(capped.sketch.means) < 1_000
+    print(f"capped exact median {capped.value():.2f} ({len(capped.sketch.means)} centroids)")
+
+    restored = TableStats.from_dict(json.loads(json.dumps(TableStats("demo").to_dict())))
+    print(f"round trip: {restored.to_dict()}")
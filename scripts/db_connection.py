@@ -1,47 +1,113 @@
+import contextvars
 import os
+import threading
 import time
-from sqlalchemy import create_engine, text
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, exc, text
 from sqlalchemy.engine.url import URL
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
+from config.config import DB_CONFIG, DB_POOL_CONFIG
 from utils.logger import logger
 
 # Load environment variables once
 load_dotenv()
 
-def get_engine(retries=3, backoff=2):
+# ---------- PROCESS-WIDE ENGINE REGISTRY ----------
+_engine = None
+_engine_lock = threading.Lock()
+
+# Stage charged for pool waits made by the current thread ("extract", "load", ...)
+_current_stage = contextvars.ContextVar("etl_connection_stage", default="other")
+_wait_stats = {}
+_wait_lock = threading.Lock()
+
+
+@contextmanager
+def connection_stage(stage):
+    """Charge connection checkouts made inside the block to `stage`."""
+    token = _current_stage.set(stage)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+
+def _record_wait(seconds):
+    stage = _current_stage.get()
+    with _wait_lock:
+        stats = _wait_stats.setdefault(stage, {"checkouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0})
+        stats["checkouts"] += 1
+        stats["wait_seconds"] += seconds
+        stats["max_wait_seconds"] = max(stats["max_wait_seconds"], seconds)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited, per pipeline stage."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _record_wait(time.perf_counter() - start)
+
+
+def _install_health_check(engine, ttl):
     """
-    Create and return a SQLAlchemy engine using environment variables,
-    with retries and basic validation.
+    Ping a pooled connection on checkout only if it has not been verified
+    in the last `ttl` seconds, instead of on every checkout like
+    pool_pre_ping. A failed ping makes the pool replace the connection.
     """
+    @event.listens_for(engine, "checkout")
+    def _check(dbapi_connection, connection_record, connection_proxy):
+        now = time.monotonic()
+        if now - connection_record.info.get("verified_at", 0.0) < ttl:
+            return
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except Exception as e:
+            raise exc.DisconnectionError(f"Stale pooled connection: {e}") from e
+        connection_record.info["verified_at"] = now
+
+    @event.listens_for(engine, "connect")
+    def _fresh(dbapi_connection, connection_record):
+        connection_record.info["verified_at"] = time.monotonic()
+
+
+def _create_engine(retries, backoff):
+    # DB_CONFIG falls back to placeholder credentials; fail fast instead of retrying with them
     required_vars = ["DB_USER", "DB_PASSWORD", "DB_HOST", "DB_PORT", "DB_NAME"]
     missing_vars = [var for var in required_vars if not os.getenv(var)]
     if missing_vars:
         raise EnvironmentError(f"Missing required environment variables: {missing_vars}")
 
-    db_config = {
-        'drivername': 'postgresql+psycopg2',
-        'username': os.getenv("DB_USER"),
-        'password': os.getenv("DB_PASSWORD"),
-        'host': os.getenv("DB_HOST"),
-        'port': os.getenv("DB_PORT"),
-        'database': os.getenv("DB_NAME"),
-    }
-
-    connection_url = URL.create(**db_config)
-    engine = None
+    connection_url = URL.create(
+        drivername="postgresql+psycopg2",
+        username=DB_CONFIG["user"],
+        password=DB_CONFIG["password"],
+        host=DB_CONFIG["host"],
+        port=DB_CONFIG["port"],
+        database=DB_CONFIG["database"],
+    )
 
     for attempt in range(1, retries + 1):
         try:
             engine = create_engine(
                 connection_url,
-                pool_size=10,
-                max_overflow=20,
-                pool_timeout=30,
-                pool_recycle=1800,
+                poolclass=TimedQueuePool,
+                pool_size=DB_POOL_CONFIG["pool_size"],
+                max_overflow=DB_POOL_CONFIG["max_overflow"],
+                pool_timeout=DB_POOL_CONFIG["pool_timeout"],
+                pool_recycle=DB_POOL_CONFIG["pool_recycle"],
                 connect_args={"sslmode": "prefer"}  # ✅ Works for local and cloud
             )
+            _install_health_check(engine, DB_POOL_CONFIG["health_check_ttl"])
             # Test connection
-            with engine.connect() as conn:
+            with connection_stage("startup"), engine.connect() as conn:
                 conn.execute(text("SELECT 1"))
             logger.info("✅ Successfully connected to PostgreSQL.")
             return engine
@@ -53,10 +119,120 @@ def get_engine(retries=3, backoff=2):
             else:
                 raise
 
+
+def get_engine(retries=3, backoff=2):
+    """
+    Return the process-wide SQLAlchemy engine, creating it on first use.
+
+    Extract, load and every other stage share this one engine and its
+    connection pool. The first call tests the connection (with retries and
+    backoff) and pre-warms DB_POOL_CONFIG["warm_connections"] connections.
+    """
+    global _engine
+    if _engine is not None:
+        return _engine
+
+    with _engine_lock:
+        if _engine is None:
+            engine = _create_engine(retries, backoff)
+            _engine = engine
+            if DB_POOL_CONFIG["warm_connections"] > 1:
+                warm_pool(DB_POOL_CONFIG["warm_connections"])
+    return _engine
+
+
+def warm_pool(connections):
+    """
+    Open `connections` pooled connections in parallel and return them to
+    the pool, so the first stages do not pay connection setup serially.
+    Capped at pool_size, since overflow connections are closed on return.
+    """
+    engine = get_engine()
+    count = min(connections, DB_POOL_CONFIG["pool_size"]) - engine.pool.checkedin()
+    if count <= 0:
+        return 0
+
+    barrier = threading.Barrier(count)
+
+    def _open(_):
+        with connection_stage("warmup"), engine.connect():
+            # Hold every connection until all are open, so each one is new
+            barrier.wait(timeout=DB_POOL_CONFIG["pool_timeout"])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=count, thread_name_prefix="warmup") as executor:
+        list(executor.map(_open, range(count)))
+    logger.info(f"✅ Warmed {count} database connections in {time.perf_counter() - start:.2f}s")
+    return count
+
+
+def check_health(force=False):
+    """
+    True if the database answers. Every pooled connection is pinged at most
+    once per health_check_ttl seconds; `force` pings regardless.
+    """
+    try:
+        engine = get_engine()
+        with engine.connect() as conn:
+            if force:
+                conn.execute(text("SELECT 1"))
+        return True
+    except Exception as e:
+        logger.error(f"❌ Database health check failed: {e}")
+        return False
+
+
+def connection_wait_stats():
+    """
+    Pool checkout waits per stage plus the pool's current state, for sizing
+    pool_size / max_overflow: sustained waits mean the pool is too small.
+    """
+    with _wait_lock:
+        stages = {
+            stage: {
+                "checkouts": stats["checkouts"],
+                "wait_seconds": round(stats["wait_seconds"], 4),
+                "avg_wait_ms": round(1000 * stats["wait_seconds"] / stats["checkouts"], 3),
+                "max_wait_ms": round(1000 * stats["max_wait_seconds"], 3),
+            }
+            for stage, stats in _wait_stats.items()
+        }
+    pool = {}
+    if _engine is not None:
+        pool = {
+            "size": _engine.pool.size(),
+            "checked_in": _engine.pool.checkedin(),
+            "checked_out": _engine.pool.checkedout(),
+            "overflow": _engine.pool.overflow(),
+        }
+    return {"stages": stages, "pool": pool}
+
+
+def dispose_engine():
+    """Close every pooled connection and forget the shared engine."""
+    global _engine
+    with _engine_lock:
+        engine, _engine = _engine, None
+    if engine is None:
+        return
+
+    stats = connection_wait_stats()["stages"]
+    if stats:
+        logger.info(f"Connection pool waits by stage: {stats}")
+    try:
+        engine.dispose()
+        logger.info("✅ Database engine disposed.")
+    except Exception:
+        logger.warning("⚠️ Engine disposal failed or was not initialized.")
+
+
 # Standalone test
 if __name__ == "__main__":
     try:
         engine = get_engine()
-        print("✅ Database connection established.")
+        warm_pool(4)
+        print("✅ Database connection established." if check_health(force=True) else "❌ Health check failed.")
+        print(connection_wait_stats())
+        dispose_engine()
     except Exception:
         print("❌ Database connection failed.")
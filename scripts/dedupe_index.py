@@ -0,0 +1,216 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from config.config import DEDUPE_INDEX_DIR, DEDUPE_MAX_SEGMENTS, DEDUPE_MERGE_BLOCK
+from utils.logger import logger
+
+
+# ---------- ROW FINGERPRINTS ----------
+def row_fingerprints(df, key_columns=None):
+    """
+    64-bit hash per row of the cleaned frame (or of its `key_columns`).
+
+    Columns are hashed in sorted name order and numeric columns as float64,
+    so a row hashes the same whatever chunk or source it came from (e.g.
+    int64 from PostgreSQL vs float64 from CSV), and category and object
+    columns with the same values agree. Two distinct rows collide with
+    probability about n^2 / 2^65 over an index of n rows.
+    """
+    frame = df[sorted(key_columns or df.columns)]
+    numeric = {
+        col: "float64" for col in frame.columns
+        if pd.api.types.is_numeric_dtype(frame[col]) and not pd.api.types.is_bool_dtype(frame[col])
+    }
+    if numeric:
+        frame = frame.astype(numeric)
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy(dtype=np.uint64)
+
+
+def _contains(segment, probes):
+    """Boolean mask of sorted `probes` present in a sorted segment."""
+    if not len(segment) or not len(probes):
+        return np.zeros(len(probes), dtype=bool)
+    positions = np.searchsorted(segment, probes)
+    positions[positions == len(segment)] = len(segment) - 1
+    return segment[positions] == probes
+
+
+def _merge_sorted(left, right, out, block=DEDUPE_MERGE_BLOCK):
+    """
+    Merge two sorted, duplicate-free uint64 arrays into `out` a block at a
+    time, so memory stays bounded by `block` however large the inputs are.
+    """
+    i = j = k = 0
+    while i < len(left) or j < len(right):
+        if i >= len(left):
+            part = right[j:j + block]
+            j += len(part)
+        elif j >= len(right):
+            part = left[i:i + block]
+            i += len(part)
+        else:
+            pivot = min(left[min(i + block, len(left)) - 1], right[min(j + block, len(right)) - 1])
+            i_end = i + int(np.searchsorted(left[i:i + block], pivot, side="right"))
+            j_end = j + int(np.searchsorted(right[j:j + block], pivot, side="right"))
+            part = np.union1d(left[i:i_end], right[j:j_end])
+            i, j = i_end, j_end
+        out[k:k + len(part)] = part
+        k += len(part)
+    return k
+
+
+# ---------- FINGERPRINT INDEX ----------
+class FingerprintIndex:
+    """
+    On-disk set of row fingerprints for one target table.
+
+    Fingerprints live in sorted uint64 segment files (.npy) that are
+    memory-mapped for lookups, so memory use does not grow with history.
+    New fingerprints are written to pending segments by `filter_new` and
+    only join the index on `commit`, after the rows are safely loaded; a
+    failed load is rolled back with `discard`. When more than
+    DEDUPE_MAX_SEGMENTS segments pile up, the smallest are merged.
+
+        index = FingerprintIndex("insurance_claims")
+        new_rows = index.filter_new(cleaned)
+        load(new_rows)
+        index.commit()
+    """
+
+    def __init__(self, table, index_dir=DEDUPE_INDEX_DIR, key_columns=None,
+                 max_segments=DEDUPE_MAX_SEGMENTS):
+        self.table = table
+        self.key_columns = key_columns
+        self.max_segments = max_segments
+        self.path = os.path.join(index_dir, table)
+        self.pending_path = os.path.join(self.path, "pending")
+        os.makedirs(self.pending_path, exist_ok=True)
+
+    # --- segments ---
+    @staticmethod
+    def _list(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path) if name.endswith(".npy")
+        )
+
+    def _segments(self):
+        return [np.load(path, mmap_mode="r") for path in self._list(self.path)]
+
+    def _pending(self):
+        return [np.load(path, mmap_mode="r") for path in self._list(self.pending_path)]
+
+    def _next_name(self):
+        names = [os.path.basename(path) for path in self._list(self.path) + self._list(self.pending_path)]
+        number = max((int(name.split("_")[1].split(".")[0]) for name in names), default=0) + 1
+        return f"segment_{number:08d}.npy"
+
+    def __len__(self):
+        return sum(len(segment) for segment in self._segments())
+
+    # --- lookups ---
+    def filter_new(self, df):
+        """
+        Return the rows of `df` not seen in earlier chunks or runs and
+        stage their fingerprints. Rows repeated within `df` keep their first
+        occurrence.
+        """
+        if df.empty:
+            return df
+
+        hashes = row_fingerprints(df, self.key_columns)
+        keep = ~pd.Series(hashes).duplicated().to_numpy()
+
+        order = np.argsort(hashes, kind="stable")
+        probes = hashes[order]
+        seen = np.zeros(len(hashes), dtype=bool)
+        for segment in self._segments() + self._pending():
+            seen[order] |= _contains(segment, probes)
+        keep &= ~seen
+
+        new_hashes = np.unique(hashes[keep])
+        if len(new_hashes):
+            np.save(os.path.join(self.pending_path, self._next_name()), new_hashes)
+
+        dropped = len(df) - int(keep.sum())
+        if dropped:
+            logger.info("✅ Dropped %d rows of '%s' already loaded or repeated", dropped, self.table)
+            df = df.loc[keep]
+        return df
+
+    # --- pending segments ---
+    def commit(self):
+        """Add the staged fingerprints to the index (call once the rows are loaded)."""
+        for path in self._list(self.pending_path):
+            os.replace(path, os.path.join(self.path, os.path.basename(path)))
+        if len(self._list(self.path)) > self.max_segments:
+            self.compact()
+
+    def discard(self):
+        """Forget fingerprints staged since the last commit (their rows were not loaded)."""
+        for path in self._list(self.pending_path):
+            os.remove(path)
+
+    def reset(self):
+        """Empty the index, e.g. before the target table is replaced."""
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.pending_path, exist_ok=True)
+
+    def compact(self, target_segments=None):
+        """
+        Merge committed segments smallest first, in bounded memory, until at
+        most `target_segments` remain (default: half of max_segments). Large
+        old segments are therefore rewritten rarely.
+        """
+        if target_segments is None:
+            target_segments = max(1, self.max_segments // 2)
+        paths = sorted(self._list(self.path), key=os.path.getsize)
+        while len(paths) > target_segments:
+            left, right = np.load(paths[0], mmap_mode="r"), np.load(paths[1], mmap_mode="r")
+            total = len(left) + len(right)
+            merged_path = f"{paths[1]}.merging"
+            out = np.lib.format.open_memmap(merged_path, mode="w+", dtype=np.uint64, shape=(total,))
+            size = _merge_sorted(left, right, out)
+            out.flush()
+            del left, right, out
+            if size < total:
+                # The same fingerprint was committed twice (e.g. by overlapping runs); trim the tail
+                trimmed = np.load(merged_path, mmap_mode="r")[:size].copy()
+                with open(merged_path, "wb") as f:
+                    np.save(f, trimmed)
+            os.remove(paths[0])
+            os.replace(merged_path, paths[1])
+            paths = sorted(paths[1:], key=os.path.getsize)
+        logger.info(f"✅ Compacted fingerprint index of '{self.table}' ({len(self)} rows)")
+
+
+def reset_fingerprint_index(table, index_dir=DEDUPE_INDEX_DIR):
+    """Drop a table's index; every full reload of the target table calls this first."""
+    shutil.rmtree(os.path.join(index_dir, table), ignore_errors=True)
+
+
+# ---------- STANDALONE TEST ----------
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({"id": rng.integers(0, 400_000, 1_000_000), "value": rng.integers(0, 3, 1_000_000)})
+    expected = frame.drop_duplicates()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = FingerprintIndex("demo", tmp_dir, max_segments=4)
+        start = time.perf_counter()
+        kept = []
+        for i in range(0, len(frame), 50_000):
+            kept.append(index.filter_new(frame.iloc[i:i + 50_000]))
+            index.commit()
+        streamed = pd.concat(kept)
+        print(f"chunked dedupe kept {len(streamed)} rows (drop_duplicates: {len(expected)}), "
+              f"{time.perf_counter() - start:.2f}s, index holds {len(index)} fingerprints")
+        assert streamed.index.equals(expected.index)
+
+        # A second run sees everything as already loaded
+        assert index.filter_new(frame.iloc[:100_000]).empty
+        index.discard()
+        print("✅ Rows from earlier runs are dropped")
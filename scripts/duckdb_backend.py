@@ -0,0 +1,248 @@
+import os
+import numpy as np
+import pandas as pd
+from config.config import DUCKDB_THREADS, DUCKDB_MEMORY_LIMIT, DUCKDB_TEMP_DIR
+from scripts.cleaning_plan import (
+    compile_cleaning_plan, detect_datetime_formats, normalize_column_names, categorize_low_cardinality
+)
+from scripts.pushdown import DUCKDB, compile_cleaning_query, quote
+from scripts.type_conversion import optimize_dtypes
+from utils.arrow_frames import pa, _object_null_kind
+from utils.logger import logger
+from utils.metrics import track
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover - duckdb is optional
+    duckdb = None
+
+SOURCE_VIEW = "etl_source"
+ROW_COLUMN = "__etl_row"
+# Pandas dtype of a cleaned column per CLEANING_CONFIG dtype (before categories and downcasting)
+RESULT_DTYPES = {"int": "Int64", "float": "float64", "datetime": "datetime64[ns]", "string": object}
+
+
+# ---------- CONNECTION ----------
+def connect(threads=DUCKDB_THREADS, memory_limit=DUCKDB_MEMORY_LIMIT, temp_dir=DUCKDB_TEMP_DIR):
+    """In-memory DuckDB connection that spills to `temp_dir` past `memory_limit`."""
+    conn = duckdb.connect(":memory:")
+    os.makedirs(temp_dir, exist_ok=True)
+    conn.execute(f"SET temp_directory = '{temp_dir.replace(chr(39), chr(39) * 2)}'")
+    conn.execute("SET preserve_insertion_order = false")
+    if threads:
+        conn.execute(f"SET threads = {int(threads)}")
+    if memory_limit:
+        conn.execute(f"SET memory_limit = '{memory_limit}'")
+    return conn
+
+
+def unsupported_columns(df):
+    """
+    Object columns DuckDB cannot read the way pandas sees them: values that
+    are not all str, or nulls mixing None and NaN (astype(str) renders the two
+    differently).
+    """
+    return [
+        col for col in df.columns
+        if df[col].dtype == object and (
+            pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty")
+            or _object_null_kind(df[col]) is None
+        )
+    ]
+
+
+# ---------- RESULT DTYPES ----------
+def _restore_dtypes(result, raw, names, plan, fills):
+    """
+    Give DuckDB's output the dtypes the pandas path produces: config dtypes
+    per RESULT_DTYPES (float columns stay int64 where pd.to_numeric would
+    keep them integer) and, for other columns, the raw column's dtype. A
+    date column filled with text ('Unknown') holds Timestamps and the fill
+    text, as it does in pandas.
+    """
+    columns_config = plan["columns"]
+    raw_by_name = dict(zip(names, raw.columns))
+    for name in result.columns:
+        series = result[name]
+        dtype = columns_config.get(name, {}).get("dtype")
+        if dtype in RESULT_DTYPES:
+            if dtype == "datetime" and series.dtype == object:
+                dates = series != fills.get(name)
+                parsed = pd.to_datetime(series.where(dates), errors="coerce").astype(object)
+                result[name] = series.where(~dates, parsed)
+                continue
+            if dtype == "int":
+                series = series.astype("float64") if series.dtype == object else series
+            target = RESULT_DTYPES[dtype]
+            if dtype == "float":
+                # pd.to_numeric keeps integers as int64 when nothing is null or unparseable
+                raw_series = raw[raw_by_name[name]]
+                if raw_series.dtype == object:
+                    raw_series = pd.to_numeric(pd.Series(pd.unique(raw_series)), errors="coerce")
+                if pd.api.types.is_integer_dtype(raw_series.dtype):
+                    target = "int64"
+            result[name] = series.astype(target)
+        elif series.dtype != raw[raw_by_name[name]].dtype and series.dtype != object:
+            try:
+                result[name] = series.astype(raw[raw_by_name[name]].dtype)
+            except (TypeError, ValueError):
+                pass
+    return result
+
+
+# ---------- CLEANING ----------
+def duckdb_clean_table(df, table_name, config, plan=None):
+    """
+    Clean one table with DuckDB instead of pandas.
+
+    Registers the frame with an in-memory DuckDB database and runs the
+    cleaning query compiled by `pushdown.compile_cleaning_query` (the same
+    rules the pushdown backend runs in PostgreSQL), with dates parsed in the
+    formats pandas would detect. Duplicates are dropped with a GROUP BY that
+    keeps each row's first occurrence, so rows come back in the pandas order
+    and with their original index labels. DuckDB runs the query on every
+    core and spills to DUCKDB_TEMP_DIR past DUCKDB_MEMORY_LIMIT; the final
+    category and dtype steps are the pandas path's own.
+
+    Returns the same frame as `transform.clean_table` (see the parity check
+    below). Frames DuckDB cannot read faithfully (object columns of mixed
+    types) are cleaned with pandas instead.
+    """
+    from scripts.transform import clean_table
+
+    if plan is None:
+        plan = compile_cleaning_plan(table_name, config)
+    if duckdb is None:
+        logger.warning(f"⚠️ duckdb is not installed; cleaning '{table_name}' with pandas")
+        return clean_table(df, table_name, {**config, "backend": "pandas"}, plan)
+    unsupported = unsupported_columns(df)
+    if unsupported:
+        logger.warning(f"⚠️ Columns {unsupported} of '{table_name}' hold mixed values; cleaning it with pandas")
+        return clean_table(df, table_name, {**config, "backend": "pandas"}, plan)
+
+    with track(table_name, "transform", frame=df) as tracker:
+        try:
+            detect_datetime_formats(df, plan)
+            names = list(normalize_column_names(df.columns))
+            source = df.reset_index(drop=True)
+            source.columns = [str(col) for col in source.columns]
+            source[ROW_COLUMN] = np.arange(len(source), dtype=np.int64)
+
+            with connect() as conn:
+                # DuckDB scans Arrow buffers directly; object columns would be re-read per statement
+                conn.register(SOURCE_VIEW, pa.Table.from_pandas(source, preserve_index=False)
+                              if pa is not None else source)
+                raw_columns = [
+                    (col, raw_type) for col, raw_type in
+                    conn.execute(f"SELECT column_name, column_type FROM (DESCRIBE {SOURCE_VIEW})").fetchall()
+                    if col != ROW_COLUMN
+                ]
+                null_texts = {
+                    col: "nan" for col in source.columns
+                    if source[col].dtype == object and _object_null_kind(source[col]) == "nan"
+                }
+                query = compile_cleaning_query(
+                    lambda sql, params=None: conn.execute(sql, params or {}).fetchone(),
+                    plan, SOURCE_VIEW, raw_columns, DUCKDB, null_texts,
+                    plan["datetime_formats"], carry=(ROW_COLUMN,),
+                    materialize=lambda ctes: conn.execute(f"CREATE TEMP TABLE filtered AS {ctes} SELECT * FROM filtered"),
+                )
+                result = conn.execute(
+                    f"{query['ctes']} SELECT {', '.join(query['projections'])}, "
+                    f"min({quote(ROW_COLUMN)}) AS {quote(ROW_COLUMN)} "
+                    f"FROM filtered GROUP BY ALL ORDER BY {quote(ROW_COLUMN)}",
+                    query["params"],
+                ).df()
+
+            rows = result.pop(ROW_COLUMN).to_numpy(dtype=np.int64)
+            result.index = df.index.take(rows)
+            result = _restore_dtypes(result, df, names, plan, query["fills"])
+
+            columns_config = plan["columns"]
+            result = categorize_low_cardinality(
+                result, columns_config, plan["categorical_max_unique"], plan["categorical_max_ratio"]
+            )
+            result = optimize_dtypes(result, plan["downcast_numeric"], plan["string_storage"], table_name)
+            logger.info(
+                "✅ Cleaned '%s' with DuckDB: dropped columns %s, %d rows in, %d rows out",
+                table_name, query["dropped"], query["total"], len(result)
+            )
+        except Exception as e:
+            logger.error(f"❌ DuckDB cleaning failed for table '{table_name}': {e}", exc_info=True)
+            raise
+
+        tracker.output(result)
+    return result
+
+
+# ---------- PARITY CHECK ----------
+def verify_parity(df, table_name, config):
+    """
+    Compare the DuckDB backend with the pandas path on one raw frame:
+    same rows in the same order, same index and same dtypes.
+
+    Returns:
+        bool: True when both backends produce the same frame.
+    """
+    from scripts.transform import clean_table
+
+    expected = clean_table(df, table_name, {**config, "backend": "pandas"})
+    actual = duckdb_clean_table(df, table_name, config)
+    try:
+        pd.testing.assert_frame_equal(actual, expected)
+        logger.info(f"✅ DuckDB parity holds for '{table_name}' ({len(actual)} rows)")
+        return True
+    except AssertionError as e:
+        logger.error(f"❌ DuckDB parity mismatch for '{table_name}': {e}")
+        return False
+
+
+def check_parity_cases():
+    """
+    Assert DuckDB/pandas parity on the synthetic inputs of
+    scripts/parity_cases.py (no database needed). The mixed-values case
+    must take the pandas fallback.
+
+    Raises:
+        AssertionError: naming every case whose frames differ.
+    """
+    from scripts.parity_cases import PARITY_TABLE, parity_cases
+
+    failures = []
+    for name, config, raw in parity_cases():
+        if name == "mixed object values":
+            assert unsupported_columns(raw), "mixed object column was not detected as unsupported"
+        if not verify_parity(raw, PARITY_TABLE, config):
+            failures.append(name)
+    assert not failures, f"DuckDB parity mismatch in cases: {failures}"
+    logger.info(f"✅ DuckDB parity holds for all {len(parity_cases())} synthetic cases")
+
+
+# ---------- STANDALONE TEST ----------
+if __name__ == "__main__":
+    import sys
+    import time
+    from config.config import CLEANING_CONFIG, PROJECT_ROOT
+
+    check_parity_cases()
+
+    results = {}
+    for table in CLEANING_CONFIG["tables"]:
+        raw = pd.read_csv(os.path.join(PROJECT_ROOT, "data", f"{table}.csv"))
+        results[table] = verify_parity(raw, table, CLEANING_CONFIG)
+
+    # Larger frame: the sample claims repeated 200 times
+    raw = pd.read_csv(os.path.join(PROJECT_ROOT, "data", "insurance_claims.csv"))
+    big = pd.concat([raw] * 200, ignore_index=True)
+    for backend, clean in (("pandas", None), ("duckdb", duckdb_clean_table)):
+        start = time.perf_counter()
+        if clean is None:
+            from scripts.transform import clean_table
+            clean_table(big, "insurance_claims", {**CLEANING_CONFIG, "backend": "pandas"})
+        else:
+            clean(big, "insurance_claims", CLEANING_CONFIG)
+        print(f"{backend}: {len(big)} rows in {time.perf_counter() - start:.2f}s")
+
+    for table, ok in results.items():
+        print(f"{table}: {'parity OK' if ok else 'MISMATCH'}")
+    sys.exit(0 if all(results.values()) else 1)
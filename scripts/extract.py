@@ -1,6 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from scripts.db_connection import get_engine
+from sqlalchemy import text
+from scripts.db_connection import get_engine, connection_stage
+from config.config import ETL_CHUNK_SIZE, EXTRACT_MAX_WORKERS, EXTRACT_SOURCE, STAGING_CACHE_ENABLED
 from utils.logger import logger
+from utils.metrics import track
 
 # ---------- CONFIGURABLE TABLES ----------
 TABLES_TO_EXTRACT = [
@@ -17,36 +21,97 @@ def is_valid_table_name(name):
     return bool(re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", name))
 
 # ---------- EXTRACT FUNCTION ----------
-def extract_data():
+def _read_table(table, engine):
+    query = f"SELECT * FROM {table}"
+    df = pd.read_sql_query(query, con=engine)
+    logger.info(f"✅Extracted table: {table} with {len(df)} rows")
+    return df
+
+
+def extract_table(table, engine, use_cache=STAGING_CACHE_ENABLED):
+    """
+    Extract a single table into a DataFrame. Raises on failure.
+
+    With `use_cache`, an unchanged table is read from its local Arrow
+    snapshot instead of the database (see scripts/staging_cache.py).
+    """
+    with track(table, "extract", "cache" if use_cache else "query") as tracker, connection_stage("extract"):
+        if use_cache:
+            from scripts.staging_cache import extract_with_cache
+            df = extract_with_cache(table, engine, _read_table)
+        else:
+            df = _read_table(table, engine)
+        tracker.output(df)
+    return df
+
+
+def _safe_extract_table(table, read_fn):
+    """Extract one table with `read_fn`, logging and returning None instead of raising."""
+    try:
+        return read_fn(table)
+    except Exception as e:
+        logger.error(f"❌Failed to extract table '{table}': {e}", exc_info=True)
+        return None
+
+
+def extract_data(max_workers=EXTRACT_MAX_WORKERS, use_cache=STAGING_CACHE_ENABLED, source=EXTRACT_SOURCE,
+                 tables=None):
     """
     Extract specified tables from PostgreSQL into pandas DataFrames.
 
+    With `source="files"`, the same tables are read from CSV/Parquet drops
+    instead (see scripts/file_source.py); Arrow already parses each file on
+    several threads, so files are read one at a time.
+
+    With `max_workers` > 1, tables are fetched concurrently on the engine's
+    connection pool, so wall time approaches that of the slowest table.
+    A failing table never affects the others. With `use_cache`, tables whose
+    source fingerprint is unchanged are served from the staging cache.
+    `tables` limits extraction to a subset of TABLES_TO_EXTRACT.
+
     Returns:
         dict: {table_name: DataFrame} if successful, else None.
     """
     try:
-        engine = get_engine()
-        if engine is None:
-            logger.error("❌No database engine available. Extraction aborted.")
+        if source == "files":
+            from scripts.file_source import read_table_file
+            read_fn = read_table_file
+            max_workers = 1
+        elif source == "postgres":
+            engine = get_engine()
+            if engine is None:
+                logger.error("❌No database engine available. Extraction aborted.")
+                return None
+            read_fn = lambda table: extract_table(table, engine, use_cache)
+        else:
+            logger.error(f"❌Unknown extract source '{source}'. Extraction aborted.")
             return None
 
         extracted_data = {}
         failed_tables = []
+        valid_tables = []
 
-        for table in TABLES_TO_EXTRACT:
+        for table in (TABLES_TO_EXTRACT if tables is None else tables):
             if not is_valid_table_name(table):
                 logger.error(f"Invalid table name detected, skipping extraction: {table}")
                 failed_tables.append(table)
                 continue
+            valid_tables.append(table)
 
-            try:
-                query = f"SELECT * FROM {table}"
-                df = pd.read_sql_query(query, con=engine)
-                extracted_data[table] = df
-                logger.info(f"✅Extracted table: {table} with {len(df)} rows")
-            except Exception as e:
-                logger.error(f"❌Failed to extract table '{table}': {e}", exc_info=True)
+        workers = max(1, min(max_workers, len(valid_tables)))
+        if workers > 1:
+            logger.info(f"Extracting {len(valid_tables)} tables with {workers} workers.")
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract") as executor:
+                results = list(executor.map(lambda table: _safe_extract_table(table, read_fn), valid_tables))
+        else:
+            results = [_safe_extract_table(table, read_fn) for table in valid_tables]
+
+        # Results come back in TABLES_TO_EXTRACT order regardless of completion order
+        for table, df in zip(valid_tables, results):
+            if df is None:
                 failed_tables.append(table)
+            else:
+                extracted_data[table] = df
 
         if extracted_data:
             logger.info("Data extraction completed for available tables.")
@@ -61,6 +126,34 @@ def extract_data():
         logger.error("❌Unexpected error during data extraction.", exc_info=True)
         return None
 
+# ---------- STREAMING EXTRACT ----------
+def iter_table_chunks(table, engine, chunk_size=ETL_CHUNK_SIZE):
+    """
+    Stream a single table from PostgreSQL in DataFrame chunks.
+
+    Rows are read through a server-side (named) cursor, so at most
+    `chunk_size` rows are held in memory at a time regardless of table size.
+
+    Yields:
+        DataFrame: the next chunk of at most `chunk_size` rows.
+    """
+    if not is_valid_table_name(table):
+        logger.error(f"Invalid table name detected, skipping extraction: {table}")
+        raise ValueError(f"Invalid table name: {table}")
+
+    query = text(f"SELECT * FROM {table}")
+    total_rows = 0
+    with connection_stage("extract"):
+        conn = engine.connect().execution_options(stream_results=True, max_row_buffer=chunk_size)
+    with conn:
+        for chunk in pd.read_sql_query(query, con=conn, chunksize=chunk_size):
+            total_rows += len(chunk)
+            logger.debug("Streamed %d rows from %s (%d so far)", len(chunk), table, total_rows)
+            yield chunk
+
+    logger.info(f"✅Streamed table: {table} with {total_rows} rows")
+
+
 # ---------- STANDALONE TEST ----------
 if __name__ == "__main__":
     extracted = extract_data()
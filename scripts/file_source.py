@@ -0,0 +1,180 @@
+import csv
+import os
+import pandas as pd
+from config.config import CLEANING_CONFIG, ETL_CHUNK_SIZE, FILE_SOURCE_DIR
+from scripts.cleaning_plan import normalize_column_names
+from utils.logger import logger
+from utils.metrics import track
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+# CLEANING_CONFIG dtype -> Arrow type used while parsing
+ARROW_TYPES = {
+    "string": "string",
+    "int": "int64",
+    "float": "float64",
+    "datetime": "timestamp[ns]",
+}
+
+
+# ---------- FILE DISCOVERY ----------
+def find_table_file(table, source_dir=FILE_SOURCE_DIR):
+    """Return the Parquet or CSV file holding `table` (Parquet preferred)."""
+    for extension in (".parquet", ".csv"):
+        path = os.path.join(source_dir, f"{table}{extension}")
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No .parquet or .csv file for table '{table}' in {source_dir}")
+
+
+def read_csv_header(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+# ---------- EXPLICIT DTYPES ----------
+def file_column_types(table, header, strict=True, config=CLEANING_CONFIG):
+    """
+    Map a file's header to Arrow types from CLEANING_CONFIG.
+
+    Headers are matched after the same normalization the transform applies
+    ("ClaimID" -> "claimid"). Config string columns are always read as text,
+    so ids keep their exact spelling. With `strict=False`, numeric and date
+    columns are read as text too and left to the transform's coercion.
+    """
+    columns_config = config.get("tables", {}).get(table, {}).get("columns", {})
+    column_types = {}
+    for raw_name, name in zip(header, normalize_column_names(header)):
+        dtype = columns_config.get(name, {}).get("dtype")
+        if dtype not in ARROW_TYPES:
+            continue
+        arrow_type = ARROW_TYPES[dtype] if strict or dtype == "string" else "string"
+        column_types[raw_name] = pa.type_for_alias(arrow_type)
+    return column_types
+
+
+def _csv_options(column_types, block_size=None, skip_rows=0):
+    return {
+        "read_options": pa_csv.ReadOptions(use_threads=True, block_size=block_size,
+                                           skip_rows_after_names=skip_rows),
+        "convert_options": pa_csv.ConvertOptions(column_types=column_types, strings_can_be_null=True),
+    }
+
+
+# ---------- WHOLE-FILE READ ----------
+def read_table_file(table, source_dir=FILE_SOURCE_DIR):
+    """
+    Read one table from its flat file with Arrow's multithreaded reader.
+
+    Columns are parsed straight into the types given in CLEANING_CONFIG
+    instead of going through pandas object inference. If a typed column
+    holds malformed values the file is re-read with those columns as text,
+    which the transform coerces exactly as it does for database sources.
+
+    Returns:
+        DataFrame: the table's rows.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to read file sources")
+
+    path = find_table_file(table, source_dir)
+    with track(table, "extract", "file") as tracker:
+        if path.endswith(".parquet"):
+            df = pq.read_table(path, use_threads=True).to_pandas()
+        else:
+            header = read_csv_header(path)
+            try:
+                data = pa_csv.read_csv(path, **_csv_options(file_column_types(table, header)))
+            except pa.ArrowInvalid as e:
+                logger.warning(f"⚠️ Malformed typed values in {path} ({e}); re-reading them as text.")
+                data = pa_csv.read_csv(path, **_csv_options(file_column_types(table, header, strict=False)))
+            df = data.to_pandas()
+        tracker.output(df)
+
+    logger.info(f"✅Extracted table: {table} with {len(df)} rows from {path}")
+    return df
+
+
+# ---------- STREAMING READ ----------
+def iter_file_chunks(table, chunk_size=ETL_CHUNK_SIZE, source_dir=FILE_SOURCE_DIR, strict=True):
+    """
+    Stream one table from its flat file in DataFrame chunks of `chunk_size` rows.
+
+    CSV files are parsed block by block by Arrow's streaming reader and
+    Parquet files row group by row group, so only about one chunk is
+    resident at a time regardless of file size. As in `read_table_file`, a
+    malformed value in a typed column does not fail the table: the stream
+    resumes after the last yielded row with those columns read as text, for
+    the transform to coerce. `strict=False` reads them as text from the start.
+
+    Yields:
+        DataFrame: the next chunk of at most `chunk_size` rows.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to read file sources")
+
+    path = find_table_file(table, source_dir)
+    header = None if path.endswith(".parquet") else read_csv_header(path)
+
+    def open_batches(strict, skip_rows=0):
+        if header is None:
+            return iter(pq.ParquetFile(path).iter_batches(batch_size=chunk_size))
+        column_types = file_column_types(table, header, strict)
+        return pa_csv.open_csv(path, **_csv_options(column_types, block_size=1 << 24, skip_rows=skip_rows))
+
+    total_rows = 0
+    pending = []
+    pending_rows = 0
+    try:
+        batches = open_batches(strict)
+    except pa.ArrowInvalid as e:
+        if header is None:
+            raise
+        logger.warning(f"⚠️ Malformed typed values in {path} ({e}); streaming them as text.")
+        strict, batches = False, open_batches(False)
+    while True:
+        try:
+            batch = next(batches, None)
+        except pa.ArrowInvalid as e:
+            if not strict or header is None:
+                raise
+            # Typed rows not yet yielded are re-read as text, from the first unyielded row on
+            logger.warning(f"⚠️ Malformed typed values in {path} after row {total_rows} ({e}); "
+                           f"streaming the rest as text.")
+            strict, pending, pending_rows = False, [], 0
+            batches = open_batches(False, skip_rows=total_rows)
+            continue
+        if batch is None:
+            break
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunk_size:
+            data = pa.Table.from_batches(pending)
+            chunk = data.slice(0, chunk_size)
+            rest = data.slice(chunk_size)
+            pending = rest.to_batches()
+            pending_rows = rest.num_rows
+            total_rows += chunk.num_rows
+            yield chunk.to_pandas()
+
+    if pending_rows:
+        total_rows += pending_rows
+        yield pa.Table.from_batches(pending).to_pandas()
+
+    logger.info(f"✅Streamed table: {table} with {total_rows} rows from {path}")
+
+
+# ---------- STANDALONE TEST ----------
+if __name__ == "__main__":
+    from scripts.extract import TABLES_TO_EXTRACT
+
+    for table in TABLES_TO_EXTRACT:
+        df = read_table_file(table)
+        chunks = list(iter_file_chunks(table, chunk_size=max(1, len(df) // 3)))
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), df)
+        print(f"{table}: {len(df)} rows, {len(chunks)} streamed chunks, dtypes {dict(df.dtypes.astype(str))}")
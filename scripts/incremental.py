@@ -0,0 +1,152 @@
+import json
+import os
+import pandas as pd
+from sqlalchemy import text
+from config.config import STATE_DIR, SOURCE_SCHEMA_NAME
+from scripts.cleaning_plan import normalize_column_names
+from scripts.extract import is_valid_table_name
+from scripts.pushdown import POSTGRES, SAFE_CAST_FUNCTIONS, get_source_columns, quote
+from scripts.type_conversion import parse_datetime
+from utils.logger import logger
+
+WATERMARK_FILE = os.path.join(STATE_DIR, "watermarks.json")
+
+
+# ---------- WATERMARK STATE STORE ----------
+def load_watermarks(path=WATERMARK_FILE):
+    """Return {table: {"column": ..., "value": ...}} from the local state store."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_watermark(table, column, value, path=WATERMARK_FILE):
+    """Persist a table's high-water mark, replacing the state file atomically."""
+    watermarks = load_watermarks(path)
+    watermarks[table] = {"column": column, "value": value}
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(tmp_path, path)
+    logger.info(f"✅ Saved watermark for '{table}': {column} = {value}")
+
+
+# ---------- WATERMARK COLUMNS ----------
+def get_watermark_column(table_config):
+    """
+    Pick the column used to detect new rows for a table.
+
+    An explicit "watermark" entry wins; otherwise the first datetime column
+    (e.g. claimdate), falling back to the first critical id column.
+    """
+    if table_config.get("watermark"):
+        return table_config["watermark"]
+
+    columns_config = table_config.get("columns", {})
+    for col, conf in columns_config.items():
+        if conf.get("dtype") == "datetime":
+            return col
+    for col, conf in columns_config.items():
+        if conf.get("critical", False):
+            return col
+    return None
+
+
+def is_date_watermark(table_config, column):
+    return table_config.get("columns", {}).get(column, {}).get("dtype") == "datetime"
+
+
+def resolve_source_column(conn, table, column, source_schema=SOURCE_SCHEMA_NAME):
+    """
+    The source table's (raw column name, data type) for a config column,
+    matched through normalize_column_names like the cleaning itself
+    (e.g. "ClaimDate" or " Claim Date " for claimdate).
+    """
+    raw_columns = get_source_columns(conn, table, source_schema)
+    for name, (raw, data_type) in zip(normalize_column_names([raw for raw, _ in raw_columns]), raw_columns):
+        if name == column:
+            return raw, data_type
+    logger.error(f"❌ Watermark column '{column}' not found in source table '{table}'")
+    raise ValueError(f"Watermark column '{column}' not found in source table '{table}'")
+
+
+def watermark_predicate(raw_column, data_type, is_date):
+    """
+    WHERE clause selecting rows past :mark. Dates compare as timestamps,
+    text dates after a cast (rows whose date does not parse are not picked
+    up incrementally), so '2024-9-01' sorts after '2024-10-01' no more.
+    """
+    col = quote(raw_column)
+    if not is_date:
+        return f"{col} > :mark"
+    if data_type not in POSTGRES.temporal_types:
+        col = POSTGRES.try_timestamp(col)
+    return f"{col} >= CAST(:mark AS timestamp)"
+
+
+def to_watermark_value(value):
+    """Convert a column maximum into a JSON-serializable watermark."""
+    if value is None or pd.isna(value):
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+# ---------- INCREMENTAL EXTRACT ----------
+def extract_increment(table, engine, table_config, watermarks=None):
+    """
+    Extract only rows past the table's stored high-water mark.
+
+    Date watermarks use >= so rows arriving late for the last loaded day are
+    picked up again; the upsert on the critical key makes that idempotent.
+    Id watermarks use >.
+
+    Returns:
+        tuple: (DataFrame, watermark column, new watermark value)
+    """
+    if not is_valid_table_name(table):
+        raise ValueError(f"Invalid table name: {table}")
+
+    column = get_watermark_column(table_config)
+    if column is None:
+        raise ValueError(f"No watermark column available for table: {table}")
+
+    watermarks = load_watermarks() if watermarks is None else watermarks
+    state = watermarks.get(table, {})
+    mark = state.get("value") if state.get("column") == column else None
+    is_date = is_date_watermark(table_config, column)
+
+    with engine.connect() as conn:
+        raw_column, data_type = resolve_source_column(conn, table, column)
+        if mark is None:
+            query = text(f"SELECT * FROM {table}")
+            params = {}
+            logger.info(f"No watermark for '{table}', extracting all rows.")
+        else:
+            if is_date and data_type not in POSTGRES.temporal_types:
+                conn.execute(text(SAFE_CAST_FUNCTIONS))
+            query = text(f"SELECT * FROM {table} WHERE {watermark_predicate(raw_column, data_type, is_date)}")
+            params = {"mark": mark}
+        df = pd.read_sql_query(query, con=conn, params=params)
+    logger.info(f"✅Extracted {len(df)} new rows from {table} past {column} = {mark}")
+
+    new_mark = mark
+    if not df.empty:
+        values = df[raw_column] if raw_column in df.columns else None
+        if values is not None and is_date:
+            values = parse_datetime(values)
+        column_max = to_watermark_value(values.max()) if values is not None else None
+        if column_max is None:
+            logger.error(
+                f"❌ Could not take a new watermark for '{table}' from column '{raw_column}' "
+                f"(missing or no parseable values); keeping {column} = {mark}"
+            )
+        else:
+            new_mark = column_max
+    return df, column, new_mark
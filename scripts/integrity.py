@@ -0,0 +1,258 @@
+import threading
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from config.config import FOREIGN_KEYS, QUARANTINE_SUFFIX, INTEGRITY_MAX_INDEX_PARTS
+from scripts.load import load_cleaned_data
+from utils.logger import logger
+from utils.metrics import track
+
+
+# ---------- DEPENDENCY ORDER ----------
+def parent_tables(table, foreign_keys=FOREIGN_KEYS):
+    return sorted(set(foreign_keys.get(table, {}).values()))
+
+
+def referenced_columns(table, foreign_keys=FOREIGN_KEYS):
+    """Columns of `table` that other tables reference (its key columns to index)."""
+    return sorted({
+        column
+        for fks in foreign_keys.values()
+        for column, parent in fks.items()
+        if parent == table
+    })
+
+
+def integrity_order(tables, foreign_keys=FOREIGN_KEYS):
+    """
+    `tables` reordered so every parent comes before its children; otherwise
+    the input order is kept. Parents outside `tables` are ignored.
+    """
+    pending = list(tables)
+    ordered = []
+    while pending:
+        ready = [t for t in pending if all(p in ordered or p not in pending for p in parent_tables(t, foreign_keys))]
+        if not ready:
+            logger.error(f"❌ Foreign keys form a cycle between tables: {pending}")
+            raise ValueError(f"Foreign keys form a cycle between tables: {pending}")
+        ordered.extend(ready)
+        pending = [t for t in pending if t not in ready]
+    return ordered
+
+
+def quarantine_table_name(table):
+    return f"{table}{QUARANTINE_SUFFIX}"
+
+
+# ---------- KEY INDEX ----------
+def _key_values(series):
+    """Non-null key values as an object array (category columns by value)."""
+    values = series.dropna()
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    return values.to_numpy(dtype=object)
+
+
+class KeyIndex:
+    """
+    Set of one parent column's key values, probed by every child chunk.
+
+    Keys are held in pandas Index parts; each part's hash table is built on
+    its first lookup and reused afterwards, so a chunk costs one hash probe
+    per row and validation stays linear in the rows checked. Keys streamed
+    in chunk by chunk add parts, which are merged once there are more than
+    INTEGRITY_MAX_INDEX_PARTS.
+    """
+
+    def __init__(self, max_parts=INTEGRITY_MAX_INDEX_PARTS):
+        self.max_parts = max_parts
+        self._parts = []
+
+    def add(self, values):
+        values = pd.unique(values)
+        if not len(values):
+            return
+        self._parts.append(pd.Index(values, dtype=object))
+        if len(self._parts) > self.max_parts:
+            self._parts = [pd.Index(pd.unique(np.concatenate([part.to_numpy() for part in self._parts])), dtype=object)]
+
+    def contains(self, values):
+        found = np.zeros(len(values), dtype=bool)
+        for part in self._parts:
+            found |= part.get_indexer(values) >= 0
+        return found
+
+    def __len__(self):
+        return sum(len(part) for part in self._parts)
+
+
+# ---------- VALIDATION ----------
+class IntegrityValidator:
+    """
+    Checks child foreign keys against the rows of their parents.
+
+    Tables must be validated parent first (see `integrity_order`). The
+    valid rows of every validated table are indexed for its children, so a
+    row referencing a quarantined parent is itself quarantined. Parents not
+    validated in this run are indexed from their loaded target table when
+    an engine is given.
+
+    Tables validated concurrently (e.g. in a pipelined run) are announced
+    with `expect`: a child's `validate` then waits until each expected
+    parent has been validated, or given up on with `settle`.
+    """
+
+    def __init__(self, foreign_keys=FOREIGN_KEYS, engine=None, schema=None):
+        self.foreign_keys = foreign_keys
+        self.engine = engine
+        self.schema = schema
+        self.indexes = {}
+        self._settled = {}
+        self._lock = threading.Lock()
+
+    def expect(self, tables):
+        """Make children wait for these tables' keys before validating."""
+        self._settled = {table: threading.Event() for table in tables}
+
+    def settle(self, table):
+        """Release the children of `table`: its keys are indexed, or it failed and they use the target's."""
+        event = self._settled.get(table)
+        if event is not None:
+            event.set()
+
+    def register(self, table, df):
+        """Index the key columns of `table` that children reference."""
+        for column in referenced_columns(table, self.foreign_keys):
+            if column in df.columns:
+                self.indexes.setdefault((table, column), KeyIndex()).add(_key_values(df[column]))
+
+    def load_target_keys(self, table):
+        """Index the keys already loaded into `<table>_cleaned` (e.g. by earlier incremental runs)."""
+        for column in referenced_columns(table, self.foreign_keys):
+            index = self.indexes.setdefault((table, column), KeyIndex())
+            try:
+                with self.engine.connect() as conn:
+                    values = conn.execute(text(
+                        f'SELECT DISTINCT "{column}" FROM {self.schema}."{table}_cleaned"'
+                    )).scalars().all()
+                index.add(np.array(values, dtype=object))
+                logger.info(f"✅ Indexed {len(values)} existing '{column}' keys of '{table}'")
+            except Exception as e:
+                logger.warning(f"⚠️ Could not read existing keys of '{table}', validating against this run only: {e}")
+
+    def _index_for(self, parent, column):
+        with self._lock:
+            index = self.indexes.get((parent, column))
+            if index is None and self.engine is not None:
+                self.load_target_keys(parent)
+                index = self.indexes.get((parent, column))
+        return index
+
+    def validate(self, table, df):
+        """
+        Split `df` into rows whose foreign keys all resolve and orphans.
+
+        Null foreign keys are not violations. Orphans get a `_violation`
+        column naming the first broken reference and a `_quarantined_at`
+        timestamp.
+
+        Returns:
+            tuple: (valid DataFrame, orphan DataFrame)
+        """
+        try:
+            for parent in set(self.foreign_keys.get(table, {}).values()):
+                event = self._settled.get(parent)
+                if event is not None:
+                    event.wait()
+            return self._validate(table, df)
+        finally:
+            self.settle(table)
+
+    def _validate(self, table, df):
+        with track(table, "integrity", frame=df) as tracker:
+            valid = np.ones(len(df), dtype=bool)
+            violation = np.full(len(df), None, dtype=object)
+
+            for column, parent in self.foreign_keys.get(table, {}).items():
+                if column not in df.columns:
+                    continue
+                index = self._index_for(parent, column)
+                if index is None:
+                    logger.warning(f"⚠️ No keys of '{parent}' available; not checking '{table}.{column}'")
+                    continue
+
+                values = df[column]
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    # Probe each category once; nulls (code -1) are not violations
+                    found = np.append(index.contains(values.cat.categories.to_numpy(dtype=object)), True)
+                    ok = found[values.cat.codes.to_numpy()]
+                else:
+                    ok = values.isna().to_numpy() | index.contains(values.to_numpy(dtype=object))
+                violation[~ok & valid] = f"{column} -> {parent}.{column}"
+                valid &= ok
+
+            if valid.all():
+                result, orphans = df, df.iloc[:0]
+            else:
+                result = df.loc[valid]
+                orphans = df.loc[~valid].copy()
+                orphans["_violation"] = violation[~valid]
+                orphans["_quarantined_at"] = pd.Timestamp(datetime.now(timezone.utc)).tz_localize(None)
+                logger.warning(f"⚠️ Quarantined {len(orphans)} orphan rows of '{table}': "
+                               f"{pd.Series(orphans['_violation']).value_counts().to_dict()}")
+
+            self.register(table, result)
+            tracker.output(result)
+        return result, orphans
+
+    def validate_all(self, dataframes):
+        """
+        Validate a dict of cleaned tables parent first.
+
+        Returns:
+            tuple: ({table: valid DataFrame}, {table: orphan DataFrame} for tables with orphans)
+        """
+        valid, orphans = {}, {}
+        for table in integrity_order(list(dataframes), self.foreign_keys):
+            valid[table], table_orphans = self.validate(table, dataframes[table])
+            if not table_orphans.empty:
+                orphans[table] = table_orphans
+        # Keep the caller's table order
+        return {table: valid[table] for table in dataframes}, orphans
+
+
+# ---------- QUARANTINE TABLES ----------
+def reset_quarantine(engine, schema, tables):
+    """Drop last run's quarantine tables before their tables are streamed again."""
+    with engine.begin() as conn:
+        for table in tables:
+            conn.execute(text(f'DROP TABLE IF EXISTS {schema}."{quarantine_table_name(table)}"'))
+
+
+def load_quarantine(orphans, engine, schema):
+    """Append orphan rows to `<table>_quarantine` tables."""
+    if orphans:
+        load_cleaned_data(
+            {quarantine_table_name(table): df for table, df in orphans.items()},
+            engine, schema, if_exists="append",
+        )
+
+
+# ---------- STANDALONE TEST ----------
+if __name__ == "__main__":
+    import os
+    from config.config import CLEANING_CONFIG, PROJECT_ROOT
+    from scripts.transform import transform_data
+
+    raw = {
+        table: pd.read_csv(os.path.join(PROJECT_ROOT, "data", f"{table}.csv"))
+        for table in FOREIGN_KEYS.keys() | set(fk for fks in FOREIGN_KEYS.values() for fk in fks.values())
+    }
+    # Break some references: 10 policies point at unknown customers
+    raw["insurance_policies"].loc[:9, "CustomerID"] = -1
+    cleaned = transform_data(raw, CLEANING_CONFIG)
+
+    valid, orphans = IntegrityValidator().validate_all(cleaned)
+    for table in integrity_order(list(cleaned)):
+        print(f"{table}: {len(valid[table])} valid, {len(orphans.get(table, []))} quarantined")
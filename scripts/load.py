@@ -1,34 +1,35 @@
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine.url import URL
-from config.config import DB_CONFIG, SCHEMA_NAME
+from sqlalchemy import exc, text
+from config.config import (
+    SCHEMA_NAME, CLEANING_CONFIG, LOAD_METHOD, COPY_BATCH_ROWS, LOAD_SWAP, LOAD_MAX_WORKERS,
+    LOAD_SWAP_LOCK_TIMEOUT, LOAD_SWAP_RETRIES,
+)
+from scripts.db_connection import get_engine, dispose_engine, connection_stage
 from utils.logger import logger
-import traceback
+from utils.metrics import track
 
+# CLEANING_CONFIG dtype -> PostgreSQL column type
+PG_TYPES = {
+    "string": "TEXT",
+    "int": "BIGINT",
+    "float": "DOUBLE PRECISION",
+    "datetime": "TIMESTAMP",
+}
 
-# ---------- DB CONNECTION ----------
-def get_engine():
-    try:
-        db_url = URL.create(
-            drivername="postgresql+psycopg2",
-            username=DB_CONFIG["user"],
-            password=DB_CONFIG["password"],
-            host=DB_CONFIG["host"],
-            port=DB_CONFIG["port"],
-            database=DB_CONFIG["database"]
-        )
-        engine = create_engine(db_url, pool_pre_ping=True)
-        logger.info("✅ Database engine created.")
-        return engine
-    except Exception as e:
-        logger.exception("❌ Failed to create database engine.")
-        raise
+COPY_NULL = "\\N"
+STAGING_SUFFIX = "__staging"
+# Row number column of the upsert temp table
+UPSERT_ORDINAL = "__etl_ordinal"
 
 
 # ---------- CREATE SCHEMA ----------
 def create_schema(engine, schema_name):
     try:
-        with engine.connect() as conn:
+        with engine.begin() as conn:
             conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema_name}"))
             logger.info(f"✅ Schema '{schema_name}' verified or created.")
     except Exception as e:
@@ -36,8 +37,233 @@ def create_schema(engine, schema_name):
         raise
 
 
+# ---------- TABLE DDL ----------
+def get_columns_config(table_name):
+    """Return the CLEANING_CONFIG columns for a (possibly *_cleaned) target table."""
+    source_table = table_name[:-len("_cleaned")] if table_name.endswith("_cleaned") else table_name
+    return CLEANING_CONFIG.get("tables", {}).get(source_table, {}).get("columns", {})
+
+
+def infer_pg_type(series):
+    """Fallback PostgreSQL type for columns not declared in CLEANING_CONFIG."""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "BIGINT"
+    if pd.api.types.is_float_dtype(dtype):
+        return "DOUBLE PRECISION"
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return "TIMESTAMPTZ"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def build_create_table_sql(df, table_name, schema, if_not_exists=False):
+    """Build CREATE TABLE DDL from CLEANING_CONFIG dtypes, inferring undeclared columns."""
+    columns_config = get_columns_config(table_name)
+    column_defs = []
+    for col in df.columns:
+        dtype = columns_config.get(col, {}).get("dtype")
+        pg_type = PG_TYPES.get(dtype) or infer_pg_type(df[col])
+        column_defs.append(f'"{col}" {pg_type}')
+
+    exists_clause = "IF NOT EXISTS " if if_not_exists else ""
+    return f'CREATE TABLE {exists_clause}{schema}."{table_name}" ({", ".join(column_defs)})'
+
+
+# ---------- COPY BULK LOAD ----------
+def copy_dataframe(df, table_name, conn, schema, batch_rows=COPY_BATCH_ROWS):
+    """
+    Stream a DataFrame into an existing table with COPY FROM STDIN.
+
+    Rows are serialized to CSV in an in-memory buffer `batch_rows` at a time,
+    so the buffer never holds more than one batch.
+    """
+    columns = ", ".join(f'"{col}"' for col in df.columns)
+    copy_sql = (
+        f'COPY {schema}."{table_name}" ({columns}) '
+        f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    )
+
+    cursor = conn.connection.cursor()
+    try:
+        for start in range(0, len(df), batch_rows):
+            buffer = io.StringIO()
+            df.iloc[start:start + batch_rows].to_csv(buffer, index=False, header=False, na_rep=COPY_NULL)
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+    finally:
+        cursor.close()
+
+
+def copy_load_table(df, table_name, engine, schema, if_exists="replace"):
+    """Create the target table per `if_exists` and bulk-load it with COPY in one transaction."""
+    with engine.begin() as conn:
+        if if_exists == "replace":
+            conn.execute(text(f'DROP TABLE IF EXISTS {schema}."{table_name}"'))
+            conn.execute(text(build_create_table_sql(df, table_name, schema)))
+        elif if_exists == "append":
+            conn.execute(text(build_create_table_sql(df, table_name, schema, if_not_exists=True)))
+        elif if_exists == "fail":
+            conn.execute(text(build_create_table_sql(df, table_name, schema)))
+        else:
+            raise ValueError(f"Unsupported if_exists value: {if_exists}")
+
+        copy_dataframe(df, table_name, conn, schema)
+
+
+# ---------- UPSERT LOAD ----------
+def get_key_columns(table_name, df):
+    """Critical id columns of a table, used as the upsert conflict key."""
+    columns_config = get_columns_config(table_name)
+    key_columns = [col for col, conf in columns_config.items() if conf.get("critical", False)]
+    missing = [col for col in key_columns if col not in df.columns]
+    if not key_columns or missing:
+        raise ValueError(f"Cannot upsert '{table_name}': key columns {key_columns} missing {missing}")
+    return key_columns
+
+
+def upsert_table(df, table_name, engine, schema, order_column=None):
+    """
+    Merge a DataFrame into the target with INSERT ... ON CONFLICT on its key.
+
+    Rows are COPYed into a transaction-scoped temp table first, so the merge
+    itself is a single set-based statement. A unique index on the key is
+    created if missing so ON CONFLICT has a constraint to target. Rows
+    identical to the target's are left untouched and not counted.
+
+    When `df` holds several versions of a key, the one with the latest
+    `order_column` (e.g. the watermark) wins, and the last in `df` among
+    equals.
+    """
+    key_columns = get_key_columns(table_name, df)
+    columns = [f'"{col}"' for col in df.columns]
+    keys = ", ".join(f'"{col}"' for col in key_columns)
+    values = [col for col in columns if col.strip('"') not in key_columns]
+    updates = [f'{col} = EXCLUDED.{col}' for col in values]
+    # Re-read rows that change nothing are skipped rather than rewritten
+    conflict_action = (
+        f"DO UPDATE SET {', '.join(updates)} "
+        f"WHERE ({', '.join(f'target.{col}' for col in values)}) "
+        f"IS DISTINCT FROM ({', '.join(f'EXCLUDED.{col}' for col in values)})"
+    ) if values else "DO NOTHING"
+    staging_table = f"{table_name}_upsert"
+
+    with engine.begin() as conn:
+        conn.execute(text(build_create_table_sql(df, table_name, schema, if_not_exists=True)))
+        conn.execute(text(
+            f'CREATE UNIQUE INDEX IF NOT EXISTS "{table_name}_upsert_key" '
+            f'ON {schema}."{table_name}" ({keys})'
+        ))
+        conn.execute(text(
+            f'CREATE TEMP TABLE "{staging_table}" '
+            f'(LIKE {schema}."{table_name}" INCLUDING DEFAULTS) ON COMMIT DROP'
+        ))
+        # Numbers the rows in COPY (frame) order
+        conn.execute(text(
+            f'ALTER TABLE pg_temp."{staging_table}" '
+            f'ADD COLUMN "{UPSERT_ORDINAL}" bigint GENERATED ALWAYS AS IDENTITY'
+        ))
+        copy_dataframe(df, staging_table, conn, "pg_temp")
+
+        # DISTINCT ON keeps one row per key, the latest version, so a batch never hits the same row twice
+        order = [f'"{order_column}" DESC NULLS LAST'] if order_column in df.columns else []
+        order.append(f'"{UPSERT_ORDINAL}" DESC')
+        result = conn.execute(text(
+            f'INSERT INTO {schema}."{table_name}" AS target ({", ".join(columns)}) '
+            f'SELECT DISTINCT ON ({keys}) {", ".join(columns)} FROM pg_temp."{staging_table}" '
+            f'ORDER BY {keys}, {", ".join(order)} '
+            f'ON CONFLICT ({keys}) {conflict_action}'
+        ))
+        return result.rowcount
+
+
+def upsert_cleaned_data(cleaned_dataframes, engine, schema, order_columns=None):
+    """
+    Upsert cleaned DataFrames into PostgreSQL keyed on their critical columns.
+    `order_columns` ({table_name: column}) picks the latest version of a key
+    repeated within a frame (see `upsert_table`).
+
+    Returns:
+        dict: {table_name: {"rows", "seconds", "rows_per_sec"}} for merged tables.
+    """
+    load_stats = {}
+    order_columns = order_columns or {}
+
+    for table_name, df in cleaned_dataframes.items():
+        if df.empty:
+            logger.info(f"No new rows for '{table_name}'. Skipping upsert.")
+            continue
+
+        try:
+            start = time.perf_counter()
+            with track(table_name.removesuffix("_cleaned"), "load", "upsert", frame=df) as tracker, \
+                    connection_stage("load"):
+                merged = upsert_table(df, table_name, engine, schema, order_columns.get(table_name))
+                tracker.output(rows=merged)
+            seconds = time.perf_counter() - start
+
+            rows_per_sec = len(df) / seconds if seconds > 0 else float("inf")
+            load_stats[table_name] = {
+                "rows": len(df),
+                "seconds": round(seconds, 4),
+                "rows_per_sec": round(rows_per_sec, 1),
+            }
+            logger.info(
+                f"✅ Upserted {merged} of {len(df)} rows into {schema}.{table_name} "
+                f"in {seconds:.2f}s ({rows_per_sec:,.0f} rows/sec)"
+            )
+
+        except Exception as e:
+            logger.error(f"❌ Failed to upsert table '{table_name}'. Error: {e}")
+            logger.debug("Traceback:", exc_info=True)
+            raise
+
+    return load_stats
+
+
 # ---------- LOAD TO POSTGRES ----------
-def load_cleaned_data(cleaned_dataframes, engine, schema, if_exists="replace"):
+def _load_stats(rows, seconds):
+    rows_per_sec = rows / seconds if seconds > 0 else float("inf")
+    return {"rows": rows, "seconds": round(seconds, 4), "rows_per_sec": round(rows_per_sec, 1)}
+
+
+def _write_table(df, table_name, engine, schema, if_exists, method):
+    if method == "copy":
+        copy_load_table(df, table_name, engine, schema, if_exists=if_exists)
+    elif method == "to_sql":
+        df.to_sql(
+            name=table_name,
+            con=engine,
+            schema=schema,
+            if_exists=if_exists,  # Replaces table every ETL run
+            index=False
+        )
+    else:
+        raise ValueError(f"Unknown load method: {method}")
+
+
+def load_cleaned_data(cleaned_dataframes, engine, schema, if_exists="replace", method=LOAD_METHOD,
+                      swap=LOAD_SWAP, max_workers=LOAD_MAX_WORKERS, drop_tables=()):
+    """
+    Load cleaned DataFrames into PostgreSQL.
+
+    Full reloads (`if_exists="replace"`) go through staging tables and an
+    atomic swap when `swap` is set (see `swap_load_cleaned_data`); other
+    loads write each target table in turn. `drop_tables` (stale tables this
+    load makes obsolete) are dropped by the swap, or once every table has
+    loaded; a failed load keeps them.
+
+    Returns:
+        dict: {table_name: {"rows", "seconds", "rows_per_sec"}} for loaded tables.
+    """
+    if swap and if_exists == "replace":
+        return swap_load_cleaned_data(cleaned_dataframes, engine, schema, method, max_workers, drop_tables)
+
+    load_stats = {}
+
     for table_name, df in cleaned_dataframes.items():
         if df.empty:
             logger.warning(f"❌ DataFrame '{table_name}' is empty. Skipping load.")
@@ -45,38 +271,190 @@ def load_cleaned_data(cleaned_dataframes, engine, schema, if_exists="replace"):
 
         try:
             logger.info(f"📥 Preparing to load table '{table_name}' with {len(df)} rows.")
-            logger.debug(f"Dtypes for '{table_name}':\n{df.dtypes}")
-            logger.debug(f"Sample rows from '{table_name}':\n{df.head(3).to_dict(orient='records')}")
-
-            for col in df.columns:
-                if df[col].apply(lambda x: isinstance(x, (dict, list))).any():
-                    raise TypeError(
-                        f"Column '{col}' in table '{table_name}' contains dict or list types, "
-                        "which are not supported by SQLAlchemy."
-                    )
-
-            df.to_sql(
-                name=table_name,
-                con=engine,
-                schema=schema,
-                if_exists=if_exists,  # Replaces table every ETL run
-                index=False
+            if logger.isEnabledFor(logging.DEBUG):
+                # Rendering dtypes and sample rows is costly on wide frames; only pay for it at DEBUG
+                logger.debug("Dtypes for '%s':\n%s", table_name, df.dtypes)
+                logger.debug("Sample rows from '%s':\n%s", table_name, df.head(3).to_dict(orient='records'))
+
+            start = time.perf_counter()
+            with track(table_name.removesuffix("_cleaned"), "load", method, frame=df) as tracker, \
+                    connection_stage("load"):
+                _write_table(df, table_name, engine, schema, if_exists, method)
+                tracker.output(rows=len(df))
+            seconds = time.perf_counter() - start
+
+            load_stats[table_name] = _load_stats(len(df), seconds)
+            logger.info(
+                f"✅ Loaded {len(df)} rows into {schema}.{table_name} "
+                f"via {method} in {seconds:.2f}s ({load_stats[table_name]['rows_per_sec']:,.0f} rows/sec)"
             )
-            logger.info(f"✅ Loaded {len(df)} rows into {schema}.{table_name}")
 
         except Exception as e:
             logger.error(f"❌ Failed to load table '{table_name}'. Error: {e}")
-            logger.debug(traceback.format_exc())
+            logger.debug("Traceback:", exc_info=True)
             raise
 
+    if drop_tables:
+        drop_target_tables(drop_tables, engine, schema)
+    return load_stats
+
+
+def drop_target_tables(table_names, engine, schema):
+    with engine.begin() as conn:
+        for table_name in table_names:
+            conn.execute(text(f'DROP TABLE IF EXISTS {schema}."{table_name}"'))
+
+
+# ---------- STAGING LOAD AND SWAP ----------
+def staging_table_name(table_name):
+    return f"{table_name}{STAGING_SUFFIX}"
+
+
+def get_index_columns(table_name, df):
+    """Critical (id and foreign key) columns of a table, each given a btree index after loading."""
+    columns_config = get_columns_config(table_name)
+    return [col for col, conf in columns_config.items() if conf.get("critical", False) and col in df.columns]
+
+
+def _index_name(table_name, column):
+    return f"{table_name}_{column}_idx"
+
+
+def load_staging_table(df, table_name, engine, schema, method=LOAD_METHOD):
+    """
+    Bulk-load `df` into a fresh staging table for `table_name`, then build
+    its indexes and ANALYZE it. Indexes are built once over the loaded rows
+    instead of being maintained row by row during the load.
+    """
+    staging = staging_table_name(table_name)
+    _write_table(df, staging, engine, schema, "replace", method)
+    with engine.begin() as conn:
+        for column in get_index_columns(table_name, df):
+            conn.execute(text(
+                f'CREATE INDEX "{_index_name(staging, column)}" ON {schema}."{staging}" ("{column}")'
+            ))
+        conn.execute(text(f'ANALYZE {schema}."{staging}"'))
+
+
+def swap_staging_tables(table_columns, engine, schema,
+                        lock_timeout=LOAD_SWAP_LOCK_TIMEOUT, retries=LOAD_SWAP_RETRIES, drop_tables=()):
+    """
+    Replace every target in `table_columns` ({table_name: index columns})
+    with its staging table, and drop `drop_tables`, in one transaction:
+    readers see either all the old tables or all the new ones, and the swap
+    itself is catalog-only.
+
+    The swap waits at most `lock_timeout` for readers' locks (so queued
+    readers are not stalled behind it) and is retried with backoff.
+    """
+    for attempt in range(1, retries + 1):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout}'"))
+                for table_name, columns in table_columns.items():
+                    staging = staging_table_name(table_name)
+                    conn.execute(text(f'DROP TABLE IF EXISTS {schema}."{table_name}"'))
+                    conn.execute(text(f'ALTER TABLE {schema}."{staging}" RENAME TO "{table_name}"'))
+                    for column in columns:
+                        conn.execute(text(
+                            f'ALTER INDEX {schema}."{_index_name(staging, column)}" '
+                            f'RENAME TO "{_index_name(table_name, column)}"'
+                        ))
+                for table_name in drop_tables:
+                    conn.execute(text(f'DROP TABLE IF EXISTS {schema}."{table_name}"'))
+            return
+        except exc.OperationalError as e:
+            if attempt == retries:
+                raise
+            logger.warning(f"⚠️ Swap attempt {attempt} could not take table locks, retrying: {e.orig}")
+            time.sleep(2 ** attempt)
+
+
+def drop_staging_tables(table_names, engine, schema):
+    drop_target_tables([staging_table_name(table_name) for table_name in table_names], engine, schema)
+
+
+def swap_load_cleaned_data(cleaned_dataframes, engine, schema, method=LOAD_METHOD,
+                           max_workers=LOAD_MAX_WORKERS, drop_tables=()):
+    """
+    Replace the target tables atomically.
+
+    Every table is loaded into `<table>__staging` over its own pooled
+    connection, up to `max_workers` at a time, and indexed and analyzed
+    there; the targets stay untouched and readable meanwhile. All staging
+    tables are then swapped in, and `drop_tables` dropped, by one short
+    transaction. If any table fails, the staging tables are dropped and no
+    target changes.
+
+    Returns:
+        dict: {table_name: {"rows", "seconds", "rows_per_sec"}} for loaded tables.
+    """
+    frames = {}
+    for table_name, df in cleaned_dataframes.items():
+        if df.empty:
+            logger.warning(f"❌ DataFrame '{table_name}' is empty. Skipping load.")
+        else:
+            frames[table_name] = df
+    if not frames:
+        if drop_tables:
+            swap_staging_tables({}, engine, schema, drop_tables=drop_tables)
+        return {}
+
+    def _stage(table_name):
+        df = frames[table_name]
+        logger.info(f"📥 Staging table '{table_name}' with {len(df)} rows.")
+        start = time.perf_counter()
+        with track(table_name.removesuffix("_cleaned"), "load", f"{method}+swap", frame=df) as tracker, \
+                connection_stage("load"):
+            load_staging_table(df, table_name, engine, schema, method)
+            tracker.output(rows=len(df))
+        return _load_stats(len(df), time.perf_counter() - start)
+
+    load_stats = {}
+    try:
+        workers = max(1, min(max_workers, len(frames)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="load") as executor:
+            futures = {table_name: executor.submit(_stage, table_name) for table_name in frames}
+            errors = {}
+            for table_name, future in futures.items():
+                try:
+                    load_stats[table_name] = future.result()
+                except Exception as e:
+                    errors[table_name] = e
+                    logger.error(f"❌ Failed to stage table '{table_name}'. Error: {e}")
+        if errors:
+            raise next(iter(errors.values()))
+
+        start = time.perf_counter()
+        with connection_stage("load"):
+            swap_staging_tables({name: get_index_columns(name, df) for name, df in frames.items()}, engine, schema,
+                                drop_tables=drop_tables)
+        logger.info(f"✅ Swapped {len(frames)} tables into {schema} in {time.perf_counter() - start:.3f}s")
+
+    except Exception as e:
+        logger.error(f"❌ Staged load failed; target tables left unchanged. Error: {e}")
+        logger.debug("Traceback:", exc_info=True)
+        try:
+            drop_staging_tables(frames, engine, schema)
+        except Exception as cleanup_error:
+            logger.warning(f"⚠️ Could not drop staging tables: {cleanup_error}")
+        raise
+
+    for table_name, stats in load_stats.items():
+        logger.info(
+            f"✅ Loaded {stats['rows']} rows into {schema}.{table_name} "
+            f"via {method} in {stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/sec)"
+        )
+    return load_stats
+
 
 # ---------- MAIN ENTRY POINT ----------
-def main(cleaned_dataframes):
+def main(cleaned_dataframes, drop_tables=()):
     engine = None
     try:
         engine = get_engine()
         create_schema(engine, SCHEMA_NAME)
-        load_cleaned_data(cleaned_dataframes, engine, SCHEMA_NAME)
+        load_cleaned_data(cleaned_dataframes, engine, SCHEMA_NAME, drop_tables=drop_tables)
         logger.info("✅ Data load complete.")
         return True
     except Exception as e:
@@ -84,8 +462,4 @@ def main(cleaned_dataframes):
         return False
     finally:
         if engine:
-            try:
-                engine.dispose()
-                logger.info("✅ Database engine disposed.")
-            except Exception:
-                logger.warning("⚠️ Engine disposal failed or was not initialized.")
+            dispose_engine()
@@ -0,0 +1,163 @@
+import math
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import pandas as pd
+from config.config import TRANSFORM_MAX_WORKERS, TRANSFORM_PARTITION_ROWS
+from scripts.cleaning_plan import (
+    compile_cleaning_plan, detect_datetime_formats, prepare_columns, finalize_columns
+)
+from scripts.transform import transform_data
+from utils.arrow_frames import pa, to_arrow_exact, from_arrow_exact
+from utils.logger import logger
+
+
+# ---------- SHARED-MEMORY FRAME TRANSFER ----------
+def frame_to_shared(df):
+    """
+    Write a DataFrame into a shared memory block as an Arrow IPC stream.
+
+    Frames Arrow cannot round-trip exactly (see utils.arrow_frames) are
+    pickled into the block instead, so results never depend on the transport.
+
+    Returns:
+        tuple: a handle for `frame_from_shared`.
+    """
+    table, nan_columns = to_arrow_exact(df)
+    if table is not None:
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        payload = sink.getvalue()
+        del table
+        return ("arrow", _write_shared(payload), payload.size, nan_columns)
+
+    payload = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+    return ("pickle", _write_shared(payload), len(payload), [])
+
+
+def _write_shared(payload):
+    view = memoryview(payload).cast("B")
+    block = shared_memory.SharedMemory(create=True, size=max(1, view.nbytes))
+    block.buf[:view.nbytes] = view
+    name = block.name
+    block.close()
+    return name
+
+
+def frame_from_shared(handle):
+    """Read a DataFrame written by `frame_to_shared` and free its shared memory."""
+    kind, name, size, nan_columns = handle
+    block = shared_memory.SharedMemory(name=name)
+    view = block.buf[:size]
+    try:
+        if kind == "arrow":
+            # One memcpy out of the segment: Arrow may hand pandas zero-copy
+            # views of its buffers, and those must outlive the shared block
+            with pa.ipc.open_stream(pa.py_buffer(bytes(view))) as reader:
+                df = from_arrow_exact(reader.read_all(), nan_columns)
+        else:
+            df = pickle.loads(view)
+    finally:
+        view.release()
+        block.close()
+        block.unlink()
+    return df
+
+
+def release_shared(handle):
+    """Free a shared block that will never be read."""
+    block = shared_memory.SharedMemory(name=handle[1])
+    block.close()
+    block.unlink()
+
+
+def _release_unread(futures):
+    """Wait for outstanding tasks and free their results after a failure."""
+    for future in futures:
+        try:
+            release_shared(future.result())
+        except Exception:
+            pass
+
+
+# ---------- WORKER TASKS ----------
+def _clean_table_task(table_name, handle, config):
+    from scripts.transform import clean_table
+
+    df = frame_from_shared(handle)
+    return frame_to_shared(clean_table(df, table_name, config))
+
+
+def _prepare_partition_task(handle, plan):
+    df = frame_from_shared(handle)
+    return frame_to_shared(prepare_columns(df, plan))
+
+
+# ---------- PARALLEL TRANSFORM ----------
+def transform_data_parallel(raw_dataframes, config, max_workers=TRANSFORM_MAX_WORKERS,
+                            partition_rows=TRANSFORM_PARTITION_ROWS):
+    """
+    Clean all tables on a process pool.
+
+    Small tables are cleaned whole, one task per table. Tables taller than
+    `partition_rows` are split into row partitions whose row-local work
+    (casts, string cleaning) runs in parallel; the whole-table steps (null
+    thresholds, imputation, dedupe) then run once on the reassembled frame.
+    Partitions are reassembled in their original order, so the output is
+    identical to `transform_data`. Frames move between processes as Arrow
+    IPC streams in shared memory.
+
+    The DuckDB backend already runs each table on every core, so with it
+    tables are cleaned one after another in this process.
+    """
+    if config.get("backend") == "duckdb":
+        return transform_data(raw_dataframes, config)
+
+    cleaned_dataframes = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        table_futures = {}
+        partition_futures = {}
+
+        for table_name, df in raw_dataframes.items():
+            if len(df) > partition_rows:
+                # Every partition parses dates with the format detected on the whole table
+                plan = detect_datetime_formats(df, compile_cleaning_plan(table_name, config))
+                partitions = math.ceil(len(df) / partition_rows)
+                logger.info(f"Splitting '{table_name}' into {partitions} partitions of {partition_rows} rows.")
+                partition_futures[table_name] = (plan, [
+                    executor.submit(_prepare_partition_task,
+                                    frame_to_shared(df.iloc[i * partition_rows:(i + 1) * partition_rows]), plan)
+                    for i in range(partitions)
+                ])
+            else:
+                table_futures[table_name] = executor.submit(
+                    _clean_table_task, table_name, frame_to_shared(df), config
+                )
+
+        unread = list(table_futures.values())
+        for _, futures in partition_futures.values():
+            unread.extend(futures)
+
+        for table_name in raw_dataframes:
+            try:
+                if table_name in table_futures:
+                    future = table_futures[table_name]
+                    unread.remove(future)
+                    cleaned_df = frame_from_shared(future.result())
+                else:
+                    plan, futures = partition_futures[table_name]
+                    parts = []
+                    for future in futures:
+                        unread.remove(future)
+                        parts.append(frame_from_shared(future.result()))
+                    cleaned_df = finalize_columns(pd.concat(parts), plan)
+                    logger.info(f"✅ Finished cleaning table: {table_name}")
+                cleaned_dataframes[table_name] = cleaned_df
+            except Exception as e:
+                logger.error(f"❌ Failed to clean table '{table_name}': {e}", exc_info=True)
+                _release_unread(unread)
+                raise
+
+    return cleaned_dataframes
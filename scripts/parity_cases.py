@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from config.config import CLEANING_CONFIG
+
+PARITY_TABLE = "parity_case"
+
+
+def parity_config(columns, **overrides):
+    """CLEANING_CONFIG with a single `PARITY_TABLE` table holding `columns`."""
+    config = {key: value for key, value in CLEANING_CONFIG.items() if key != "tables"}
+    config.update(overrides)
+    config["tables"] = {PARITY_TABLE: {"columns": columns}}
+    return config
+
+
+def parity_cases():
+    """
+    (name, config, raw frame) inputs for comparing a SQL backend with the
+    pandas path, covering what the backends special-case: object columns
+    of mixed values, None vs NaN text nulls, 'Unknown' filled into date
+    columns, integer columns with nulls, float columns of integers,
+    null-threshold drops and duplicates.
+    """
+    n = 60
+    ids = np.arange(n)
+    cases = []
+
+    cases.append(("mixed object values", parity_config({
+        "id": {"dtype": "string", "critical": True, "impute": "skip"},
+        "code": {"dtype": "string", "impute": "mode"},
+    }), pd.DataFrame({
+        "ID": ids,
+        "Code": pd.Series([1, "a", 2.5, None, " B! "] * (n // 5), dtype=object),
+    })))
+
+    cases.append(("none vs nan text nulls", parity_config({
+        "id": {"dtype": "string", "critical": True, "impute": "skip"},
+        "name_none": {"dtype": "string", "impute": "mode"},
+        "name_nan": {"dtype": "string", "impute": "mode"},
+    }), pd.DataFrame({
+        "id": ids,
+        "Name None": pd.Series(["  Alice ", None, "BOB#", "carol"] * (n // 4), dtype=object),
+        "name_nan": pd.Series(["x", np.nan, "Y ", "z"] * (n // 4), dtype=object),
+        "Free Text": pd.Series([" Note!", None, "other", "note"] * (n // 4), dtype=object),
+    })))
+
+    cases.append(("unknown filled into dates", parity_config({
+        "id": {"dtype": "string", "critical": True, "impute": "skip"},
+        "start": {"dtype": "datetime", "impute": "default"},
+        "end": {"dtype": "datetime", "impute": "mode"},
+    }), pd.DataFrame({
+        "id": ids,
+        "Start": pd.Series(["2024-01-05", None, "2024-02-30", "2024-03-01"] * (n // 4), dtype=object),
+        "End": pd.Series(["2024-06-01", "2024-06-01", None, "2024-07-15"] * (n // 4), dtype=object),
+    })))
+
+    cases.append(("integers with nulls", parity_config({
+        "id": {"dtype": "string", "critical": True, "impute": "skip"},
+        "age": {"dtype": "int", "impute": "median"},
+        "score": {"dtype": "int", "impute": "skip"},
+        "amount": {"dtype": "float", "impute": "median"},
+        "count": {"dtype": "float", "impute": "median"},
+    }), pd.DataFrame({
+        "id": ids,
+        # Median 48.5 must round half away from zero into the Int64 column
+        "age": np.tile([48.0, 49.0, np.nan, 47.0, 50.0, np.nan], n // 6),
+        "score": np.tile([1.0, np.nan, 3.0], n // 3),
+        "amount": np.tile(["10", "12.5", None, "bad"], n // 4).astype(object),
+        # All integers, no nulls: pandas keeps them int64
+        "count": np.tile([3, 4, 5], n // 3),
+    })))
+
+    cases.append(("null thresholds and duplicates", parity_config({
+        "id": {"dtype": "string", "critical": True, "impute": "skip"},
+        "sparse": {"dtype": "float", "impute": "median"},
+        "a": {"dtype": "float", "impute": "median"},
+        "b": {"dtype": "string", "impute": "mode"},
+        "c": {"dtype": "datetime", "impute": "mode"},
+    }), pd.DataFrame({
+        "id": pd.Series(np.repeat(np.arange(n // 2), 2), dtype="int64"),
+        "sparse": np.where(ids % 5 == 0, 1.0, np.nan),
+        "a": np.where(ids % 3 == 0, np.nan, (ids // 2) % 4),
+        "b": pd.Series(np.where(ids % 7 == 0, None, "v"), dtype=object),
+        "c": pd.Series(np.where(ids % 3 == 0, None, "2023-05-01"), dtype=object),
+        "extra": np.where(ids % 3 == 0, np.nan, 1.5),
+    })))
+
+    return cases
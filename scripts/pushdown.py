@@ -0,0 +1,486 @@
+import math
+import time
+import pandas as pd
+from sqlalchemy import text
+from scripts.cleaning_plan import compile_cleaning_plan, normalize_column_names
+from scripts.extract import is_valid_table_name
+from utils.logger import logger
+
+# CLEANING_CONFIG dtype -> SQL type of the cleaned column
+SQL_TYPES = {
+    "string": "text",
+    "int": "bigint",
+    "float": "double precision",
+    "datetime": "timestamp",
+}
+
+# Same character class as cleaning_plan.TEXT_CLEAN_PATTERN, in PostgreSQL ARE syntax
+SQL_TEXT_CLEAN_PATTERN = r"[^a-z0-9\s.,''-]"
+# Python's str.strip() set; vertical tab as \x0B, since neither PostgreSQL nor DuckDB reads E'\v'
+WHITESPACE = r"E' \t\n\r\f\x0B'"
+
+# Session-scoped casts that return NULL instead of failing, like errors='coerce'
+SAFE_CAST_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION pg_temp.etl_try_timestamp(value text) RETURNS timestamp AS $$
+BEGIN
+    RETURN value::timestamp;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION pg_temp.etl_try_numeric(value text) RETURNS double precision AS $$
+BEGIN
+    RETURN btrim(value)::double precision;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+"""
+
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+# ---------- SQL DIALECTS ----------
+class PostgresDialect:
+    """How the cleaning SQL is spelled for PostgreSQL (the pushdown backend)."""
+
+    name = "postgres"
+    integer_types = {"smallint", "integer", "bigint"}
+    float_types = {"real", "double precision", "numeric"}
+    temporal_types = {"date", "timestamp without time zone", "timestamp with time zone"}
+    text_types = {"text", "character varying", "character"}
+    setup_sql = SAFE_CAST_FUNCTIONS
+
+    def family(self, raw_type):
+        """"integer", "float", "temporal", "text" or None for a source column type."""
+        for family, types in (("integer", self.integer_types), ("float", self.float_types),
+                              ("temporal", self.temporal_types), ("text", self.text_types)):
+            if raw_type in types:
+                return family
+        return None
+
+    def trim(self, expr):
+        return f"btrim({expr}, {WHITESPACE})"
+
+    def try_timestamp(self, expr, date_format=None):
+        return f"pg_temp.etl_try_timestamp({expr}::text)"
+
+    def try_numeric(self, expr):
+        return f"pg_temp.etl_try_numeric({expr}::text)"
+
+    def param(self, name):
+        return f":{name}"
+
+
+class DuckDBDialect(PostgresDialect):
+    """
+    DuckDB spelling: native TRY_CAST instead of the plpgsql helpers, and
+    dates parsed with the column's detected strftime format when known,
+    like the pandas path.
+    """
+
+    name = "duckdb"
+    integer_types = {"TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT",
+                     "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT"}
+    float_types = {"FLOAT", "DOUBLE"}
+    temporal_types = {"DATE", "TIMESTAMP", "TIMESTAMP_S", "TIMESTAMP_MS", "TIMESTAMP_NS"}
+    text_types = {"VARCHAR"}
+    setup_sql = None
+
+    def family(self, raw_type):
+        if raw_type.startswith("DECIMAL"):
+            return "float"
+        return super().family(raw_type)
+
+    def trim(self, expr):
+        return f"trim({expr}, {WHITESPACE})"
+
+    def try_timestamp(self, expr, date_format=None):
+        if date_format:
+            return f"try_strptime({expr}::text, '{date_format.replace(chr(39), chr(39) * 2)}')"
+        return f"try_cast({expr}::text AS timestamp)"
+
+    def try_numeric(self, expr):
+        return f"try_cast(trim({expr}::text) AS double precision)"
+
+    def param(self, name):
+        return f"${name}"
+
+
+POSTGRES = PostgresDialect()
+DUCKDB = DuckDBDialect()
+
+
+# ---------- SQL EXPRESSIONS ----------
+def clean_text_sql(expr, dialect=POSTGRES):
+    """Trim, lowercase and character-filter a text expression (transform.clean_text)."""
+    return f"regexp_replace(lower({dialect.trim(expr)}), '{SQL_TEXT_CLEAN_PATTERN}', '', 'g')"
+
+
+def as_text_sql(column, family, has_nulls, null_text="None"):
+    """
+    Render a raw column as text the way pandas astype(str) renders it.
+
+    NULL text becomes `null_text` ('None', or 'nan' for frames whose text
+    nulls are NaN) and NULL numbers 'nan'; integer columns holding NULLs
+    are floats in pandas, so their values gain a '.0' suffix.
+    """
+    col = quote(column)
+    if family == "integer":
+        if has_nulls:
+            return f"COALESCE({col}::text || '.0', 'nan')"
+        return f"{col}::text"
+    if family == "float":
+        return (
+            f"COALESCE(CASE WHEN {col} = trunc({col}) AND abs({col}) < 1e16 "
+            f"THEN trunc({col})::bigint::text || '.0' ELSE {col}::text END, 'nan')"
+        )
+    return f"COALESCE({col}::text, '{null_text}')"
+
+
+def cast_sql(column, family, dtype, dialect=POSTGRES, date_format=None):
+    """Cast a raw column to its configured type, NULL on failure."""
+    col = quote(column)
+    if dtype == "datetime":
+        if family == "temporal":
+            return f"{col}::timestamp"
+        return dialect.try_timestamp(col, date_format)
+    numeric = f"{col}::double precision" if family in ("integer", "float") else dialect.try_numeric(col)
+    if dtype == "int":
+        return f"round({numeric})::bigint"
+    return numeric
+
+
+# ---------- CLEANING QUERY COMPILER ----------
+def compile_cleaning_query(run, plan, source, raw_columns, dialect=POSTGRES, null_texts=None,
+                           date_formats=None, carry=(), materialize=None):
+    """
+    Compile the `clean_table` semantics for one source relation into SQL.
+
+    Casts, text cleaning, null-threshold column and row drops and
+    median/mode imputation become CTEs plus a final projection; the caller
+    adds the dedupe (DISTINCT, or a GROUP BY that keeps first occurrences)
+    and decides where the rows go. `run(sql, params=None)` executes a
+    statement and returns its first row; it is used for the few scalar
+    statistics the plan needs (null counts and fill values).
+
+    `raw_columns` are the source's (column, type) pairs in order,
+    `null_texts` overrides the text rendered for NULL text values per
+    column, `date_formats` gives strftime formats for datetime columns and
+    `carry` names extra source columns passed through the CTEs untouched.
+    `materialize(ctes)`, if given, stores the filtered rows once as a table
+    named `filtered` so the statistics and the final query read it instead
+    of recomputing the CTEs.
+
+    Returns:
+        dict: "ctes", "projections", "params", "total", "dropped", "kept"
+        and "fills" (fill value per imputed column).
+    """
+    columns_config = plan["columns"]
+    null_texts = null_texts or {}
+    date_formats = date_formats or {}
+    names = list(normalize_column_names([col for col, _ in raw_columns]))
+    families = {name: dialect.family(raw_type) for name, (_, raw_type) in zip(names, raw_columns)}
+
+    # 1. Null counts of raw and typed columns, in one scan of the source
+    typed_casts = {}
+    for name, (col, raw_type) in zip(names, raw_columns):
+        dtype = columns_config.get(name, {}).get("dtype")
+        if dtype in ("datetime", "int", "float"):
+            typed_casts[name] = cast_sql(col, families[name], dtype, dialect, date_formats.get(name))
+
+    selects = ["count(*)"] + [f"count({quote(col)})" for col, _ in raw_columns] \
+        + [f"count({expr})" for expr in typed_casts.values()]
+    counts = run(f"SELECT {', '.join(selects)} FROM {source}")
+    total = counts[0]
+    raw_non_null = dict(zip(names, counts[1:1 + len(raw_columns)]))
+    typed_non_null = dict(zip(typed_casts, counts[1 + len(raw_columns):]))
+
+    # 2. Typed expressions and SQL types
+    typed_exprs, sql_types, null_counts = {}, {}, {}
+    for name, (col, raw_type) in zip(names, raw_columns):
+        dtype = columns_config.get(name, {}).get("dtype")
+        if dtype == "string":
+            text_expr = as_text_sql(col, families[name], raw_non_null[name] < total, null_texts.get(col, "None"))
+            # Rendered integers ('-12', '7.0', 'nan') are already clean
+            typed_exprs[name] = text_expr if families[name] == "integer" else clean_text_sql(text_expr, dialect)
+            null_counts[name] = 0
+        elif name in typed_casts:
+            typed_exprs[name] = typed_casts[name]
+            null_counts[name] = total - typed_non_null[name]
+        else:
+            typed_exprs[name] = quote(col)
+            null_counts[name] = total - raw_non_null[name]
+        sql_types[name] = SQL_TYPES.get(dtype) or raw_type
+        if dtype in SQL_TYPES:
+            families[name] = {"string": "text", "int": "integer", "float": "float", "datetime": "temporal"}[dtype]
+
+    # 3. Column drops (same rule as drop_null_columns)
+    critical = plan["critical"]
+    dropped = [
+        name for name in names
+        if total and null_counts[name] / total > plan["drop_column_threshold"] and name not in critical
+    ]
+    kept = [name for name in names if name not in dropped]
+    missing_critical = [col for col in critical if col not in kept]
+    if missing_critical:
+        logger.error(f"❌ Critical columns missing from DataFrame: {missing_critical}")
+        raise ValueError(f"Critical columns missing from DataFrame: {missing_critical}")
+
+    # 4. Row filter (same rule as drop_null_rows)
+    # Cleaned string columns are never NULL; testing them would only make the
+    # planner evaluate their text cleaning twice
+    nullable = [name for name in kept if columns_config.get(name, {}).get("dtype") != "string"]
+    conditions = [f"{quote(col)} IS NOT NULL" for col in critical if col in nullable]
+    if nullable:
+        null_sum = " + ".join(f"({quote(name)} IS NULL)::int" for name in nullable)
+        conditions.append(f"({null_sum})::float8 / {len(kept)} <= {float(plan['drop_row_threshold'])!r}")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    typed_cte = ", ".join([f"{typed_exprs[name]} AS {quote(name)}" for name in kept] + [quote(col) for col in carry])
+    ctes = (
+        f"WITH typed AS (SELECT {typed_cte} FROM {source}), "
+        f"filtered AS (SELECT * FROM typed{where})"
+    )
+    if materialize is not None:
+        materialize(ctes)
+        ctes = ""
+
+    # 5. Imputation statistics over the filtered rows
+    count_selects = ["count(*)"] + [f"count({quote(name)})" for name in kept]
+    filtered_counts = run(f"{ctes} SELECT {', '.join(count_selects)} FROM filtered")
+    filtered_total = filtered_counts[0]
+    needs_fill = [name for name, non_null in zip(kept, filtered_counts[1:]) if non_null < filtered_total]
+
+    fills = {}
+    aggregates = {}
+    for name in needs_fill:
+        col_conf = columns_config.get(name, {})
+        strategy = col_conf.get("impute", "default")
+        numeric = families[name] in ("integer", "float")
+        if strategy == "skip":
+            continue
+        if strategy == "median" or (strategy == "default" and numeric):
+            aggregates[name] = f"percentile_cont(0.5) WITHIN GROUP (ORDER BY {quote(name)})"
+        elif strategy == "mode":
+            aggregates[name] = f"mode() WITHIN GROUP (ORDER BY {quote(name)})"
+        elif strategy == "constant":
+            fills[name] = col_conf.get("value", "Unknown")
+        elif strategy == "default":
+            fills[name] = "Unknown"
+        else:
+            logger.error(f"❌ Unknown imputation strategy '{strategy}' for column '{name}'")
+            raise ValueError(f"Unknown imputation strategy '{strategy}' for column '{name}'")
+
+    if aggregates:
+        values = run(f"{ctes} SELECT {', '.join(aggregates.values())} FROM filtered")
+        for name, value in zip(aggregates, values):
+            strategy = columns_config.get(name, {}).get("impute", "default")
+            fills[name] = value if value is not None else (0 if strategy != "mode" else "Unknown")
+            if families[name] == "integer" and isinstance(fills[name], float) and not fills[name].is_integer():
+                # Round a half median (48.5) half away from zero like impute_value; a bound
+                # double would be cast to bigint half to even by DuckDB
+                fills[name] = math.copysign(math.floor(abs(fills[name]) + 0.5), fills[name])
+
+    # 6. Final projection: fill and clean remaining text columns
+    params = {}
+    projections = []
+    for i, name in enumerate(kept):
+        expr = quote(name)
+        sql_type = sql_types[name]
+        is_text = families[name] == "text"
+        dtype = columns_config.get(name, {}).get("dtype")
+
+        if name in fills:
+            params[f"fill_{i}"] = fills[name]
+            fill = dialect.param(f"fill_{i}")
+            if isinstance(fills[name], str) and not is_text:
+                # e.g. 'Unknown' into a date column: pandas turns it into a text column
+                expr, is_text = f"COALESCE({expr}::text, {fill})", True
+            else:
+                expr = f"COALESCE({expr}, CAST({fill} AS {sql_type}))"
+
+        if is_text and dtype not in ("string", "datetime"):
+            expr = clean_text_sql(expr, dialect)
+        projections.append(f"{expr} AS {quote(name)}")
+
+    return {
+        "ctes": ctes, "projections": projections, "params": params,
+        "total": total, "dropped": dropped, "kept": kept, "fills": fills,
+    }
+
+
+# ---------- PUSHDOWN ----------
+def get_source_columns(conn, table_name, source_schema):
+    """Return [(column_name, data_type)] for the source table in ordinal order."""
+    rows = conn.execute(text(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = :schema AND table_name = :table ORDER BY ordinal_position"
+    ), {"schema": source_schema, "table": table_name}).fetchall()
+    if not rows:
+        raise ValueError(f"Source table not found: {source_schema}.{table_name}")
+    return [(row[0], row[1]) for row in rows]
+
+
+def pushdown_clean_table(engine, table_name, config, target_schema, source_schema="public",
+                         target_table=None):
+    """
+    Clean a table entirely inside PostgreSQL.
+
+    Runs the compiled cleaning query (see `compile_cleaning_query`) with a
+    DISTINCT dedupe. Only a few scalar statistics cross the wire; the rows
+    go straight from the source table into `target_table` via CREATE TABLE AS.
+
+    Output matches the pandas path row for row (order aside) except for
+    malformed date text, which PostgreSQL's timestamp parser and
+    pd.to_datetime do not always agree on.
+
+    Returns:
+        dict: row count and timings of the created table.
+    """
+    if not (is_valid_table_name(table_name) and is_valid_table_name(source_schema)
+            and is_valid_table_name(target_schema)):
+        raise ValueError(f"Invalid table or schema name: {source_schema}.{table_name}")
+
+    plan = compile_cleaning_plan(table_name, config)
+    target_table = target_table or f"{table_name}_cleaned"
+    source = f"{quote(source_schema)}.{quote(table_name)}"
+    start = time.perf_counter()
+
+    with engine.begin() as conn:
+        conn.execute(text(POSTGRES.setup_sql))
+        raw_columns = get_source_columns(conn, table_name, source_schema)
+        query = compile_cleaning_query(
+            lambda sql, params=None: conn.execute(text(sql), params or {}).fetchone(),
+            plan, source, raw_columns, POSTGRES,
+        )
+
+        target = f"{quote(target_schema)}.{quote(target_table)}"
+        conn.execute(text(f"DROP TABLE IF EXISTS {target}"))
+        conn.execute(text(
+            f"CREATE TABLE {target} AS {query['ctes']} "
+            f"SELECT DISTINCT {', '.join(query['projections'])} FROM filtered"
+        ), query["params"])
+        rows = conn.execute(text(f"SELECT count(*) FROM {target}")).scalar()
+
+    seconds = time.perf_counter() - start
+    total, dropped = query["total"], query["dropped"]
+    logger.info(
+        f"✅ Pushed down cleaning of '{table_name}' into {target_schema}.{target_table}: "
+        f"{total} rows in, {rows} rows out, dropped columns {dropped} in {seconds:.2f}s"
+    )
+    return {"rows_in": total, "rows": rows, "seconds": round(seconds, 4), "dropped_columns": dropped}
+
+
+# ---------- PARITY CHECK ----------
+def normalize_for_comparison(df):
+    """Decode categories, unify numeric types and sort rows so frames compare by what gets loaded."""
+    df = df.copy()
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(object)
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            series = series.astype("float64")
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            series = pd.to_datetime(series)
+        elif series.dtype == object:
+            # Dates mixed with a text fill ('Unknown') load as text: compare them as text
+            series = series.map(lambda value: str(value) if isinstance(value, pd.Timestamp) else value)
+        df[col] = series
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def verify_parity(engine, table_name, config, source_schema="public", scratch_schema="public"):
+    """
+    Compare the pushdown backend with the pandas `clean_table` path on one table.
+
+    Runs the pushdown into a scratch table, reads it back and checks it
+    against pandas cleaning of the same source rows (row order ignored).
+
+    Returns:
+        bool: True when both backends produce the same rows.
+    """
+    from scripts.transform import clean_table
+
+    scratch_table = f"{table_name}_pushdown_check"
+    pushdown_clean_table(engine, table_name, config, scratch_schema, source_schema, scratch_table)
+    try:
+        pushed = pd.read_sql_query(f'SELECT * FROM "{scratch_schema}"."{scratch_table}"', con=engine)
+        raw = pd.read_sql_query(f'SELECT * FROM "{source_schema}"."{table_name}"', con=engine)
+        expected = clean_table(raw, table_name, config)
+
+        pd.testing.assert_frame_equal(
+            normalize_for_comparison(pushed), normalize_for_comparison(expected), check_dtype=False
+        )
+        logger.info(f"✅ Pushdown parity holds for '{table_name}' ({len(pushed)} rows)")
+        return True
+    except AssertionError as e:
+        logger.error(f"❌ Pushdown parity mismatch for '{table_name}': {e}")
+        return False
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE IF EXISTS "{scratch_schema}"."{scratch_table}"'))
+
+
+def check_parity_cases(engine, schema="public"):
+    """
+    Run `verify_parity` on the synthetic inputs of scripts/parity_cases.py,
+    each written to a scratch source table first. Mixed-type object
+    columns are skipped: a database column holds values of one type.
+
+    Returns:
+        dict: {case name: True when pushdown and pandas agree}
+    """
+    from scripts.parity_cases import PARITY_TABLE, parity_cases
+
+    results = {}
+    for name, config, raw in parity_cases():
+        if name == "mixed object values":
+            continue
+        raw.to_sql(PARITY_TABLE, engine, schema=schema, if_exists="replace", index=False)
+        try:
+            results[name] = verify_parity(engine, PARITY_TABLE, config, schema, schema)
+        finally:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {quote(schema)}.{quote(PARITY_TABLE)}"))
+    return results
+
+
+# ---------- STANDALONE TEST ----------
+if __name__ == "__main__":
+    import sys
+    from config.config import CLEANING_CONFIG
+    from scripts.db_connection import get_engine, dispose_engine
+    from scripts import duckdb_backend
+
+    # Database-free check: the same compiled cleaning query, run by DuckDB over the synthetic cases
+    results = {}
+    if duckdb_backend.duckdb is None:
+        logger.warning("⚠️ duckdb is not installed; skipping the database-free parity check")
+    else:
+        try:
+            duckdb_backend.check_parity_cases()
+            results["synthetic cases (DuckDB)"] = True
+        except AssertionError as e:
+            logger.error(f"❌ {e}")
+            results["synthetic cases (DuckDB)"] = False
+
+    # PostgreSQL run on the sample tables and the cases, where a database is reachable
+    try:
+        engine = get_engine(retries=1)
+    except Exception as e:
+        logger.warning(f"⚠️ PostgreSQL is not reachable; skipping the PostgreSQL parity check: {e}")
+        engine = None
+    if engine is not None:
+        results.update({table: verify_parity(engine, table, CLEANING_CONFIG) for table in CLEANING_CONFIG["tables"]})
+        results.update(check_parity_cases(engine))
+        dispose_engine()
+
+    for name, ok in results.items():
+        print(f"{name}: {'parity OK' if ok else 'MISMATCH'}")
+    if not results:
+        logger.error("❌ No parity check could run (neither duckdb nor PostgreSQL is available)")
+    sys.exit(0 if results and all(results.values()) else 1)
@@ -0,0 +1,189 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+from config.config import PIPELINE_WORKERS, PIPELINE_QUEUE_SIZE
+from utils.logger import logger
+
+STAGES = ("extract", "transform", "load")
+
+# Sentinel telling a stage worker to exit
+_DONE = object()
+
+
+# ---------- STAGE WORKER ----------
+def _forward(stage, table_name, out_queue, failed_tables, lock, forwarded, future):
+    """Pass a deferred stage result downstream once its future resolves."""
+    try:
+        error = future.exception()
+        if error is None:
+            out_queue.put((table_name, future.result()))
+        else:
+            logger.error(f"❌ Stage '{stage}' failed for table '{table_name}': {error}", exc_info=error)
+            with lock:
+                failed_tables[table_name] = stage
+    finally:
+        # The next stage is only drained once every deferred item has been queued or dropped
+        forwarded.set()
+
+
+def _stage_worker(stage, func, in_queue, out_queue, timings, failed_tables, lock, run_start, deferred):
+    """Pull (table, payload) items, run `func` on them and pass results downstream."""
+    while True:
+        item = in_queue.get()
+        if item is _DONE:
+            return
+
+        table_name, payload = item
+        start = time.perf_counter() - run_start
+        try:
+            result = func(table_name, payload)
+        except Exception as e:
+            logger.error(f"❌ Stage '{stage}' failed for table '{table_name}': {e}", exc_info=True)
+            with lock:
+                failed_tables[table_name] = stage
+            continue
+        finally:
+            end = time.perf_counter() - run_start
+            with lock:
+                timings.setdefault(table_name, {})[stage] = {
+                    "start": round(start, 4),
+                    "end": round(end, 4),
+                    "seconds": round(end - start, 4),
+                }
+
+        logger.info(f"✅ {stage} finished for '{table_name}' in {end - start:.2f}s")
+        if out_queue is None:
+            continue
+        if isinstance(result, Future):
+            # Not ready yet (e.g. waiting on another table): forwarded when it resolves,
+            # without holding this worker
+            forwarded = threading.Event()
+            with lock:
+                deferred.append(forwarded)
+            result.add_done_callback(partial(_forward, stage, table_name, out_queue, failed_tables, lock, forwarded))
+        else:
+            # Blocks while the next stage is backed up, bounding frames in flight
+            out_queue.put((table_name, result))
+
+
+def _start_workers(count, *args):
+    threads = [
+        threading.Thread(target=_stage_worker, args=args, name=f"{args[0]}-{i}", daemon=True)
+        for i in range(max(1, count))
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def _drain(threads, in_queue, deferred=()):
+    """
+    Wait for the results deferred into `in_queue` to arrive, then signal every
+    worker of a stage to stop once its queue is empty and wait for them.
+    """
+    for forwarded in deferred:
+        forwarded.wait()
+    for _ in threads:
+        in_queue.put(_DONE)
+    for thread in threads:
+        thread.join()
+
+
+# ---------- CRITICAL PATH ----------
+def critical_path(timings, tables):
+    """
+    Return the stage chain of the last table to finish.
+
+    Each segment is a stage or the time the table spent queued before it,
+    so the summary shows where the end-to-end latency actually went.
+    """
+    finished = [t for t in tables if t in timings and "load" in timings[t]]
+    if not finished:
+        return None
+
+    last_table = max(finished, key=lambda t: timings[t]["load"]["end"])
+    segments = []
+    previous_end = 0.0
+    for stage in STAGES:
+        stage_timing = timings[last_table][stage]
+        wait = stage_timing["start"] - previous_end
+        if wait > 0:
+            segments.append({"segment": f"wait:{stage}", "seconds": round(wait, 4)})
+        segments.append({"segment": stage, "seconds": stage_timing["seconds"]})
+        previous_end = stage_timing["end"]
+
+    return {"table": last_table, "end": previous_end, "segments": segments}
+
+
+# ---------- PIPELINED RUN ----------
+def run_pipeline(tables, extract_fn, transform_fn, load_fn,
+                 workers=PIPELINE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE):
+    """
+    Run every table as its own extract -> transform -> load chain.
+
+    Stages run in their own worker threads connected by bounded queues, so
+    one table can load while another is still transforming. Each stage
+    function is called as fn(table_name, payload) and its return value is
+    handed to the next stage. A stage may return a concurrent.futures.Future
+    instead (e.g. a step waiting on another table); its result is handed on
+    when it resolves, and the stage's worker moves on to the next table.
+
+    Returns:
+        dict: per-table stage timings, failed tables, wall time and critical path.
+    """
+    run_start = time.perf_counter()
+    timings = {}
+    failed_tables = {}
+    lock = threading.Lock()
+
+    extract_queue = queue.Queue()
+    transform_queue = queue.Queue(maxsize=queue_size)
+    load_queue = queue.Queue(maxsize=queue_size)
+
+    common = (timings, failed_tables, lock, run_start)
+    deferred = {stage: [] for stage in STAGES}
+    extract_threads = _start_workers(workers.get("extract", 1), "extract", extract_fn,
+                                     extract_queue, transform_queue, *common, deferred["extract"])
+    transform_threads = _start_workers(workers.get("transform", 1), "transform", transform_fn,
+                                       transform_queue, load_queue, *common, deferred["transform"])
+    load_threads = _start_workers(workers.get("load", 1), "load", load_fn,
+                                  load_queue, None, *common, deferred["load"])
+
+    for table_name in tables:
+        extract_queue.put((table_name, None))
+
+    _drain(extract_threads, extract_queue)
+    _drain(transform_threads, transform_queue, deferred["extract"])
+    _drain(load_threads, load_queue, deferred["transform"])
+
+    wall = round(time.perf_counter() - run_start, 4)
+    report = {
+        "tables": timings,
+        "failed_tables": failed_tables,
+        "wall_seconds": wall,
+        "critical_path": critical_path(timings, tables),
+    }
+    log_pipeline_report(report)
+    return report
+
+
+def log_pipeline_report(report):
+    for table_name, stages in report["tables"].items():
+        parts = ", ".join(f"{stage} {t['seconds']:.2f}s" for stage, t in stages.items())
+        logger.info(f"⏱️ {table_name}: {parts}")
+
+    busy = {
+        stage: sum(t[stage]["seconds"] for t in report["tables"].values() if stage in t)
+        for stage in STAGES
+    }
+    logger.info("⏱️ Stage busy time: " + ", ".join(f"{s} {v:.2f}s" for s, v in busy.items()))
+
+    path = report["critical_path"]
+    if path:
+        chain = " → ".join(f"{seg['segment']} {seg['seconds']:.2f}s" for seg in path["segments"])
+        logger.info(f"🛤️ Critical path ({path['table']}): {chain} = {path['end']:.2f}s of {report['wall_seconds']:.2f}s wall")
+
+    if report["failed_tables"]:
+        logger.warning(f"⚠️ Failed tables (stage): {report['failed_tables']}")
@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+import time
+from sqlalchemy import text
+from config.config import (
+    CLEANING_CONFIG, STAGING_CACHE_DIR, STAGING_CACHE_MAX_BYTES,
+)
+from utils.arrow_frames import pa, to_arrow_exact, from_arrow_exact
+from utils.logger import logger
+
+MANIFEST_NAME = "manifest.json"
+
+# Extract threads share one manifest per cache directory
+_manifest_lock = threading.Lock()
+
+
+# ---------- SOURCE FINGERPRINT ----------
+def get_fingerprint_column(table, config=CLEANING_CONFIG):
+    """First critical column of the table (its id), used as the max-id probe."""
+    columns_config = config.get("tables", {}).get(table, {}).get("columns", {})
+    for col, conf in columns_config.items():
+        if conf.get("critical", False):
+            return col
+    return None
+
+
+def source_fingerprint(table, engine, id_column=None):
+    """
+    Cheap change detector for a source table: row count, max id and a
+    checksum over every row's text form, computed in one scan inside
+    PostgreSQL so no rows leave the server.
+
+    Returns:
+        dict: JSON-serializable fingerprint.
+    """
+    max_id = f'max("{id_column}")::text' if id_column else "NULL"
+    query = text(
+        f"SELECT count(*), {max_id}, coalesce(sum(hashtext(t::text)::bigint), 0)::text "
+        f"FROM {table} t"
+    )
+    with engine.connect() as conn:
+        row_count, max_value, checksum = conn.execute(query).one()
+    return {"rows": row_count, "max_id": max_value, "checksum": checksum}
+
+
+# ---------- MANIFEST ----------
+def _manifest_path(cache_dir):
+    return os.path.join(cache_dir, MANIFEST_NAME)
+
+
+def _snapshot_path(cache_dir, table):
+    return os.path.join(cache_dir, f"{table}.arrow")
+
+
+def load_manifest(cache_dir=STAGING_CACHE_DIR):
+    """Return {table: entry} describing the snapshots in the cache directory."""
+    path = _manifest_path(cache_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest, cache_dir):
+    path = _manifest_path(cache_dir)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _remove_snapshot(manifest, table, cache_dir):
+    manifest.pop(table, None)
+    path = _snapshot_path(cache_dir, table)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+# ---------- READ / WRITE SNAPSHOTS ----------
+def read_snapshot(table, fingerprint, cache_dir=STAGING_CACHE_DIR):
+    """
+    Return the cached DataFrame for `table` if its fingerprint matches, else None.
+
+    The snapshot is an uncompressed Arrow IPC file opened through a memory
+    map, so reading it costs page-ins rather than a database round trip.
+    """
+    if pa is None:
+        return None
+
+    with _manifest_lock:
+        manifest = load_manifest(cache_dir)
+        entry = manifest.get(table)
+        path = _snapshot_path(cache_dir, table)
+        if entry is None or entry["fingerprint"] != fingerprint or not os.path.exists(path):
+            return None
+        entry["last_access"] = time.time()
+        _save_manifest(manifest, cache_dir)
+
+    with pa.memory_map(path, "r") as source:
+        df = from_arrow_exact(pa.ipc.open_file(source).read_all(), entry["nan_columns"])
+    return df
+
+
+def write_snapshot(table, df, fingerprint, cache_dir=STAGING_CACHE_DIR,
+                   max_bytes=STAGING_CACHE_MAX_BYTES):
+    """
+    Store an extracted table with its source fingerprint, then evict least
+    recently used snapshots until the directory fits in `max_bytes`.
+
+    Frames Arrow cannot round-trip exactly are not cached.
+
+    Returns:
+        bool: True if the snapshot was written.
+    """
+    table_data, nan_columns = to_arrow_exact(df)
+    if table_data is None:
+        logger.warning(f"⚠️ Table '{table}' cannot be stored losslessly as Arrow; not caching it.")
+        return False
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _snapshot_path(cache_dir, table)
+    tmp_path = f"{path}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table_data.schema) as writer:
+            writer.write_table(table_data)
+    size = os.path.getsize(tmp_path)
+
+    with _manifest_lock:
+        manifest = load_manifest(cache_dir)
+        if size > max_bytes:
+            os.remove(tmp_path)
+            _remove_snapshot(manifest, table, cache_dir)
+            _save_manifest(manifest, cache_dir)
+            logger.warning(f"⚠️ Snapshot of '{table}' ({size} bytes) exceeds the cache cap; not caching it.")
+            return False
+
+        os.replace(tmp_path, path)
+        now = time.time()
+        manifest[table] = {
+            "fingerprint": fingerprint,
+            "bytes": size,
+            "created": now,
+            "last_access": now,
+            "nan_columns": nan_columns,
+        }
+        evicted = evict_snapshots(manifest, cache_dir, max_bytes)
+        _save_manifest(manifest, cache_dir)
+
+    logger.info(f"✅ Cached snapshot of '{table}' ({size} bytes)")
+    if evicted:
+        logger.info(f"Evicted staging snapshots: {evicted}")
+    return True
+
+
+def evict_snapshots(manifest, cache_dir=STAGING_CACHE_DIR, max_bytes=STAGING_CACHE_MAX_BYTES):
+    """Drop least recently used snapshots until the total size fits in `max_bytes`."""
+    evicted = []
+    total = sum(entry["bytes"] for entry in manifest.values())
+    for table in sorted(manifest, key=lambda name: manifest[name]["last_access"]):
+        if total <= max_bytes:
+            break
+        total -= manifest[table]["bytes"]
+        _remove_snapshot(manifest, table, cache_dir)
+        evicted.append(table)
+    return evicted
+
+
+# ---------- CACHED EXTRACT ----------
+def extract_with_cache(table, engine, extract_fn, cache_dir=STAGING_CACHE_DIR,
+                       max_bytes=STAGING_CACHE_MAX_BYTES):
+    """
+    Serve `table` from the staging cache when the source is unchanged,
+    otherwise run `extract_fn(table, engine)` and refresh the snapshot.
+
+    The fingerprint is taken before extracting, so rows written during the
+    extract change the next run's fingerprint and are never missed. Cache
+    failures are logged and fall back to a normal extract.
+    """
+    try:
+        fingerprint = source_fingerprint(table, engine, get_fingerprint_column(table))
+        df = read_snapshot(table, fingerprint, cache_dir)
+        if df is not None:
+            logger.info(f"✅Loaded table: {table} with {len(df)} rows from staging cache (source unchanged)")
+            return df
+    except Exception as e:
+        logger.warning(f"⚠️ Staging cache unavailable for '{table}', extracting from source: {e}")
+        return extract_fn(table, engine)
+
+    df = extract_fn(table, engine)
+    try:
+        write_snapshot(table, df, fingerprint, cache_dir, max_bytes)
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to cache snapshot of '{table}': {e}")
+    return df
+
+
+# ---------- STANDALONE TEST ----------
+if __name__ == "__main__":
+    from scripts.db_connection import get_engine, dispose_engine
+    from scripts.extract import TABLES_TO_EXTRACT
+
+    engine = get_engine()
+    manifest = load_manifest()
+    for table in TABLES_TO_EXTRACT:
+        fingerprint = source_fingerprint(table, engine, get_fingerprint_column(table))
+        cached = manifest.get(table, {}).get("fingerprint") == fingerprint
+        print(f"{table}: {fingerprint} ({'cached' if cached else 'stale or missing'})")
+    dispose_engine()
@@ -1,19 +1,28 @@
+import logging
 import pandas as pd
+from scripts.cleaning_plan import (
+    compile_cleaning_plan, apply_cleaning_plan, map_unique_text, strip_text_value,
+    clean_text, categorize_low_cardinality, impute_value
+)
+from scripts.type_conversion import parse_datetime, infer_datetime_format, optimize_dtypes
 from utils.logger import logger  # centralized logger
+from utils.metrics import instrument, track
 
 
 # --- Missing Values Handling ---
 
+@instrument("transform")
 def drop_null_columns(df, columns_config, drop_threshold):
     null_ratios = df.isnull().mean()
     critical_cols = [col for col, conf in columns_config.items() if conf.get('critical', False)]
     drop_cols = null_ratios[(null_ratios > drop_threshold) & (~null_ratios.index.isin(critical_cols))].index.tolist()
 
     df = df.drop(columns=drop_cols)
-    logger.info(f"✅ Dropped columns above threshold {drop_threshold}: {drop_cols}")
+    logger.info("✅ Dropped columns above threshold %s: %s", drop_threshold, drop_cols)
     return df
 
 
+@instrument("transform")
 def drop_null_rows(df, drop_threshold, columns_config):
     critical_cols = [col for col, conf in columns_config.items() if conf.get('critical', False)]
     missing_critical_cols = [col for col in critical_cols if col not in df.columns]
@@ -33,46 +42,39 @@ def drop_null_rows(df, drop_threshold, columns_config):
     dropped_count = len(df) - combined_mask.sum()
 
     df = df.loc[combined_mask].copy()
-    logger.info(f"✅ Dropped {dropped_count} rows missing critical columns or exceeding null threshold {drop_threshold}")
+    logger.info("✅ Dropped %d rows missing critical columns or exceeding null threshold %s",
+                dropped_count, drop_threshold)
     return df
 
 
-def impute_missing_values(df, columns_config):
+@instrument("transform")
+def impute_missing_values(df, columns_config, stats=None, default_stats="exact"):
     for col in df.columns:
+        col_conf = columns_config.get(col, {})
+        strategy = col_conf.get('impute', 'default')
+
+        # Running statistics see every column of every chunk, with or without nulls
+        if stats is not None and strategy != 'skip':
+            stats.observe(col, df[col], strategy, col_conf)
+
         missing_count = df[col].isnull().sum()
         if missing_count == 0:
             continue
 
-        col_conf = columns_config.get(col, {})
-        strategy = col_conf.get('impute', 'default')
-
         if strategy == 'skip':
-            logger.info(f"✅ Skipped imputation for critical column: {col}")
+            logger.info("✅ Skipped imputation for critical column: %s", col)
             continue
 
-        if strategy == 'median':
-            value = df[col].median() if not df[col].dropna().empty else 0
-        elif strategy == 'mode':
-            value = df[col].mode().iloc[0] if not df[col].mode().empty else 'Unknown'
-        elif strategy == 'constant':
-            value = col_conf.get('value', 'Unknown')
-        elif strategy == 'default':
-            if pd.api.types.is_numeric_dtype(df[col]):
-                value = df[col].median() if not df[col].dropna().empty else 0
-            else:
-                value = 'Unknown'
-        else:
-            logger.error(f"❌ Unknown imputation strategy '{strategy}' for column '{col}'")
-            raise ValueError(f"Unknown imputation strategy '{strategy}' for column '{col}'")
-
+        value = impute_value(df[col], strategy, col_conf, col, stats, default_stats)
         df[col] = df[col].fillna(value)
-        logger.info(f"✅ Imputed '{col}' with strategy '{strategy}', value: {value}")
+        logger.info("✅ Imputed '%s' with strategy '%s', value: %s", col, strategy, value)
 
     return df
 
 
 # --- Data Type Standardization ---
 
+@instrument("transform")
 def standardize_data_types(df, columns_config):
     for col, conf in columns_config.items():
         if col not in df.columns:
@@ -81,14 +83,14 @@ def standardize_data_types(df, columns_config):
         dtype = conf.get('dtype')
         try:
             if dtype == 'datetime':
-                df[col] = pd.to_datetime(df[col], errors='coerce')
+                df[col] = parse_datetime(df[col], infer_datetime_format(df[col]))
             elif dtype == 'int':
                 df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
             elif dtype == 'float':
                 df[col] = pd.to_numeric(df[col], errors='coerce')
             elif dtype == 'string':
-                df[col] = df[col].astype(str).str.strip()
-            logger.info(f"✅ Standardized '{col}' to {dtype}")
+                df[col] = map_unique_text(df[col], strip_text_value)
+            logger.info("✅ Standardized '%s' to %s", col, dtype)
         except Exception as e:
             logger.error(f"❌ Error converting '{col}' to {dtype}: {e}", exc_info=True)
 
@@ -97,7 +99,8 @@ def standardize_data_types(df, columns_config):
 
 # --- Text Cleaning ---
 
-def clean_text_fields(df, columns_config=None):
+@instrument("transform")
+def clean_text_fields(df, columns_config=None, max_categories=0):
     text_cols = df.select_dtypes(include='object').columns
 
     for col in text_cols:
@@ -107,15 +110,9 @@ def clean_text_fields(df, columns_config=None):
                 continue
 
         try:
-            cleaned = (
-                df[col]
-                .astype(str)
-                .str.strip()
-                .str.lower()
-                .str.replace(r"[^a-z0-9\s\.,'-]", '', regex=True)
-            )
-            df[col] = cleaned
-            logger.info(f"✅ Cleaned text column: {col}")
+            categorical = (columns_config or {}).get(col, {}).get('categorical', True) is not False
+            df[col] = clean_text(df[col], max_categories if categorical else 0)
+            logger.info("✅ Cleaned text column: %s", col)
         except Exception as e:
             logger.error(f"❌ Error cleaning text in column '{col}': {e}", exc_info=True)
 
@@ -124,16 +121,18 @@ def clean_text_fields(df, columns_config=None):
 
 # --- Remove duplicates ---
 
+@instrument("transform")
 def remove_duplicates(df):
     before = len(df)
     df = df.drop_duplicates()
     after = len(df)
-    logger.info(f"✅ Removed {before - after} duplicate rows")
+    logger.info("✅ Removed %d duplicate rows", before - after)
     return df
 
 
 # --- Column Naming ---
 
+@instrument("transform")
 def enforce_column_naming(df):
     try:
         original = df.columns.tolist()
@@ -144,7 +143,8 @@ def enforce_column_naming(df):
             .str.replace(r'[^\w\s]', '', regex=True)
             .str.replace(r'\s+', '_', regex=True)
         )
-        logger.info(f"✅ Standardized column names: {dict(zip(original, df.columns))}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("✅ Standardized column names: %s", dict(zip(original, df.columns)))
     except Exception as e:
         logger.error(f"❌ Error enforcing column naming: {e}", exc_info=True)
     return df
@@ -152,7 +152,7 @@ def enforce_column_naming(df):
 
 # --- Main Cleaning Pipeline ---
 
-def clean_table(df, table_name, config):
+def clean_table_stepwise(df, table_name, config, stats=None):
     tables_config = config.get('tables', {})
     if table_name not in tables_config:
         logger.error(f"❌ No config found for table: {table_name}")
@@ -166,10 +166,17 @@ def clean_table(df, table_name, config):
         df = standardize_data_types(df, columns_config)
         df = drop_null_columns(df, columns_config, config.get('drop_column_threshold', 0.5))
         df = drop_null_rows(df, config.get('drop_row_threshold', 0.5), columns_config)
-        df = impute_missing_values(df, columns_config)
-        df = clean_text_fields(df, columns_config)
+        df = impute_missing_values(df, columns_config, stats, config.get('impute_stats', 'exact'))
+        df = clean_text_fields(df, columns_config, config.get('categorical_max_unique', 0))
         df = remove_duplicates(df)
-        logger.info(f"✅ Finished cleaning table: {table_name}")
+        df = categorize_low_cardinality(
+            df, columns_config,
+            config.get('categorical_max_unique', 0), config.get('categorical_max_ratio', 1.0)
+        )
+        df = optimize_dtypes(
+            df, config.get('downcast_numeric', False), config.get('string_storage', 'python'), table_name
+        )
+        logger.info("✅ Finished cleaning table: %s", table_name)
     except Exception as e:
         logger.error(f"❌ Cleaning failed for table '{table_name}': {e}", exc_info=True)
         raise
@@ -177,6 +184,59 @@ def clean_table(df, table_name, config):
     return df
 
 
+def clean_table(df, table_name, config, plan=None, stats=None):
+    """
+    Clean one table.
+
+    Uses the compiled single-pass cleaning plan when `config["use_fused_plan"]`
+    is set (or a precompiled `plan` is given), else the step-by-step pipeline.
+    Both produce identical output. With `stats` (a column_stats.TableStats)
+    medians and modes are accumulated into it and imputed from everything
+    it has seen, not just this frame.
+
+    With `config["backend"] == "duckdb"` the table is cleaned by DuckDB
+    instead (scripts/duckdb_backend.py), with the same output; streamed
+    chunks imputed from `stats` always use pandas.
+    """
+    if config.get('backend', 'pandas') == 'duckdb' and stats is None:
+        from scripts.duckdb_backend import duckdb_clean_table
+        return duckdb_clean_table(df, table_name, config, plan)
+
+    with track(table_name, "transform", frame=df) as tracker:
+        if plan is None and not config.get('use_fused_plan', False):
+            df = clean_table_stepwise(df, table_name, config, stats)
+            tracker.output(df)
+            return df
+
+        try:
+            if plan is None:
+                plan = compile_cleaning_plan(table_name, config)
+            df = apply_cleaning_plan(df, plan, stats)
+            logger.info("✅ Finished cleaning table: %s", table_name)
+        except Exception as e:
+            logger.error(f"❌ Cleaning failed for table '{table_name}': {e}", exc_info=True)
+            raise
+
+        tracker.output(df)
+    return df
+
+
+def clean_table_chunk(df, table_name, config, columns=None, plan=None, stats=None):
+    """
+    Clean one chunk of a streamed table with the same steps as `clean_table`.
+
+    Column drops are decided per chunk, so every chunk after the first is
+    aligned to `columns` (the first cleaned chunk's columns) to keep the
+    appended target table's schema stable. Passing the same `stats` for
+    every chunk imputes from all rows streamed so far.
+    """
+    df = clean_table(df, table_name, config, plan, stats)
+    if columns is not None and list(df.columns) != list(columns):
+        logger.warning("⚠️ Aligning chunk of '%s' to columns of first chunk: %s", table_name, list(columns))
+        df = df.reindex(columns=columns)
+    return df
+
+
 def transform_data(raw_dataframes, config):
     cleaned_dataframes = {}
     for table_name, df in raw_dataframes.items():
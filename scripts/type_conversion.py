@@ -0,0 +1,203 @@
+import logging
+import numpy as np
+import pandas as pd
+from utils.arrow_frames import pa
+from utils.logger import logger
+from utils.metrics import instrument
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+# Nullable integer dtypes tried, smallest first, when downcasting Int64 columns
+_INT_DTYPES = ("Int8", "Int16", "Int32")
+# Object column values sized per column when estimating a frame's memory
+MEMORY_SAMPLE_ROWS = 10_000
+
+
+# ---------- DATETIME PARSING ----------
+def infer_datetime_format(series):
+    """
+    strftime format of a text column, guessed from its first non-null value
+    (the value pandas itself would guess from), or None if it has no text
+    or no recognizable format.
+    """
+    if series.dtype != object and not isinstance(series.dtype, (pd.StringDtype, pd.CategoricalDtype)):
+        return None
+    index = series.first_valid_index()
+    if index is None:
+        return None
+    first = series.loc[index]
+    if isinstance(first, pd.Series):  # duplicate index labels
+        first = first.iloc[0]
+    return guess_datetime_format(first) if isinstance(first, str) else None
+
+
+def parse_datetime(series, date_format=None):
+    """
+    `pd.to_datetime(series, errors="coerce")`, parsing each distinct value once.
+
+    Values are factorized, the distinct values are parsed with
+    `date_format` (if known) and the results are scattered back through the
+    codes, so repeated dates (most of a date column) cost one lookup.
+    Unparseable values become NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series
+    if series.dtype != object and not isinstance(series.dtype, (pd.StringDtype, pd.CategoricalDtype)):
+        # Numbers are epoch offsets; nothing to factorize
+        return pd.to_datetime(series, errors='coerce')
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = np.asarray(uniques, dtype=object)
+    if date_format is not None:
+        parsed = pd.to_datetime(uniques, format=date_format, errors='coerce')
+    else:
+        parsed = pd.to_datetime(uniques, errors='coerce')
+    values = parsed.take(codes, allow_fill=True, fill_value=pd.NaT)
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def datetime_format_for(name, series, formats):
+    """
+    Format of column `name`, detected on first sight and remembered in the
+    `formats` dict (a plan's per-table cache), so later chunks of the same
+    table parse with the same format without guessing again.
+    """
+    if formats is None:
+        return infer_datetime_format(series)
+    if name not in formats:
+        formats[name] = infer_datetime_format(series)
+        if formats[name] is not None:
+            logger.info("✅ Detected date format '%s' for column '%s'", formats[name], name)
+    return formats[name]
+
+
+# ---------- DOWNCASTING ----------
+def downcast_integer(series):
+    """Smallest nullable integer dtype that holds every value (Int64 -> Int8/16/32)."""
+    values = series.dropna()
+    if values.empty:
+        return series
+    low, high = values.min(), values.max()
+    for dtype in _INT_DTYPES:
+        info = np.iinfo(dtype.lower())
+        if info.min <= low and high <= info.max:
+            return series.astype(dtype)
+    return series
+
+
+def downcast_float(series):
+    """float32 if every value survives the round trip exactly, else unchanged."""
+    narrowed = series.astype("float32")
+    same = narrowed.astype(series.dtype).to_numpy() == series.to_numpy()
+    if (same | series.isna().to_numpy()).all():
+        return narrowed
+    return series
+
+
+def downcast_numeric(series):
+    if isinstance(series.dtype, pd.Int64Dtype):
+        return downcast_integer(series)
+    if series.dtype == np.int64:
+        return pd.to_numeric(series, downcast="integer")
+    if series.dtype == np.float64:
+        return downcast_float(series)
+    return series
+
+
+# ---------- STRINGS ----------
+def to_arrow_strings(series):
+    """Object column of str (and nulls) as an Arrow-backed string column; others unchanged."""
+    if series.dtype != object or pd.api.types.infer_dtype(series, skipna=True) != "string":
+        return series
+    return series.astype(pd.StringDtype("pyarrow"))
+
+
+# ---------- WHOLE FRAME ----------
+def frame_memory(df, sample_rows=MEMORY_SAMPLE_ROWS):
+    """
+    Bytes held by a frame, counting the strings inside object columns.
+
+    Sizing every Python object is slow, so object columns longer than
+    `sample_rows` are estimated from an evenly spaced sample; every other
+    dtype is measured exactly.
+    """
+    total = 0
+    for col in df.columns:
+        series = df[col]
+        if series.dtype == object and len(series) > sample_rows:
+            sample = series.iloc[::len(series) // sample_rows]
+            total += sample.memory_usage(deep=True, index=False) * len(series) / len(sample)
+        else:
+            total += series.memory_usage(deep=True, index=False)
+    return int(total)
+
+
+@instrument("transform")
+def optimize_dtypes(df, downcast=True, string_storage="pyarrow", table=None):
+    """
+    Shrink a cleaned frame's dtypes without changing any value.
+
+    Integer columns move to the smallest nullable integer dtype that fits,
+    float columns to float32 when that is lossless, and text columns to
+    Arrow-backed strings when `string_storage` is "pyarrow" (and pyarrow is
+    installed). Category and datetime columns are kept. The memory before
+    and after is logged per table.
+    """
+    arrow_strings = string_storage == "pyarrow" and pa is not None
+    if not downcast and not arrow_strings:
+        return df
+
+    report = table is not None and logger.isEnabledFor(logging.INFO)
+    before = frame_memory(df) if report else 0
+
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if downcast and pd.api.types.is_numeric_dtype(series.dtype):
+            series = downcast_numeric(series)
+        elif arrow_strings:
+            series = to_arrow_strings(series)
+        columns[col] = series
+    result = pd.DataFrame(columns, index=df.index, copy=False)
+
+    if report:
+        after = frame_memory(result)
+        saved = 100 * (1 - after / before) if before else 0.0
+        logger.info(
+            "✅ Optimized dtypes of '%s': %.2f MB -> %.2f MB (%.0f%% smaller)",
+            table, before / 1e6, after / 1e6, saved
+        )
+    return result
+
+
+# ---------- STANDALONE TEST ----------
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    # Messy column: two spellings of each date, so pandas parses every row with dateutil
+    days = pd.date_range("2015-01-01", "2024-12-31")
+    spellings = np.concatenate([days.strftime("%B %d %Y"), days.strftime("%d %b %Y, %H:%M")])
+    dates = pd.Series(rng.choice(spellings, 300_000), dtype=object)
+
+    start = time.perf_counter()
+    expected = pd.to_datetime(dates, errors='coerce')
+    baseline = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = parse_datetime(dates, infer_datetime_format(dates))
+    fast = time.perf_counter() - start
+    pd.testing.assert_series_equal(actual, expected)
+    print(f"parse_datetime: identical to pd.to_datetime, {baseline:.2f}s -> {fast:.2f}s")
+
+    frame = pd.DataFrame({
+        "id": pd.array(rng.integers(0, 30_000, 1_000_000), dtype="Int64"),
+        "amount": rng.integers(0, 5_000, 1_000_000).astype("float64"),
+        "ratio": rng.random(1_000_000),
+        "name": pd.Series(rng.choice(["alice", "bob", "carol"], 1_000_000), dtype=object),
+    })
+    optimized = optimize_dtypes(frame, table="demo")
+    print(optimized.dtypes.to_dict())
+    print(f"{frame_memory(frame) / 1e6:.1f} MB -> {frame_memory(optimized) / 1e6:.1f} MB")
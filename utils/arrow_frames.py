@@ -0,0 +1,74 @@
+import json
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+# Schema metadata key listing Arrow-backed string columns; pandas would
+# otherwise read them back with its default (python) string storage
+_ARROW_STRINGS_KEY = b"etl_arrow_string_columns"
+
+
+def _object_null_kind(series):
+    """Return "none", "nan" or None (mixed/unsupported) for an object column's nulls."""
+    nulls = series[series.isna()]
+    if nulls.empty or all(value is None for value in nulls):
+        return "none"
+    if all(isinstance(value, float) for value in nulls):
+        return "nan"
+    return None
+
+
+def to_arrow_exact(df):
+    """
+    Convert a DataFrame to an Arrow table only if it round-trips exactly.
+
+    Every object column must become a string (or all-null) column whose
+    nulls are all None or all NaN; mixed types or object ints would come
+    back changed, so those frames are rejected. Arrow-backed string
+    columns are recorded in the schema metadata so they come back as such.
+
+    Returns:
+        tuple: (pyarrow.Table, list of object columns whose nulls were NaN),
+        or (None, None) if pyarrow is missing or the frame is not exact.
+    """
+    if pa is None:
+        return None, None
+
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return None, None
+
+    nan_columns = []
+    for col in df.columns[df.dtypes == object]:
+        arrow_type = table.schema.field(str(col)).type
+        if not (pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+                or pa.types.is_null(arrow_type)):
+            return None, None
+        kind = _object_null_kind(df[col])
+        if kind is None:
+            return None, None
+        if kind == "nan":
+            nan_columns.append(col)
+
+    arrow_strings = [
+        str(col) for col in df.columns
+        if isinstance(df[col].dtype, pd.StringDtype) and df[col].dtype.storage == "pyarrow"
+    ]
+    if arrow_strings:
+        metadata = {**(table.schema.metadata or {}), _ARROW_STRINGS_KEY: json.dumps(arrow_strings).encode()}
+        table = table.replace_schema_metadata(metadata)
+    return table, nan_columns
+
+
+def from_arrow_exact(table, nan_columns):
+    """Convert a table from `to_arrow_exact` back to the original DataFrame."""
+    df = table.to_pandas()
+    for col in json.loads((table.schema.metadata or {}).get(_ARROW_STRINGS_KEY, b"[]")):
+        df[col] = df[col].astype(pd.StringDtype("pyarrow"))
+    for col in nan_columns:
+        df[col] = df[col].where(df[col].notna(), float("nan"))
+    return df
@@ -1,28 +1,182 @@
 import os
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
+import time
+from datetime import datetime, timezone
 
 # Ensure logs directory exists
 LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
 os.makedirs(LOG_DIR, exist_ok=True)
 
+# Level, output format ("text" or "json" lines) and rate limiting, set from the environment
+LOG_LEVEL = os.getenv("ETL_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("ETL_LOG_FORMAT", "text")
+# At most this many records per message template and level per window (0 = unlimited);
+# ERROR and above are never limited
+LOG_RATE_LIMIT = int(os.getenv("ETL_LOG_RATE_LIMIT", "100"))
+LOG_RATE_WINDOW = float(os.getenv("ETL_LOG_RATE_WINDOW", "60"))
+
+
+# ---------- FORMATTERS ----------
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, for log shippers."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+# ---------- RATE LIMITING ----------
+class RateLimitFilter(logging.Filter):
+    """
+    Drop repeats of the same message template beyond `limit` per `window`
+    seconds. Keyed on the unformatted template, so it works with lazy
+    %-style calls like logger.info("Cleaned text column: %s", col). When a
+    window closes with drops, the next record of that template notes how
+    many were suppressed.
+    """
+
+    def __init__(self, limit=LOG_RATE_LIMIT, window=LOG_RATE_WINDOW):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not self.limit or record.levelno >= logging.ERROR:
+            return True
+
+        key = (record.msg, record.levelno)
+        now = time.monotonic()
+        with self._lock:
+            window_start, count, suppressed = self._counts.get(key, (now, 0, 0))
+            if now - window_start >= self.window:
+                window_start, count = now, 0
+                if suppressed:
+                    record.msg = f"{record.msg} [{suppressed} similar messages suppressed]"
+                    suppressed = 0
+            if count >= self.limit:
+                self._counts[key] = (window_start, count, suppressed + 1)
+                return False
+            self._counts[key] = (window_start, count + 1, suppressed)
+        return True
+
+
+# ---------- ASYNC HANDLER ----------
+# Message arguments that cannot change before the listener formats the record
+IMMUTABLE_ARG_TYPES = (str, int, float, bool, type(None))
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hand records to a background listener thread instead of writing them.
+
+    Records are queued unformatted, exception info included, so the
+    listener's handlers do all formatting (and the JSON formatter still
+    sees `exc_info`). Worker processes (forked or spawned by the parallel
+    transform) have no listener thread, so there records go straight to
+    the real handlers.
+    """
+
+    def __init__(self, log_queue, handlers, listener_pid=None):
+        super().__init__(log_queue)
+        self.handlers = handlers
+        self.listener_pid = listener_pid
+
+    def prepare(self, record):
+        """
+        Shallow copy of the record for the queue. QueueHandler.prepare would
+        format it on the logging thread and fold the traceback into the
+        message; here only messages with mutable arguments (lists, dicts,
+        frames, ...), which may change before the listener gets to them, are
+        rendered early. `exc_info` is kept either way.
+        """
+        record = copy.copy(record)
+        args = record.args
+        if args:
+            values = args.values() if isinstance(args, dict) else args
+            if not all(isinstance(value, IMMUTABLE_ARG_TYPES) for value in values):
+                record.msg, record.args = record.getMessage(), None
+        return record
+
+    def emit(self, record):
+        if os.getpid() == self.listener_pid:
+            super().emit(record)
+            return
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def _build_handlers():
+    if LOG_FORMAT == "json":
+        formatter = JsonLinesFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
+
+    # File handler (UTF-8 encoding)
+    file_handler = logging.FileHandler(os.path.join(LOG_DIR, 'etl_pipeline.log'), encoding='utf-8')
+    file_handler.setFormatter(formatter)
+
+    # Console handler with UTF-8 encoding (optional, safe on most modern terminals)
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+
+    return [file_handler, console_handler]  # drop console_handler if console logging is not wanted
+
+
 # Configure logger
 logger = logging.getLogger("ETLLogger")
-logger.setLevel(logging.INFO)
-
-# File handler (UTF-8 encoding)
-file_handler = logging.FileHandler(os.path.join(LOG_DIR, 'etl_pipeline.log'), encoding='utf-8')
-file_formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
-file_handler.setFormatter(file_formatter)
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
 
-# Console handler with UTF-8 encoding (optional, safe on most modern terminals)
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setFormatter(file_formatter)
+_listener = None
 
 # Add handlers only if none exist
 if not logger.hasHandlers():
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)  # comment this line if console logging is not wanted
+    import multiprocessing
+
+    _handlers = _build_handlers()
+    _queue = queue.SimpleQueue()
+    if multiprocessing.parent_process() is None:
+        # Main process: a single listener thread does all formatting and I/O
+        _listener = logging.handlers.QueueListener(_queue, *_handlers, respect_handler_level=True)
+        _listener.start()
+        _queue_handler = AsyncQueueHandler(_queue, _handlers, listener_pid=os.getpid())
+    else:
+        _queue_handler = AsyncQueueHandler(_queue, _handlers)
+    _queue_handler.addFilter(RateLimitFilter())
+    logger.addHandler(_queue_handler)
+
+
+def flush_logs():
+    """Stop the listener after writing every queued record (runs at exit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(flush_logs)
 
 # To avoid issues on Windows console, set environment/codepage to UTF-8 before running script:
 # chcp 65001
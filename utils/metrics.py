@@ -0,0 +1,265 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+from config.config import METRICS_ENABLED, METRICS_DIR, METRICS_TEXTFILE
+from utils.logger import logger
+
+# ---------- RUN STATE ----------
+_enabled = METRICS_ENABLED
+_lock = threading.Lock()
+_records = {}
+_run = {"run_id": None, "started": None, "start_perf": None}
+
+# Table being processed by the current thread, so transform steps (which
+# only see a DataFrame) are attributed to the right table
+_current_table = contextvars.ContextVar("etl_metrics_table", default=None)
+
+
+def enable(flag=True):
+    """Turn instrumentation on (or off) and start a new run."""
+    global _enabled
+    _enabled = flag
+    if flag:
+        reset()
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _records.clear()
+        _run["run_id"] = uuid.uuid4().hex[:12]
+        _run["started"] = datetime.now(timezone.utc).isoformat()
+        _run["start_perf"] = time.perf_counter()
+
+
+if _enabled:
+    reset()
+
+
+def _peak_rss_bytes():
+    """Process high-water mark RSS (ru_maxrss is KiB on Linux)."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _frame_size(frame):
+    """(rows, bytes) of a DataFrame; bytes are column buffers, without deep string sizes."""
+    if frame is None or not hasattr(frame, "memory_usage"):
+        return None, None
+    return len(frame), int(frame.memory_usage(index=False, deep=False).sum())
+
+
+# ---------- RECORDING ----------
+class _NullTracker:
+    """Returned while metrics are off: every call is a no-op."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def output(self, frame=None, rows=None):
+        pass
+
+
+_NULL_TRACKER = _NullTracker()
+
+
+class _Tracker:
+    def __init__(self, table, stage, step, frame):
+        self.key = (table, stage, step)
+        self.rows_in, self.bytes_in = _frame_size(frame)
+        self.rows_out = self.bytes_out = None
+
+    def output(self, frame=None, rows=None):
+        """Record the step's output frame (or just a row count)."""
+        if frame is not None:
+            self.rows_out, self.bytes_out = _frame_size(frame)
+        if rows is not None:
+            self.rows_out = rows
+
+    def __enter__(self):
+        self._token = _current_table.set(self.key[0]) if self.key[0] is not None else None
+        self._peak_before = _peak_rss_bytes()
+        self._cpu_start = time.thread_time()
+        self._wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall_start
+        cpu = time.thread_time() - self._cpu_start
+        peak_after = _peak_rss_bytes()
+        if self._token is not None:
+            _current_table.reset(self._token)
+
+        with _lock:
+            record = _records.setdefault(self.key, {
+                "table": self.key[0], "stage": self.key[1], "step": self.key[2],
+                "calls": 0, "errors": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                "rows_in": 0, "rows_out": 0, "bytes_in": 0, "bytes_out": 0,
+                "peak_memory_delta_bytes": 0,
+            })
+            record["calls"] += 1
+            record["errors"] += exc_type is not None
+            record["wall_seconds"] += wall
+            record["cpu_seconds"] += cpu
+            for field in ("rows_in", "rows_out", "bytes_in", "bytes_out"):
+                record[field] += getattr(self, field) or 0
+            if peak_after is not None:
+                record["peak_memory_delta_bytes"] = max(
+                    record["peak_memory_delta_bytes"], peak_after - self._peak_before
+                )
+        return False
+
+
+def track(table, stage, step=None, frame=None):
+    """
+    Context manager timing one table x stage (x transform step).
+
+    Records wall time, thread CPU time, rows and bytes in/out and how much
+    the block raised the process's peak RSS. Repeated calls with the same
+    key (e.g. streamed chunks) are summed. When metrics are off this
+    returns a shared no-op object.
+
+        with track("insurance_claims", "load", frame=df) as t:
+            load(df)
+            t.output(rows=len(df))
+    """
+    if not _enabled:
+        return _NULL_TRACKER
+    if table is None:
+        table = _current_table.get()
+    return _Tracker(table, stage, step, frame)
+
+
+def instrument(stage):
+    """
+    Decorator recording every call of a DataFrame -> DataFrame function as
+    a `stage` step of the current table. Costs one flag check when off.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Tracker(_current_table.get(), stage, func.__name__, args[0] if args else None) as tracker:
+                result = func(*args, **kwargs)
+                tracker.output(result)
+            return result
+        return wrapper
+    return decorator
+
+
+# ---------- EXPORT ----------
+def run_report():
+    """Snapshot of the current run: one entry per table x stage x step."""
+    with _lock:
+        records = [dict(record) for record in _records.values()]
+    for record in records:
+        record["wall_seconds"] = round(record["wall_seconds"], 6)
+        record["cpu_seconds"] = round(record["cpu_seconds"], 6)
+    duration = time.perf_counter() - _run["start_perf"] if _run["start_perf"] else None
+    return {
+        "run_id": _run["run_id"],
+        "started": _run["started"],
+        "duration_seconds": round(duration, 4) if duration is not None else None,
+        "records": records,
+    }
+
+
+def _label_value(value):
+    return str(value if value is not None else "").replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text(report):
+    """Render a run report in the Prometheus text exposition format."""
+    metrics = [
+        ("wall_seconds", "gauge", "Wall-clock seconds spent in the stage"),
+        ("cpu_seconds", "gauge", "Thread CPU seconds spent in the stage"),
+        ("rows_in", "gauge", "Rows entering the stage"),
+        ("rows_out", "gauge", "Rows leaving the stage"),
+        ("bytes_in", "gauge", "Column buffer bytes entering the stage"),
+        ("bytes_out", "gauge", "Column buffer bytes leaving the stage"),
+        ("peak_memory_delta_bytes", "gauge", "Increase of the process peak RSS during the stage"),
+        ("calls", "counter", "Times the stage ran"),
+        ("errors", "counter", "Times the stage raised"),
+    ]
+    lines = []
+    for field, kind, help_text in metrics:
+        name = f"etl_stage_{field}_total" if kind == "counter" else f"etl_stage_{field}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for record in report["records"]:
+            labels = ",".join(
+                f'{label}="{_label_value(record[label])}"' for label in ("table", "stage", "step")
+            )
+            lines.append(f"{name}{{{labels}}} {record[field]}")
+
+    waits = report.get("connection_wait", {}).get("stages", {})
+    if waits:
+        lines.append("# HELP etl_db_connection_wait_seconds Seconds spent waiting for a pooled connection")
+        lines.append("# TYPE etl_db_connection_wait_seconds gauge")
+        for stage, stats in waits.items():
+            lines.append(f'etl_db_connection_wait_seconds{{stage="{_label_value(stage)}"}} {stats["wait_seconds"]}')
+        lines.append("# HELP etl_db_connection_checkouts_total Pooled connection checkouts")
+        lines.append("# TYPE etl_db_connection_checkouts_total counter")
+        for stage, stats in waits.items():
+            lines.append(f'etl_db_connection_checkouts_total{{stage="{_label_value(stage)}"}} {stats["checkouts"]}')
+
+    lines.append("# HELP etl_run_duration_seconds Wall-clock seconds of the last run")
+    lines.append("# TYPE etl_run_duration_seconds gauge")
+    lines.append(f"etl_run_duration_seconds {report['duration_seconds'] or 0}")
+    lines.append("# HELP etl_run_finished_timestamp_seconds Unix time the last run finished")
+    lines.append("# TYPE etl_run_finished_timestamp_seconds gauge")
+    lines.append(f"etl_run_finished_timestamp_seconds {time.time():.0f}")
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, content):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def export_metrics(report_dir=METRICS_DIR, textfile=METRICS_TEXTFILE, extra=None):
+    """
+    Write the run report as JSON (one file per run) and the Prometheus
+    textfile (replaced atomically, as the node_exporter textfile collector
+    expects). `extra` sections (e.g. connection pool waits) are added to
+    the report.
+
+    Returns:
+        str: path of the JSON report, or None if metrics are off.
+    """
+    if not _enabled:
+        return None
+
+    report = run_report()
+    report.update(extra or {})
+    report_path = os.path.join(report_dir, f"run_{report['run_id']}.json")
+    try:
+        _write_atomic(report_path, json.dumps(report, indent=2))
+        _write_atomic(textfile, prometheus_text(report))
+        logger.info(f"✅ Wrote run metrics to {report_path} and {textfile}")
+    except Exception as e:
+        logger.error(f"❌ Failed to export run metrics: {e}", exc_info=True)
+        return None
+    return report_path